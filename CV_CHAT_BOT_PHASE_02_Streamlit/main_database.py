@@ -87,6 +87,7 @@ def document_exists_in_pinecone(doc_id):
 
 def upsert_markdown_embeddings():
     upserted_docs = []
+    pending_docs = []  # (doc_id, markdown) of every new document, embedded together below
 
     for filename in os.listdir(new_docs_dir):
         if filename.endswith(".md"):
@@ -101,15 +102,19 @@ def upsert_markdown_embeddings():
                 continue
 
             with open(markdown_filepath, "r", encoding="utf-8") as md_file:
-                markdown_content = md_file.read()
-
-            embeddings = generate_embeddings(markdown_content)
-            if embeddings:
-                node = Node(id_=normalized_doc_id, embedding=embeddings, metadata={"text": markdown_content})
-                vector_store = PineconeVectorStore(pinecone_index=pinecone_index)
-                vector_store.add(nodes=[node])
-                upserted_docs.append(normalized_doc_id)
-                print(f"Upserted document '{normalized_doc_id}' into Pinecone.")
+                pending_docs.append((normalized_doc_id, md_file.read()))
+
+    if pending_docs:
+        embeddings = generate_embeddings([markdown_content for _, markdown_content in pending_docs])
+        nodes = [
+            Node(id_=doc_id, embedding=embedding, metadata={"text": markdown_content})
+            for (doc_id, markdown_content), embedding in zip(pending_docs, embeddings)
+            if embedding
+        ]
+        if nodes:
+            vector_store = PineconeVectorStore(pinecone_index=pinecone_index)
+            vector_store.add(nodes=nodes)
+            upserted_docs = [node.id_ for node in nodes]
     print(f"Upserted {len(upserted_docs)} new documents into Pinecone.")
 
 
@@ -128,18 +133,27 @@ if index_name not in pc.list_indexes().names():
     )
 
 pinecone_index = pc.Index(index_name)
-embed_model = OpenAIEmbedding()
+# CVs per embedding request; small enough that a batch of long CVs stays under the per-request token limit
+embed_model = OpenAIEmbedding(embed_batch_size=32)
 
 #-----------------------------------------Function to generate text embeddings----------------------------------------
 
-def generate_embeddings(text):
+def generate_embedding(text):
     try:
-        embedding = embed_model.get_text_embedding(text)
-        return embedding
+        return embed_model.get_text_embedding(text)
     except Exception as e:
         print(f"Error generating embeddings: {e}")
         return None
 
+def generate_embeddings(texts):
+    """Embed many texts in batched requests, in order (None for a text that failed)."""
+    try:
+        return embed_model.get_text_embedding_batch(texts)
+    except Exception as e:
+        # One bad text fails its whole request: embed one by one so only that text is lost
+        print(f"Error generating embeddings in batches, embedding one by one: {e}")
+        return [generate_embedding(text) for text in texts]
+
 #------------------------------------------------Main Section--------------------------------------------------------
 
 if __name__ == "__main__":
@@ -1,199 +1,186 @@
 import os
-import io
-import re
+import sys
 import time
-from dotenv import load_dotenv
-from PyPDF2 import PdfReader
-import markdownify
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
-from llama_index.embeddings.openai import OpenAIEmbedding
-from pinecone import Pinecone, ServerlessSpec
-from llama_index.core.schema import Node
-from rank_bm25 import BM25Okapi
-import numpy as np
-
-# ------------------------------------Load Environment Variables------------------------------------------------------------------
-
-load_dotenv()
-
-SERVICE_ACCOUNT_PATH = os.getenv("Service_AP")
-OpenAI_Key = os.getenv("OpenAI_Key")
-Pinecone_API_Key = os.getenv("PINECONE_API_KEY")
-
-os.environ["OPENAI_API_KEY"] = OpenAI_Key
-os.environ["PINECONE_API_KEY"] = Pinecone_API_Key
-
-# --------------------------------------Initialize Google Drive API Service--------------------------------------------------------
-
-def initialize_service():
-    if not SERVICE_ACCOUNT_PATH:
-        raise ValueError("SERVICE_ACCOUNT_PATH is not set in the .env file")
-    creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_PATH)
-    return build('drive', 'v3', credentials=creds)
-
-# --------------------------------------Initialize Pinecone API---------------------------------------------------------------------
-
-pc = Pinecone(api_key=Pinecone_API_Key)
-index_name = "database"
-embedding_dimension = 1536
-
-# Create Pinecone index with dotproduct metric
-
-if index_name not in pc.list_indexes().names():
-    pc.create_index(
-        name=index_name,
-        dimension=embedding_dimension,
-        metric="dotproduct", 
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
+import queue
+import threading
+from googleapiclient.errors import HttpError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from vector_batching import fetch_existing_ids
+from drive_change_watcher import DriveChangeWatcher
+
+# Extraction workers import this script again (as __mp_main__) when they start. They only run
+# pdf_extraction code, so they skip the ingestion setup.
+if __name__ != "__mp_main__":
+    from ingestion_stages import (
+        get_drive_service,
+        pinecone_index,
+        namespace,
+        sparse_encoder,
+        pdf_extractor,
+        manifest,
+        work_item,
+        new_upsert_buffer,
+        new_ingestion_pipeline
     )
-pinecone_index = pc.Index(index_name)
-embed_model = OpenAIEmbedding()
 
-# --------------------------------------Utility Functions--------------------------------------------------------------------------
-
-def normalize_doc_id(doc_id):
-    return re.sub(r'\s+', '_', doc_id)
-
-def document_exists_in_pinecone(doc_id):
-    normalized_doc_id = normalize_doc_id(doc_id)
-    try:
-        fetch_response = pinecone_index.fetch(ids=[normalized_doc_id])
-        if fetch_response and 'vectors' in fetch_response and normalized_doc_id in fetch_response['vectors']:
-            return True
-    except Exception as e:
-        print(f"Error checking document existence in Pinecone: {e}")
-    return False
-
-def generate_embeddings(text):
-    try:
-        return embed_model.get_text_embedding(text)
-    except Exception as e:
-        print(f"Error generating embeddings: {e}")
-        return None
-
-def generate_bm25_sparse_vector(texts):
-    try:
-        tokenized_corpus = [text.split() for text in texts]
-        bm25 = BM25Okapi(tokenized_corpus)
-        sparse_vectors = [bm25.get_scores(doc_tokens) for doc_tokens in tokenized_corpus]
-        return sparse_vectors
-    except Exception as e:
-        print(f"Error generating BM25 sparse vectors: {e}")
-        return None
-
-def convert_pdf_to_markdown(pdf_content):
-    try:
-        reader = PdfReader(io.BytesIO(pdf_content))
-        text = "".join(page.extract_text() for page in reader.pages if page.extract_text())
-        return markdownify.markdownify(text)
-    except Exception as e:
-        print(f"Error converting PDF to Markdown: {e}")
-        return None
-
-def upload_markdown_to_drive(markdown_content, filename, folder_id, drive_service):
-    try:
-        file_metadata = {
-            'name': filename,
-            'parents': [folder_id],
-            'mimeType': 'text/markdown'
-        }
-        media = MediaIoBaseUpload(io.BytesIO(markdown_content.encode("utf-8")), mimetype='text/markdown')
-        drive_service.files().create(body=file_metadata, media_body=media).execute()
-        print(f"Successfully uploaded {filename} to Google Drive folder.")
-    except Exception as e:
-        print(f"Error uploading {filename} to Google Drive: {e}")
-
-# --------------------------------------Processing Functionality-------------------------------------------------------------------
-
-def process_new_file(file_id, file_name, drive_service, target_folder_id):
-    try:
-        # ----------------------------------------------------Download the PDF-----------------------------
-
-        request = drive_service.files().get_media(fileId=file_id)
-        pdf_content = request.execute()
-
-        if not pdf_content:
-            print(f"Failed to download {file_name}.")
-            return
-
-        #---------------------------------------------------------- Convert to Markdown--------------------------------------------
-
-        markdown_content = convert_pdf_to_markdown(pdf_content)
-        if not markdown_content:
-            print(f"Failed to convert {file_name} to Markdown.")
-            return
-
-        # ---------------------------------Upload Markdown to Drive---------------------------------------------------------------------------
-
-        markdown_filename = f"{os.path.splitext(file_name)[0]}.md"
-        upload_markdown_to_drive(markdown_content, markdown_filename, target_folder_id, drive_service)
-
-        # -------------------------------Generate and upsert embeddings into Pinecone-------------------------------------------------------------
-
-        doc_id = os.path.splitext(file_name)[0]
-        normalized_doc_id = normalize_doc_id(doc_id)
-
-        if document_exists_in_pinecone(normalized_doc_id):
-            print(f"Document '{normalized_doc_id}' already exists in Pinecone. Skipping upsert.")
-            return
-
-        # Generate dense and sparse vectors
-
-        embeddings = generate_embeddings(markdown_content)
-        sparse_vectors = generate_bm25_sparse_vector([markdown_content])
-
-        if embeddings and sparse_vectors:
-            # Prepare sparse vector data for upsert
-
-            sparse_vector = sparse_vectors[0]  # Get the sparse vector for the current document
-            indices = np.nonzero(sparse_vector)[0]  # Non-zero indices
-            values = sparse_vector[indices]  # Non-zero values
-            sparse_data = {
-                "indices": indices.tolist(),
-                "values": values.tolist()
-            }
-
-            # Upsert the data into Pinecone with both dense and sparse vectors
-            
+# The clients, stores and ingestion stages are set up in backend/ingestion_stages.py (shared with
+# both_vectors_db_&_gdrivepart.py), so files either script ingested are not processed again.
+# The watcher keeps its Drive change token in the shared manifest.
+CHANGES_CHECKPOINT = "source_changes_page_token"
+
+# Seconds between change polls: the minimum right after a change, growing while the folder is quiet
+WATCH_MIN_INTERVAL = float(os.getenv("WATCH_MIN_INTERVAL_SECONDS", "2"))
+WATCH_MAX_INTERVAL = float(os.getenv("WATCH_MAX_INTERVAL_SECONDS", "60"))
+
+# Failed files are taken from the manifest again on every poll: RETRY_BACKOFF_SECONDS after they failed, then
+# twice as long after each failed retry, up to RETRY_LIMIT retries. A new version of the file starts over.
+RETRY_LIMIT = int(os.getenv("INGEST_RETRY_LIMIT", "5"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("INGEST_RETRY_BACKOFF_SECONDS", "30"))
+
+# --------------------------------------Ingestion--------------------------------------------------------------------------------
+
+# Files waiting for the ingestion pipeline. Unbounded, so queueing never holds up the watcher (the pipeline's
+# own bounded queues apply backpressure behind it). None stops the pipeline.
+work_queue = queue.Queue()
+
+# file_id -> (retries so far, time.monotonic() before which the file is not retried)
+retries = {}
+
+def queue_entry(entry):
+    """Start a manifest entry over and hand it to the ingestion pipeline."""
+    manifest.start(entry['file_id'], entry['file_name'], entry['doc_id'], entry['md5'], entry['modified_time'])
+    work_queue.put(work_item(entry['file_id'], entry['file_name'], entry['md5'], entry['modified_time'], entry['markdown_file_id']))
+
+def start_ingestion(target_folder_id):
+    """Run one ingestion pipeline for as long as the watcher runs, fed from work_queue. Returns its thread."""
+    def run():
+        upsert_buffer = new_upsert_buffer()
+        pipeline = new_ingestion_pipeline(upsert_buffer, target_folder_id)
+        with upsert_buffer:
+            stats = pipeline.run(iter(work_queue.get, None))
+        print(f"Ingested {upsert_buffer.upserted} files in {stats['elapsed_seconds']}s.")
+
+    thread = threading.Thread(target=run, name="ingest-feed", daemon=True)
+    thread.start()
+    return thread
+
+def retry_failed():
+    """Queue the failed files whose backoff has passed, and report those that ran out of retries."""
+    now = time.monotonic()
+    for entry in manifest.unfinished():
+        if entry['status'] != 'failed':
+            continue  # Pending: still on its way through the pipeline
+        attempts, not_before = retries.setdefault(entry['file_id'], (0, now + RETRY_BACKOFF_SECONDS))
+        if now < not_before:
+            continue
+        if attempts >= RETRY_LIMIT:
+            print(f"Giving up on {entry['file_name']} after {attempts} retries (failed at '{entry['stage']}'): {entry['error']}")
+            retries[entry['file_id']] = (attempts, float("inf"))
+            continue
+        print(f"Retrying {entry['file_name']} (failed at '{entry['stage']}', retry {attempts + 1}/{RETRY_LIMIT}).")
+        retries[entry['file_id']] = (attempts + 1, now + RETRY_BACKOFF_SECONDS * 2 ** (attempts + 1))
+        queue_entry(entry)
+
+# --------------------------------------Handle Folder Changes-----------------------------------------------------------------------
+
+def remove_file(file_id):
+    """Take a deleted, trashed or moved-out CV out of the index, unless another file still provides its document."""
+    entry = manifest.get(file_id)
+    if entry is None:
+        return  # Not a file this folder ever ingested
+
+    print(f"File removed: {entry['file_name']}")
+    # Recorded first: the pipeline may still hold the file, and its upsert stage skips removed files
+    manifest.mark_removed(file_id)
+    if not any(other['file_id'] != file_id for other in manifest.for_doc_id(entry['doc_id'])):
+        try:
+            pinecone_index.delete(ids=[entry['doc_id']], namespace=namespace)
+            sparse_encoder.remove_document(entry['doc_id'])
+            print(f"Deleted '{entry['doc_id']}' from Pinecone.")
+        except Exception as e:
+            print(f"Error deleting '{entry['doc_id']}' from Pinecone: {e}")
+            return  # Keep the removed entry so a later resync retries the delete
+
+        if entry['markdown_file_id']:
             try:
-                pinecone_index.upsert(
-                    vectors=[{
-                        "id": normalized_doc_id,
-                        "values": embeddings,  # Dense vector
-                        "metadata": {"text": markdown_content},
-                        "sparse_values": sparse_data  # Sparse vector data
-                    }],
-                    namespace="cvs-info"
-                )
-                print(f"Upserted document '{normalized_doc_id}' into Pinecone.")
-            except Exception as e:
-                print(f"Error upserting vectors for document '{normalized_doc_id}': {e}")
-    except Exception as e:
-        print(f"Error processing file {file_name}: {e}")
-
-def fetch_files(service, folder_id):
-    query = f"'{folder_id}' in parents and mimeType='application/pdf'"
-    response = service.files().list(q=query).execute()
-    return {file['id']: file['name'] for file in response.get('files', [])}
+                get_drive_service().files().delete(fileId=entry['markdown_file_id']).execute()
+            except HttpError as e:
+                if e.resp.status != 404:
+                    print(f"Error deleting the Markdown copy of {entry['file_name']}: {e}")
+    manifest.remove(file_id)
+    retries.pop(file_id, None)
+
+def changed_work_items(files):
+    """Record added or modified PDFs in the manifest and return the work items for those that need ingesting."""
+    items = []
+    for file in files:
+        entry = manifest.get(file['id'])
+        item = work_item(file['id'], file['name'], file.get('md5Checksum'), file.get('modifiedTime'),
+                         entry['markdown_file_id'] if entry else None)
+        if entry is not None and entry['doc_id'] != item['doc_id']:
+            # Renamed: the vector is stored under the old name
+            remove_file(file['id'])
+            item['markdown_file_id'] = None
+        elif manifest.is_current(file['id'], item['md5'], item['modified_time']):
+            continue  # Only metadata changed (sharing, description, ...)
+        items.append(item)
+
+    # Files the manifest has never seen were either ingested before it existed or are new uploads:
+    # one multi-id fetch tells them apart
+    unknown = [item for item in items if manifest.get(item['file_id']) is None and not manifest.for_doc_id(item['doc_id'])]
+    existing_ids = fetch_existing_ids(pinecone_index, [item['doc_id'] for item in unknown], namespace) if unknown else set()
+    unknown_ids = {item['file_id'] for item in unknown}
+
+    queued = []
+    for item in items:
+        if item['file_id'] in unknown_ids and item['doc_id'] in existing_ids:
+            print(f"Document '{item['doc_id']}' already exists in Pinecone. Recording it in the manifest.")
+            manifest.adopt(item['file_id'], item['file_name'], item['doc_id'], item['md5'], item['modified_time'])
+            continue
+        print(f"{'Modified' if manifest.get(item['file_id']) else 'New'} file detected: {item['file_name']}")
+        manifest.start(item['file_id'], item['file_name'], item['doc_id'], item['md5'], item['modified_time'])
+        retries.pop(item['file_id'], None)
+        queued.append(item)
+    return queued
 
 # --------------------------------------Monitor Folder for Changes-----------------------------------------------------------------
 
 def monitor_folder(source_folder_id, target_folder_id):
-    drive_service = initialize_service()
-    previous_files = fetch_files(drive_service, source_folder_id)
-    print("Monitoring folder...")
+    pdf_extractor.start()  # Start the extraction workers before the first PDF arrives
+    ingestion = start_ingestion(target_folder_id)
+    watcher = DriveChangeWatcher(
+        source_folder_id, get_drive_service, manifest, checkpoint_name=CHANGES_CHECKPOINT,
+        min_interval=WATCH_MIN_INTERVAL, max_interval=WATCH_MAX_INTERVAL
+    )
 
-    while True:
-        time.sleep(10)  # Check every 10 seconds
-        current_files = fetch_files(drive_service, source_folder_id)
-        if len(current_files) > len(previous_files):
-            new_files = set(current_files.keys()) - set(previous_files.keys())
-            for file_id in new_files:
-                print(f"New file detected: {current_files[file_id]}")
-                process_new_file(file_id, current_files[file_id], drive_service, target_folder_id)
-            previous_files = current_files
+    def on_changes(changed, removed):
+        # Record new files before applying removals, so a CV replaced by a new upload under the same
+        # name keeps its vector until the new file overwrites it
+        items = changed_work_items(changed.values())
+        for file_id in removed:
+            remove_file(file_id)
+        for item in items:
+            work_queue.put(item)
+
+    def on_resync(files):
+        # Full listing: anything the manifest knows that is no longer in the folder was removed meanwhile
+        on_changes(files, manifest.file_ids() - set(files))
+
+    # Files an interrupted run left unfinished go first
+    unfinished = manifest.unfinished()
+    if unfinished:
+        print(f"Resuming {len(unfinished)} unfinished files.")
+        for entry in unfinished:
+            queue_entry(entry)
+
+    print("Monitoring folder...")
+    try:
+        watcher.watch(on_changes, on_resync, on_poll=retry_failed)
+    finally:
+        print("Stopping. Finishing the files already queued.")
+        work_queue.put(None)
+        ingestion.join()
 
 # --------------------------------------Main--------------------------------------------------------------------------------------
 
@@ -1,237 +1,178 @@
 import os
-import io
-import re
-from dotenv import load_dotenv
-from PyPDF2 import PdfReader
-import markdownify
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
-from llama_index.embeddings.openai import OpenAIEmbedding
-from pinecone import Pinecone, ServerlessSpec
-from llama_index.core.schema import Node
-from rank_bm25 import BM25Okapi
-import numpy as np
-
-#------------------------------------------------ Load environment variables ---------------------------------------------- 
-
-load_dotenv()
-
-OpenAI_Key = os.getenv("OpenAI_Key")
-Pinecone_API_Key = os.getenv("PINECONE_API_KEY")
-SERVICE_ACCOUNT_FILE = os.getenv("Service_AP")  # Add the path to the service account file
-
-os.environ["OPENAI_API_KEY"] = OpenAI_Key
-os.environ["PINECONE_API_KEY"] = Pinecone_API_Key
-
-SCOPES = ['https://www.googleapis.com/auth/drive']
-credentials = service_account.Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE, scopes=SCOPES
-)
-drive_service = build('drive', 'v3', credentials=credentials)
-
-pc = Pinecone(api_key=Pinecone_API_Key)
-index_name = "database"
-namespace = "cvs-info"
-embedding_dimension = 1536
-
-if index_name not in pc.list_indexes().names():
-    pc.create_index(
-        name=index_name,
-        dimension=embedding_dimension,
-        metric="dotproduct",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
+import sys
+from googleapiclient.errors import HttpError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from cv_profile import extract_cv_profile, profile_to_metadata, PROFILE_VERSION
+from vector_batching import fetch_existing_ids
+
+# Extraction workers import this script again (as __mp_main__) when they start. They only run
+# pdf_extraction code, so they skip the ingestion setup.
+if __name__ != "__mp_main__":
+    from ingestion_stages import (
+        get_drive_service,
+        pinecone_index,
+        namespace,
+        batch_embedder,
+        openai_client,
+        extraction_store,
+        sparse_encoder,
+        pdf_extractor,
+        manifest,
+        SOURCE_FOLDER_ID,
+        work_item,
+        new_upsert_buffer,
+        new_ingestion_pipeline
     )
-pinecone_index = pc.Index(index_name)
-embed_model = OpenAIEmbedding()
-
-SOURCE_FOLDER_ID = os.getenv("G-DRIVE_CV_STORE_FOLDER_ID") # Change this to your source folder ID
-TARGET_FOLDER_ID = os.getenv("G-DRIVE_CV_MARKDOWN_FOLDER_ID")  # Change this to your target folder ID
-
-# ---------------------------- Normalize document ID ----------------------------
-
-def normalize_doc_id(doc_id):
-    """Normalize the document ID to ensure it matches the stored ID in Pinecone."""
-    return re.sub(r'\s+', '_', doc_id)
-
-# ---------------------------- Check if document exists in Pinecone ----------------------------
-
-def document_exists_in_pinecone(doc_id, namespace):
-    """Check if a document exists in the specified namespace."""
-    normalized_doc_id = normalize_doc_id(doc_id)
-    try:
-        fetch_response = pinecone_index.fetch(ids=[normalized_doc_id], namespace=namespace)
-        if fetch_response and 'vectors' in fetch_response and normalized_doc_id in fetch_response['vectors']:
-            print(f"Document '{normalized_doc_id}' exists in Pinecone.")
-            return True
-    except Exception as e:
-        print(f"Error checking document existence in Pinecone: {e}")
-    return False
-
-# ---------------------------- Convert PDF to Markdown ----------------------------
-
-def convert_pdf_to_markdown(pdf_content):
-    """Convert PDF content to Markdown format."""
-    try:
-        reader = PdfReader(io.BytesIO(pdf_content))
-        text = "".join(page.extract_text() for page in reader.pages if page.extract_text())
-        return markdownify.markdownify(text)
-    except Exception as e:
-        print(f"Error converting PDF to Markdown: {e}")
-        return None
-
-# ---------------------------- Generate Embeddings ----------------------------
-
-def generate_embeddings(text):
-    """Generate embeddings for the provided text."""
-    try:
-        embedding = embed_model.get_text_embedding(text)
-        return embedding
-    except Exception as e:
-        print(f"Error generating embeddings: {e}")
-        return None
-
-# ---------------------------- Generate Sparse Vectors (BM25) ----------------------------
-
-
-def generate_bm25_sparse_vector(texts):
-    try:
-        tokenized_corpus = [text.split() for text in texts]
-        bm25 = BM25Okapi(tokenized_corpus)
-        sparse_vectors = [bm25.get_scores(doc_tokens) for doc_tokens in tokenized_corpus]
-        return sparse_vectors
-    except Exception as e:
-        print(f"Error generating BM25 sparse vectors: {e}")
-        return None
-
-# ---------------------------- Upload Markdown to Google Drive ----------------------------
-
-
-def upload_markdown_to_drive(markdown_content, filename, folder_id):
-    """Upload Markdown file to Google Drive if it doesn't already exist in the folder."""
-    try:
-        # Check if the file already exists in the target folder
-        existing_files = drive_service.files().list(
-            q=f"'{folder_id}' in parents and name='{filename}'",
-            fields="files(id, name)"
-        ).execute()
-
-        if existing_files.get('files'):
-            print(f"File '{filename}' already exists in the folder. Skipping upload.")
-            return  # Skip upload if file exists
-
-        # If file doesn't exist, upload the new file
-        file_metadata = {
-            'name': filename,
-            'parents': [folder_id],
-            'mimeType': 'text/markdown'
-        }
-        media = MediaIoBaseUpload(io.BytesIO(markdown_content.encode("utf-8")), mimetype='text/markdown')
-        drive_service.files().create(body=file_metadata, media_body=media).execute()
-        print(f"Successfully uploaded {filename} to Google Drive folder.")
-    except Exception as e:
-        print(f"Error uploading {filename} to Google Drive: {e}")
 
-# ---------------------------- Process PDFs from Google Drive ----------------------------
+# The clients, stores and ingestion stages are set up in backend/ingestion_stages.py (shared with Re-run_part_to_pinecone.py)
 
+LISTING_CHECKPOINT = "source_listing_page_token"
 
-def process_pdfs_from_drive():
-    """Fetch, process, and store PDFs from Google Drive with pagination."""
-    page_token = None  # Initialize page token for pagination
+# ---------------------------- List PDFs in Google Drive ----------------------------
 
-    while True:
-        # ---------------------------- Fetch files from Google Drive ----------------------------
 
-        results = drive_service.files().list(
-            q=f"'{SOURCE_FOLDER_ID}' in parents and mimeType='application/pdf'",
-            pageSize=100,  # Fetch up to 100 files per API call
-            fields="nextPageToken, files(id, name)",  # Include nextPageToken for pagination
-            pageToken=page_token  # Use the page token to get the next set of files
-        ).execute()
+def list_source_pdfs():
+    """Yield the PDFs in the source folder that still need ingesting, resuming where an interrupted run stopped."""
+    # Files an interrupted or failed run left unfinished go first
+    resumed = set()
+    for entry in manifest.unfinished():
+        print(f"Resuming {entry['file_name']} (stopped at '{entry['stage']}', {entry['status']}).")
+        resumed.add(entry['file_id'])
+        manifest.start(entry['file_id'], entry['file_name'], entry['doc_id'], entry['md5'], entry['modified_time'])
+        yield work_item(entry['file_id'], entry['file_name'], entry['md5'], entry['modified_time'], entry['markdown_file_id'])
+
+    page_token = manifest.get_checkpoint(LISTING_CHECKPOINT)  # Set while a listing is part way through
+    if page_token:
+        print("Resuming the folder listing from the last checkpoint.")
+
+    while True:
+        try:
+            results = get_drive_service().files().list(
+                q=f"'{SOURCE_FOLDER_ID}' in parents and mimeType='application/pdf' and trashed=false",
+                pageSize=100,  # Fetch up to 100 files per API call
+                fields="nextPageToken, files(id, name, md5Checksum, modifiedTime)",
+                pageToken=page_token  # Use the page token to get the next set of files
+            ).execute()
+        except HttpError as e:
+            if page_token is None or e.resp.status != 400:
+                raise
+            print("The saved listing checkpoint has expired. Listing the folder from the start.")
+            page_token = None
+            manifest.set_checkpoint(LISTING_CHECKPOINT, None)
+            continue
 
         files = results.get('files', [])
         if not files:
             print("No more PDF files found in the specified folder.")
-            break
 
+        items = []
         for file in files:
-            file_id = file['id']
-            file_name = file['name']
-            print(f"Processing file: {file_name} (ID: {file_id})")
-
-            try:
-                # ---------------------------- Download the PDF ----------------------------
-
-                request = drive_service.files().get_media(fileId=file_id)
-                pdf_content = request.execute()
-
-                if not pdf_content:
-                    print(f"Failed to download {file_name}.")
-                    continue
-
-                # ---------------------------- Convert to Markdown ----------------------------
-
-                markdown_content = convert_pdf_to_markdown(pdf_content)
-                if not markdown_content:
-                    print(f"Failed to convert {file_name} to Markdown.")
-                    continue
-
-                # ---------------------------- Upload Markdown to Drive ----------------------------
-
-                markdown_filename = f"{os.path.splitext(file_name)[0]}.md"
-                upload_markdown_to_drive(markdown_content, markdown_filename, TARGET_FOLDER_ID)
-
-                # ---------------------------- Generate and upsert embeddings into Pinecone ----------------------------
-
-                doc_id = os.path.splitext(file_name)[0]
-                normalized_doc_id = normalize_doc_id(doc_id)
-
-                if document_exists_in_pinecone(normalized_doc_id, namespace):
-                    print(f"Document '{normalized_doc_id}' already exists in Pinecone. Skipping upsert.")
-                    continue
-
-                # Generate dense and sparse vectors
-
-                dense_embedding = generate_embeddings(markdown_content)
-                sparse_vectors = generate_bm25_sparse_vector([markdown_content])
-
-                if dense_embedding and sparse_vectors:
-                    # Prepare sparse vector data for upsert
+            if file['id'] in resumed:
+                continue
+            # Unchanged since it was ingested: skip without any network call
+            if manifest.is_current(file['id'], file.get('md5Checksum'), file.get('modifiedTime')):
+                continue
+            entry = manifest.get(file['id'])
+            items.append(work_item(file['id'], file['name'], file.get('md5Checksum'), file.get('modifiedTime'),
+                                   entry['markdown_file_id'] if entry else None))
+
+        # Files the manifest has never seen under this id or name were ingested before it existed, if at all:
+        # check those with one multi-id fetch for the page instead of one fetch per file
+        unknown = [item for item in items if manifest.get(item['file_id']) is None and not manifest.for_doc_id(item['doc_id'])]
+        existing_ids = fetch_existing_ids(pinecone_index, [item['doc_id'] for item in unknown], namespace) if unknown else set()
+        unknown_ids = {item['file_id'] for item in unknown}
+
+        for item in items:
+            if item['file_id'] in unknown_ids and item['doc_id'] in existing_ids:
+                print(f"Document '{item['doc_id']}' already exists in Pinecone. Recording it in the manifest.")
+                manifest.adopt(item['file_id'], item['file_name'], item['doc_id'], item['md5'], item['modified_time'])
+                continue
+            manifest.start(item['file_id'], item['file_name'], item['doc_id'], item['md5'], item['modified_time'])
+            yield item
+
+        # Every file of this page is now in the manifest, so a crash from here on resumes at the next page
+        page_token = results.get('nextPageToken')
+        manifest.set_checkpoint(LISTING_CHECKPOINT, page_token)
+        if not page_token:
+            break  # No more pages, exit the loop
 
-                    sparse_vector = sparse_vectors[0]  # Get the sparse vector for the current document
-                    indices = np.nonzero(sparse_vector)[0]  # Non-zero indices
-                    values = sparse_vector[indices]  # Non-zero values
-                    sparse_data = {
-                        "indices": indices.tolist(),
-                        "values": values.tolist()
-                    }
+# ---------------------------- Process PDFs from Google Drive ----------------------------
 
-                    # Upsert the data into Pinecone with both dense and sparse vectors
 
-                    try:
-                        pinecone_index.upsert(
-                            vectors=[{
-                                "id": normalized_doc_id,
-                                "values": dense_embedding,  # Dense vector
-                                "metadata": {"text": markdown_content},
-                                "sparse_values": sparse_data  # Sparse vector data
-                            }],
-                            namespace=namespace
-                        )
-                        print(f"Upserted document '{normalized_doc_id}' into Pinecone with both dense and sparse vectors.")
-                    except Exception as e:
-                        print(f"Error upserting vectors for document '{normalized_doc_id}': {e}")
+def process_pdfs_from_drive():
+    """Fetch, process, and store new or changed PDFs from Google Drive through the staged ingestion pipeline."""
+    pdf_extractor.start()  # Start the extraction workers before the first PDF arrives
+    upsert_buffer = new_upsert_buffer()
+    pipeline = new_ingestion_pipeline(upsert_buffer)
+    with upsert_buffer:
+        stats = pipeline.run(list_source_pdfs())
+    print(f"Ingestion finished in {stats.pop('elapsed_seconds')}s.")
+    for stage_name, stage_stats in stats.items():
+        print(f"  {stage_name}: {stage_stats}")
+    print(f"Embedded {batch_embedder.tokens} tokens in {batch_embedder.requests} requests.")
+    print(f"Upserted {upsert_buffer.upserted} documents in {upsert_buffer.requests} requests.")
+    if upsert_buffer.failed_ids:
+        print(f"Failed to upsert {len(upsert_buffer.failed_ids)} documents: {', '.join(upsert_buffer.failed_ids)}")
+    if pdf_extractor.timeouts:
+        print(f"PDF conversion timed out for {pdf_extractor.timeouts} files.")
+    print(f"Manifest: {manifest.counts()}")
+
+# ---------------------------- Backfill Candidate Profiles ----------------------------
+
+
+def backfill_candidate_profiles():
+    """Add the ingest-time candidate profile to vectors that were upserted before profiles existed."""
+    updated = 0
+    for id_batch in pinecone_index.list(namespace=namespace):
+        fetch_response = pinecone_index.fetch(ids=list(id_batch), namespace=namespace)
+        for vector_id, vector in fetch_response['vectors'].items():
+            metadata = vector['metadata'] or {}
+            if metadata.get('profile_version') == PROFILE_VERSION:
+                continue
+            try:
+                profile_metadata = profile_to_metadata(extract_cv_profile(openai_client, metadata.get('text', ''), extraction_store))
+                pinecone_index.update(id=vector_id, set_metadata=profile_metadata, namespace=namespace)
+                updated += 1
+                print(f"Backfilled profile for '{vector_id}'.")
             except Exception as e:
-                print(f"Error processing file {file_name}: {e}")
-
-        # ---------------------------- Update page token to fetch the next page ----------------------------
-
-        page_token = results.get('nextPageToken')
-        if not page_token:
-            break  # No more pages, exit the loop
+                print(f"Error backfilling profile for '{vector_id}': {e}")
+    print(f"Backfilled {updated} candidate profiles.")
+
+# ---------------------------- Re-encode Sparse Vectors ----------------------------
+
+
+def reencode_sparse_vectors():
+    """Rebuild the BM25 corpus statistics from every stored CV, then rewrite each vector's sparse values."""
+    texts = {}
+    for id_batch in pinecone_index.list(namespace=namespace):
+        fetch_response = pinecone_index.fetch(ids=list(id_batch), namespace=namespace)
+        for vector_id, vector in fetch_response['vectors'].items():
+            texts[vector_id] = (vector['metadata'] or {}).get('text', '')
+
+    # First pass: corpus statistics, so every document is encoded against the same average length
+    for vector_id, text in texts.items():
+        sparse_encoder.fit_document(vector_id, text)
+
+    for vector_id, text in texts.items():
+        sparse_data = sparse_encoder.encode_document(text)
+        if not sparse_data:
+            continue
+        try:
+            pinecone_index.update(id=vector_id, sparse_values=sparse_data, namespace=namespace)
+            print(f"Re-encoded sparse vector for '{vector_id}'.")
+        except Exception as e:
+            print(f"Error re-encoding sparse vector for '{vector_id}': {e}")
 
 # ---------------------------- Main Section ----------------------------
 
 if __name__ == "__main__":
-    print("Processing PDFs from Google Drive...")
-    process_pdfs_from_drive()
+    if "--backfill-profiles" in sys.argv:
+        print("Backfilling candidate profiles in Pinecone...")
+        backfill_candidate_profiles()
+    elif "--reencode-sparse" in sys.argv:
+        print("Re-encoding sparse vectors in Pinecone...")
+        reencode_sparse_vectors()
+    else:
+        print("Processing PDFs from Google Drive...")
+        process_pdfs_from_drive()
@@ -1,34 +1,31 @@
 import os
-from pinecone import Index, ServerlessSpec
+import sys
+import requests
 from llama_index.embeddings.openai import OpenAIEmbedding
-from pinecone import Pinecone
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from local_vector_store import open_vector_index
+from vector_batching import fetch_existing_ids, UpsertBuffer
+
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OpenAI_Key")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 
 os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
-os.environ["PINECONE_API_KEY"] = PINECONE_API_KEY
+if PINECONE_API_KEY:        # not needed with VECTOR_STORE=local
+    os.environ["PINECONE_API_KEY"] = PINECONE_API_KEY
 
 #-----------------------------------------------Create Pinecone Index-----------------------------------------------------
 
 examples_namespace = "examples_and_instructions"
-pc = Pinecone(api_key=PINECONE_API_KEY)
 index_name = "database"
 namespace = examples_namespace
 embedding_dimension = 1536
 
-if index_name not in pc.list_indexes().names():
-    pc.create_index(
-        name=index_name,
-        dimension=embedding_dimension,
-        metric="dotproduct",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
-    )
-
-pinecone_index = pc.Index(index_name)
+# Pinecone index with dotproduct metric, or the local engine with VECTOR_STORE=local
+pinecone_index = open_vector_index(index_name, dimension=embedding_dimension, create_if_missing=True)
 
 embed_model = OpenAIEmbedding()
 
@@ -123,43 +120,32 @@ Mandatory Keywords to Extract:
 
 #----------------------------------Function For Store Examples & Instructions in Pinecone--------------------------------------
 
-def check_existence_in_pinecone(ids, namespace):
-    try:
-        fetch_response = pinecone_index.fetch(ids=ids, namespace=namespace)
-        return fetch_response.get("vectors", {})
-    except Exception as e:
-        print(f"Error checking existence in Pinecone: {e}")
-        return {}
-
 def store_examples_and_instructions_with_check():
     
     instruction_id = "instructions"
-    existing_vectors = check_existence_in_pinecone([instruction_id], examples_namespace)
-    
-    if instruction_id not in existing_vectors:
-        print("Instructions do not exist. Adding to Pinecone...")
-        instruction_embedding = embed_model.get_text_embedding(instructions)
-        pinecone_index.upsert([
-            {
+    example_ids = [f"example_{i+1}" for i in range(len(examples))]
+
+    # One fetch for the whole seed set, one batched upsert for whatever is missing
+    existing_ids = fetch_existing_ids(pinecone_index, [instruction_id] + example_ids, examples_namespace)
+
+    with UpsertBuffer(pinecone_index, examples_namespace) as upsert_buffer:
+        if instruction_id not in existing_ids:
+            print("Instructions do not exist. Adding to Pinecone...")
+            instruction_embedding = embed_model.get_text_embedding(instructions)
+            upsert_buffer.add({
                 "id": instruction_id,
                 "values": instruction_embedding,
                 "metadata": {"type": "instruction", "content": instructions}
-            }
-        ], namespace=examples_namespace)
-        print(f"Upserted vectors: 100%|{'█' * 50}| 1/1 [00:00<00:00]") 
-    else:
-        print("Instructions already exist in Pinecone. Skipping upsert.")
-
-    # Check and store examples
-    for i, example in enumerate(examples):
-        example_id = f"example_{i+1}"
-        existing_vectors = check_existence_in_pinecone([example_id], examples_namespace)
-        
-        if example_id not in existing_vectors:
-            print(f"Example {i+1} does not exist. Adding to Pinecone...")
-            example_embedding = embed_model.get_text_embedding(example["job_description"])
-            pinecone_index.upsert([
-                {
+            })
+        else:
+            print("Instructions already exist in Pinecone. Skipping upsert.")
+
+        # Check and store examples
+        for i, (example_id, example) in enumerate(zip(example_ids, examples)):
+            if example_id not in existing_ids:
+                print(f"Example {i+1} does not exist. Adding to Pinecone...")
+                example_embedding = embed_model.get_text_embedding(example["job_description"])
+                upsert_buffer.add({
                     "id": example_id,
                     "values": example_embedding,
                     "metadata": {
@@ -167,10 +153,23 @@ def store_examples_and_instructions_with_check():
                         "job_description": example["job_description"],
                         "mandatory_keywords": example["mandatory_keywords"]
                     }
-                }
-            ], namespace=examples_namespace)
-            print(f"Upserted vectors: 100%|{'█' * 50}| 1/1 [00:00<00:00]") 
-        else:
-            print(f"Example {i+1} already exists in Pinecone. Skipping upsert.")
+                })
+            else:
+                print(f"Example {i+1} already exists in Pinecone. Skipping upsert.")
+
+    if upsert_buffer.failed_ids:
+        print(f"Failed to upsert: {', '.join(upsert_buffer.failed_ids)}")
 
 store_examples_and_instructions_with_check()
+
+#----------------------------------Tell a Running Backend to Reload the Seed Set--------------------------------------
+
+# The backend keeps these vectors in memory. Set BACKEND_URL (e.g. http://localhost:8000) to refresh it after seeding.
+backend_url = os.getenv("BACKEND_URL")
+if backend_url:
+    try:
+        response = requests.post(f"{backend_url.rstrip('/')}/examples/refresh", timeout=30)
+        response.raise_for_status()
+        print(f"Backend reloaded {response.json().get('loaded')} examples and instructions.")
+    except Exception as e:
+        print(f"Error refreshing examples in the backend: {e}")
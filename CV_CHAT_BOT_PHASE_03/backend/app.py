@@ -1,20 +1,74 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse, FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import uvicorn
+import time
+import json
+import asyncio
+from contextlib import asynccontextmanager, aclosing
 from model_for_phase_03 import (
-    rank_and_validate_cvs,
-    query_cv_by_id,
-    start_chatbot_with_cv,
-    show_cv,
-    retrieve_examples_and_instructions,
-    refine_user_prompt_with_llm,
-    extract_mandatory_conditions
+    arank_and_validate_cvs,
+    astream_rank_and_validate_cvs,
+    aquery_cv_by_id,
+    astart_chatbot_with_cv,
+    ashow_cv,
+    afind_cv_pdf,
+    aget_cv_pdf,
+    release_cv_pdf,
+    aretrieve_examples_and_instructions,
+    arefine_user_prompt_with_llm,
+    aextract_mandatory_conditions,
+    refresh_example_index,
+    refresh_drive_file_index,
+    DRIVE_INDEX_REFRESH_SECONDS,
+    acreate_chat_session,
+    asend_chat_message,
+    close_chat_session,
+    chat_sessions,
+    aget_cv_chat_context,
+    astream_cv_answer,
+    astream_session_message,
+    acompare_candidates,
+    astream_compare_candidates,
+    CHAT_COMPARE_MAX_CVS,
+    run_blocking,
+    shutdown_executor
 )
+from metrics import render_metrics, http_request_duration
 import os
 
-app = FastAPI()
+
+async def expire_chat_sessions():
+    while True:
+        await asyncio.sleep(60)
+        expired = chat_sessions.expire_idle()
+        if expired:
+            print(f"Expired {expired} idle chat sessions.")
+
+
+async def refresh_drive_index():
+    while True:
+        try:
+            await run_blocking(refresh_drive_file_index)
+        except Exception as e:
+            print(f"Error refreshing the Google Drive file index: {e}")
+        await asyncio.sleep(DRIVE_INDEX_REFRESH_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_blocking(refresh_example_index)
+    session_sweeper = asyncio.create_task(expire_chat_sessions())
+    drive_index_refresher = asyncio.create_task(refresh_drive_index())
+    yield
+    session_sweeper.cancel()
+    drive_index_refresher.cancel()
+    shutdown_executor()
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",  # Allow frontend running on localhost (React app)
@@ -33,6 +87,25 @@ app.add_middleware(
 )
 
 
+# Route templates (not raw paths) keep the label set bounded.
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        http_request_duration.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=str(status)
+        )
+
+
 class JobDescription(BaseModel):
     description: str
 
@@ -46,6 +119,17 @@ class ChatbotRequest(BaseModel):
 class ShowCVRequest(BaseModel):
     cv_id: str
 
+class ChatSessionRequest(BaseModel):
+    cv_id: str
+
+class ChatMessage(BaseModel):
+    message: str
+
+class CompareRequest(BaseModel):
+    cv_ids: list[str]
+    question: str
+    summarize: bool = True
+
 
 #-------------------------------------------------Rank CV Endpoint--------------------------------------------------
 
@@ -55,15 +139,47 @@ async def rank_cvs(job_description: JobDescription):
     Ranks CVs based on the job description provided.
     """
     try:
-        examples, instructions = retrieve_examples_and_instructions(job_description.description)
-        refined_JD = refine_user_prompt_with_llm(job_description.description, examples, instructions)
-        mandatory_conditions, keywords = extract_mandatory_conditions(refined_JD)
-        ranked_cvs = rank_and_validate_cvs(refined_JD, mandatory_conditions, keywords)
+        examples, instructions = await aretrieve_examples_and_instructions(job_description.description)
+        refined_JD = await arefine_user_prompt_with_llm(job_description.description, examples, instructions)
+        mandatory_conditions, keywords = await aextract_mandatory_conditions(refined_JD)
+        ranked_cvs = await arank_and_validate_cvs(refined_JD, mandatory_conditions, keywords)
         return {"ranked_cvs": ranked_cvs}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+#-------------------------------------------------Streaming Rank CV Endpoint--------------------------------------------------
+
+@app.post("/rank_cvs/stream")
+async def rank_cvs_stream(job_description: JobDescription):
+    """
+    Same ranking as /rank_cvs, streamed as NDJSON (one JSON object per line):
+      {"type": "matches", "count": n}        once the Pinecone query returns
+      {"type": "candidate", "cv": {...}}     for each valid CV as soon as it is validated
+      {"type": "done", "ranked_cvs": [...]}  the final order, sorted by score
+      {"type": "error", "detail": "..."}     if the pipeline fails part way
+    """
+    async def events():
+        try:
+            examples, instructions = await aretrieve_examples_and_instructions(job_description.description)
+            refined_JD = await arefine_user_prompt_with_llm(job_description.description, examples, instructions)
+            mandatory_conditions, keywords = await aextract_mandatory_conditions(refined_JD)
+
+            # aclosing: a client disconnect cancels the extractions still in flight right away
+            async with aclosing(astream_rank_and_validate_cvs(refined_JD, mandatory_conditions, keywords)) as ranking:
+                async for event, payload in ranking:
+                    if event == "matches":
+                        yield json.dumps({"type": "matches", "count": payload}) + "\n"
+                    elif event == "candidate":
+                        yield json.dumps({"type": "candidate", "cv": payload}) + "\n"
+                    else:
+                        yield json.dumps({"type": "done", "ranked_cvs": payload}) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 #-------------------------------------------------Query CV Endpoint-----------------------------------------------------------
 
 
@@ -73,7 +189,7 @@ async def query_cv(cv_query: CVQuery):
     Retrieves a CV's content by its ID.
     """
     try:
-        cv_text = query_cv_by_id(cv_query.cv_id)
+        cv_text = await aquery_cv_by_id(cv_query.cv_id)
         if cv_text:
             return {"cv_id": cv_query.cv_id, "cv_text": cv_text}
         else:
@@ -91,29 +207,252 @@ async def chatbot(query: ChatbotRequest):
     Starts a chatbot session with a specific CV and answers a user's question.
     """
     try:
-        response = start_chatbot_with_cv(query.cv_id, query.question)
+        response = await astart_chatbot_with_cv(query.cv_id, query.question)
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+#-------------------------------------------Candidate Comparison Endpoints-----------------------------------------------
+
+def check_compare_request(request):
+    if not request.cv_ids:
+        raise HTTPException(status_code=400, detail="cv_ids must not be empty.")
+    if len(set(request.cv_ids)) > CHAT_COMPARE_MAX_CVS:
+        raise HTTPException(status_code=400, detail=f"At most {CHAT_COMPARE_MAX_CVS} CVs can be compared at once.")
+
+
+@app.post("/chatbot/compare")
+async def compare_candidates(request: CompareRequest):
+    """
+    Asks one question about several CVs concurrently and returns every answer plus a combined comparison.
+    """
+    check_compare_request(request)
+    try:
+        return await acompare_candidates(request.cv_ids, request.question, request.summarize)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/chatbot/compare/stream")
+async def compare_candidates_stream(request: CompareRequest):
+    """
+    Same as /chatbot/compare, streamed as NDJSON:
+      {"type": "answer", "answer": {"cv_id", "answer", "error"}}   for each CV as soon as it is answered
+      {"type": "summary", "summary": "..."}                         the combined comparison (if requested)
+      {"type": "done", "answers": [...]}                            all answers in request order
+    """
+    check_compare_request(request)
+
+    async def events():
+        try:
+            async with aclosing(astream_compare_candidates(request.cv_ids, request.question, request.summarize)) as comparison:
+                async for event, payload in comparison:
+                    if event == "answer":
+                        yield json.dumps({"type": "answer", "answer": payload}) + "\n"
+                    elif event == "summary":
+                        yield json.dumps({"type": "summary", "summary": payload}) + "\n"
+                    else:
+                        yield json.dumps({"type": "done", "answers": payload}) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+#-------------------------------------------Streaming Chat Endpoints-----------------------------------------------
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def stream_chat_answer(tokens):
+    """
+    Server-Sent Events for a streamed answer: one `data: {"token": ...}` event per token, then
+    `event: done` with the full response, or `event: error`. When the client disconnects Starlette
+    cancels this generator, and closing `tokens` stops the LLM generation.
+    """
+    async def events():
+        answer = ""
+        try:
+            async with aclosing(tokens):
+                async for token in tokens:
+                    answer += token
+                    yield sse_event({"token": token})
+            yield sse_event({"response": answer}, event="done")
+        except Exception as e:
+            yield sse_event({"detail": str(e)}, event="error")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.post("/chatbot/stream")
+async def chatbot_stream(query: ChatbotRequest):
+    """
+    Same as /chatbot, with the answer streamed token by token as Server-Sent Events.
+    """
+    try:
+        context, error = await aget_cv_chat_context(query.cv_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if context is None:
+        raise HTTPException(status_code=404, detail=error)
+    return stream_chat_answer(astream_cv_answer(context, query.question))
+
+
+@app.post("/chat/sessions/{session_id}/messages/stream")
+async def post_chat_message_stream(session_id: str, message: ChatMessage):
+    """
+    Same as posting a session message, with the answer streamed token by token as Server-Sent Events.
+    """
+    session = chat_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Chat session not found or expired.")
+    return stream_chat_answer(astream_session_message(session, message.message))
+
+
+#-------------------------------------------Chat Session Endpoints-----------------------------------------------
+
+
+@app.post("/chat/sessions")
+async def create_chat_session(request: ChatSessionRequest):
+    """
+    Opens a multi-turn chat about one CV. The CV is loaded once for the whole session.
+    """
+    try:
+        session, error = await acreate_chat_session(request.cv_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if session is None:
+        raise HTTPException(status_code=404, detail=error)
+    return {"session_id": session.session_id, "cv_id": session.cv_id, "idle_timeout": chat_sessions.idle_timeout}
+
+
+@app.post("/chat/sessions/{session_id}/messages")
+async def post_chat_message(session_id: str, message: ChatMessage):
+    """
+    Answers a message with the session's conversation so far as context.
+    """
+    try:
+        response = await asend_chat_message(session_id, message.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if response is None:
+        raise HTTPException(status_code=404, detail="Chat session not found or expired.")
+    return {"session_id": session_id, "response": response}
+
+
+@app.delete("/chat/sessions/{session_id}")
+async def delete_chat_session(session_id: str):
+    """
+    Closes a chat session and frees its conversation memory.
+    """
+    if not close_chat_session(session_id):
+        raise HTTPException(status_code=404, detail="Chat session not found or expired.")
+    return {"closed": True}
+
+
+#-------------------------------------Refresh Examples Endpoint--------------------------------------------
+
+
+@app.post("/examples/refresh")
+async def refresh_examples():
+    """
+    Reloads the in-process copy of the examples and instructions after the seed set changes.
+    """
+    loaded = await run_blocking(refresh_example_index)
+    if not loaded:
+        raise HTTPException(status_code=500, detail="Failed to load examples and instructions.")
+    return {"loaded": loaded}
+
+
+#-------------------------------------Metrics Endpoint--------------------------------------------
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Per-stage latency histograms, counters and cache statistics in the Prometheus text format.
+    Values are kept per process: with several uvicorn workers, each worker reports its own.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 #-------------------------------------Show CV Endpoint--------------------------------------------
 
 
 @app.post("/show_cv")
 async def handle_show_cv(request: ShowCVRequest):
     """
-    Fetches metadata or a preview for a CV by its ID.
+    Finds the original PDF of a CV and returns the URL it is served from (see GET /cvs/{cv_id}/pdf).
     """
     try:
-        # Assuming `show_cv` checks for file existence and returns a success message
-        result = show_cv(request.cv_id)
-        if result["success"]:
-            return {"message": result["message"]}
-        else:
-            raise HTTPException(status_code=404, detail=result["message"])
+        result = await ashow_cv(request.cv_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error showing CV: {str(e)}")
+    if not result["success"]:
+        raise HTTPException(status_code=404, detail=result["message"])
+    return {"message": result["message"], "pdf_url": result["pdf_url"], "file_name": result["file_name"]}
+
+
+class PinnedFileResponse(FileResponse):
+    """
+    FileResponse that calls release() once the body is sent or the client has gone away, so the
+    cached PDF cannot be evicted while it is being read.
+    """
+
+    def __init__(self, *args, release, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
+def etag_matches(if_none_match, etag):
+    if if_none_match is None:
+        return False
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+@app.get("/cvs/{cv_id}/pdf")
+async def get_cv_pdf_file(cv_id: str, request: Request):
+    """
+    Streams the original CV PDF from the local cache (downloaded from Drive on first view).
+    The ETag is the file's MD5 from the Drive file index, so If-None-Match revalidation answers 304
+    without touching the PDF, and Range requests get 206 partial content for progressive loading
+    in the browser viewer.
+    """
+    try:
+        file, error = await afind_cv_pdf(cv_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading CV PDF: {str(e)}")
+    if file is None:
+        raise HTTPException(status_code=404, detail=error)
+
+    etag = f'"{file["md5Checksum"]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=3600"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        path = await aget_cv_pdf(file)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading CV PDF: {str(e)}")
+    return PinnedFileResponse(
+        path,
+        media_type="application/pdf",
+        filename=file["name"],
+        content_disposition_type="inline",
+        headers=headers,
+        release=lambda: release_cv_pdf(file)
+    )
 
 
 
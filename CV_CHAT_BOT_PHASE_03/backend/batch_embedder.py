@@ -0,0 +1,144 @@
+import time
+import threading
+import numpy as np
+import tiktoken
+
+
+#------------------------------------------------Request Limits------------------------------------------------
+
+# OpenAI embeddings endpoint: tokens per input, total tokens per request, inputs per request
+MAX_INPUT_TOKENS = 8191
+MAX_REQUEST_TOKENS = 300000
+MAX_REQUEST_INPUTS = 2048
+
+def token_encoding(model_name):
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+#------------------------------------------------Batch Embedder------------------------------------------------
+
+class BatchEmbedder:
+    """
+    Embeds many documents with as few requests as possible.
+
+    Texts are counted with tiktoken and packed in input order into requests that stay under the
+    per-request token and input limits. A text longer than max_input_tokens is split into token
+    windows whose embeddings are averaged (weighted by window length) and re-normalized. A failed
+    request is retried with backoff and then split in half, so only the failing inputs are lost.
+    An optional EmbeddingCache is checked first and filled with every new vector.
+
+    max_batch_size defaults to the model's embed_batch_size: get_text_embedding_batch splits larger
+    lists into several requests itself, so build the model with the batch size you want.
+    """
+
+    def __init__(self, embed_model, cache=None, encoding=None, max_input_tokens=MAX_INPUT_TOKENS,
+                 max_request_tokens=MAX_REQUEST_TOKENS, max_batch_size=None, max_retries=3, backoff_seconds=1.0):
+        self.embed_model = embed_model
+        self.cache = cache
+        self.max_input_tokens = max_input_tokens
+        self.max_request_tokens = max_request_tokens
+        self.max_batch_size = min(max_batch_size or embed_model.embed_batch_size, MAX_REQUEST_INPUTS)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.requests = 0
+        self.tokens = 0
+        self._encoding = encoding
+        self._lock = threading.Lock()
+
+    @property
+    def encoding(self):
+        if self._encoding is None:
+            self._encoding = token_encoding(self.embed_model.model_name)
+        return self._encoding
+
+    def split(self, text):
+        """
+        Return [(piece, token_count), ...]: the text itself when it fits in one input, else its token windows.
+        """
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= self.max_input_tokens:
+            return [(text, len(tokens))]
+        return [
+            (self.encoding.decode(tokens[start:start + self.max_input_tokens]), len(tokens[start:start + self.max_input_tokens]))
+            for start in range(0, len(tokens), self.max_input_tokens)
+        ]
+
+    def _pack(self, pieces):
+        """
+        Group piece indexes, in order, into requests within the token and input limits.
+        """
+        batch, batch_tokens = [], 0
+        for index, (_, _, token_count) in enumerate(pieces):
+            if batch and (len(batch) >= self.max_batch_size or batch_tokens + token_count > self.max_request_tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(index)
+            batch_tokens += token_count
+        if batch:
+            yield batch
+
+    def _embed_batch(self, indexes, pieces, vectors):
+        for attempt in range(self.max_retries):
+            try:
+                with self._lock:
+                    self.requests += 1
+                embeddings = self.embed_model.get_text_embedding_batch([pieces[index][1] for index in indexes])
+                for index, embedding in zip(indexes, embeddings):
+                    vectors[index] = embedding
+                with self._lock:
+                    self.tokens += sum(pieces[index][2] for index in indexes)
+                return
+            except Exception as e:
+                print(f"Error embedding a batch of {len(indexes)} inputs (attempt {attempt + 1}/{self.max_retries}): {e}")
+                if attempt + 1 < self.max_retries:
+                    time.sleep(self.backoff_seconds * 2 ** attempt)
+
+        if len(indexes) > 1:
+            middle = len(indexes) // 2
+            self._embed_batch(indexes[:middle], pieces, vectors)
+            self._embed_batch(indexes[middle:], pieces, vectors)
+
+    def embed(self, texts):
+        """
+        Return one embedding per text, in input order; None for empty texts and inputs that failed.
+        """
+        results = [None] * len(texts)
+        positions = {}          # uncached text -> positions in texts (duplicates are embedded once)
+        for position, text in enumerate(texts):
+            if not text:
+                continue
+            cached = self.cache.get(text) if self.cache is not None else None
+            if cached is not None:
+                results[position] = cached
+            else:
+                positions.setdefault(text, []).append(position)
+
+        unique_texts = list(positions)
+        pieces = []             # (unique text index, piece, token count)
+        for text_index, text in enumerate(unique_texts):
+            pieces.extend((text_index, piece, token_count) for piece, token_count in self.split(text))
+
+        vectors = [None] * len(pieces)
+        for batch in self._pack(pieces):
+            self._embed_batch(batch, pieces, vectors)
+
+        parts = [[] for _ in unique_texts]
+        for (text_index, _, token_count), vector in zip(pieces, vectors):
+            parts[text_index].append((vector, token_count))
+
+        for text, text_parts in zip(unique_texts, parts):
+            if any(vector is None for vector, _ in text_parts):
+                print("Error generating embeddings: a document could not be embedded.")
+                continue
+            if len(text_parts) == 1:
+                embedding = text_parts[0][0]
+            else:
+                weighted = np.average([vector for vector, _ in text_parts], axis=0, weights=[count for _, count in text_parts])
+                embedding = (weighted / np.linalg.norm(weighted)).tolist()
+            if self.cache is not None:
+                self.cache.put(text, embedding)
+            for position in positions[text]:
+                results[position] = embedding
+        return results
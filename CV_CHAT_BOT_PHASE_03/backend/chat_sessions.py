@@ -0,0 +1,98 @@
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+
+
+#------------------------------------------------Loaded CV Context------------------------------------------------
+
+class CVChatContext:
+    """
+    One CV loaded for chat: its single-CV index (one node per section chunk), a shared stateless query
+    engine for /chatbot with a streaming twin for /chatbot/stream (same retrieval and prompts), and the
+    content version (hash of the CV text) it was built from. Sessions build
+    their own chat engines on top of the same index, so a CV is fetched and indexed once however many
+    sessions use it.
+    """
+
+    def __init__(self, cv_id, version, index, size, similarity_top_k=3):
+        self.cv_id = cv_id
+        self.version = version
+        self.index = index
+        self.size = size
+        self.similarity_top_k = similarity_top_k
+        self.query_engine = index.as_query_engine(similarity_top_k=similarity_top_k)
+        self.streaming_query_engine = index.as_query_engine(similarity_top_k=similarity_top_k, streaming=True)
+
+#------------------------------------------------Chat Sessions------------------------------------------------
+
+class ChatSession:
+    """
+    A multi-turn conversation about one CV. The chat engine owns the token-budgeted history; the
+    lock keeps turns of the same session in order.
+    """
+
+    def __init__(self, cv_id, context, chat_engine):
+        self.session_id = uuid.uuid4().hex
+        self.cv_id = cv_id
+        self.context = context
+        self.chat_engine = chat_engine
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.turns = 0
+        self.lock = asyncio.Lock()
+
+class ChatSessionStore:
+    """
+    In-process session store with idle expiry. Sessions idle for longer than idle_timeout seconds are
+    dropped on the next access or sweep, and beyond max_sessions the least recently used one goes first.
+    Sessions live in the worker that created them, so run one worker or use sticky routing.
+    """
+
+    def __init__(self, idle_timeout=1800, max_sessions=1000):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, session):
+        with self._lock:
+            self._sessions[session.session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id):
+        """
+        Return a live session and mark it used, or None if it does not exist or has expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if now - session.last_used > self.idle_timeout:
+                del self._sessions[session_id]
+                return None
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def close(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def expire_idle(self):
+        """
+        Drop every idle session. Returns how many were removed.
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            expired = [session_id for session_id, session in self._sessions.items() if session.last_used < cutoff]
+            for session_id in expired:
+                del self._sessions[session_id]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,192 @@
+import ast
+import hashlib
+
+
+#------------------------------------------------Shared Text Helpers------------------------------------------------
+
+def normalize_text(input_text):
+    """
+    Normalize text by removing extra spaces, converting to lowercase, and ensuring consistency.
+    """
+    return " ".join(input_text.strip().split()).lower()
+
+def chat_completion_request(system_prompt, user_prompt):
+    """
+    Keyword arguments shared by every deterministic gpt-3.5 call, used by both the sync and async clients.
+    """
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "max_tokens": 300,
+        "temperature": 0.0,
+        "top_p": 1.0
+    }
+
+#------------------------------------------------CV Profile Extraction Prompt------------------------------------------------
+
+EXTRACTION_SYSTEM_PROMPT = "You are an assistant that extracts structured data from CV text."
+
+def build_extraction_prompt(full_text):
+    return f"""
+
+        Given the following full_text,
+        - Job_Title (remove Just get the title. remove words like junior, senior and etc. Ex: If prompt say senior engineer, remove senior word and just extract engineer.)
+
+        Given the following full_text, extract the following details ONLY from the 'skills' section:
+        - Skills (technologies, programming languages, etc)
+
+        Given the following full_text, extract the following details:
+        - Identify date ranges for job experience in the format 'YYYY-MM to YYYY-MM' or similar.
+        - If no end date is provided, assume it is the current date.
+        - Calculate the total years of experience from these date ranges and provide it as an integer.
+
+        Please ignore other sections like education or personal information when calculating total years of experience.
+
+
+        Ensure the output format is:
+        {{
+            'job_title': <job_title>,
+            'years_of_experience': <integer>,
+            'skills': ['<skill1>', '<skill2>', ...],
+        }}
+
+        full_text:
+        {full_text}
+        """
+
+def empty_extracted_info():
+    return {
+        'job_title': [],
+        'years_of_experience': 0,
+        'skills': []
+    }
+
+def parse_extraction_response(response_message):
+    """
+    Parse the LLM reply of the extraction prompt. Returns None when the reply is not a usable dict.
+    """
+    # Validate response format
+    if not response_message.startswith("{") or not response_message.endswith("}"):
+        print("Invalid response format:", response_message)
+        return None
+
+    # Parse response safely
+    try:
+        user_conditions = ast.literal_eval(response_message)
+    except (SyntaxError, ValueError) as e:
+        print(f"Error parsing response: {e}")
+        return None
+
+    # Prepare the structured output
+    return {
+        'job_title': user_conditions.get('job_title', []),
+        'years_of_experience': int(user_conditions.get('years_of_experience', 0)),
+        'skills': user_conditions.get('skills', [])
+    }
+
+def extraction_prompt_version():
+    """
+    Short hash of everything that shapes an extraction: model settings, system prompt and prompt template.
+    Editing the prompt changes the version, which invalidates previously stored extractions.
+    """
+    request = chat_completion_request(EXTRACTION_SYSTEM_PROMPT, build_extraction_prompt(""))
+    return hashlib.sha256(repr(sorted(request.items())).encode("utf-8")).hexdigest()[:16]
+
+def extract_cv_profile(client, full_text, store=None):
+    """
+    Run the extraction prompt once for a CV (used at ingest time). Returns the empty profile on failure.
+    When an ExtractionStore is given, a stored extraction for the same text is reused.
+    """
+    try:
+        if store is not None:
+            stored = store.get(full_text)
+            if stored is not None:
+                return stored
+
+        response = client.chat.completions.create(
+            **chat_completion_request(EXTRACTION_SYSTEM_PROMPT, build_extraction_prompt(full_text))
+        )
+        extracted_info = parse_extraction_response(response.choices[0].message.content.strip())
+        if extracted_info is None:
+            return empty_extracted_info()
+
+        if store is not None:
+            store.put(full_text, extracted_info)
+        return extracted_info
+    except Exception as e:
+        print(f"Error extracting CV profile: {e}")
+        return empty_extracted_info()
+
+#------------------------------------------------Profile <-> Pinecone Metadata------------------------------------------------
+
+# Bump when the shape of the stored profile changes so old vectors are picked up by the backfill again.
+PROFILE_VERSION = 1
+
+def title_text(job_title):
+    """
+    A job title as one string: LLM replies give a string, a list of titles, or nothing.
+    """
+    if isinstance(job_title, (list, tuple)):
+        return " ".join(str(title) for title in job_title)
+    return str(job_title or "")
+
+def profile_to_metadata(extracted_info):
+    """
+    Convert an extracted profile into flat, filterable Pinecone metadata fields.
+    Pinecone does not accept null values, so missing fields become "" / 0 / [].
+    """
+    try:
+        years_of_experience = int(extracted_info.get('years_of_experience') or 0)
+    except (TypeError, ValueError):
+        years_of_experience = 0
+
+    skills = sorted({normalize_text(str(skill)) for skill in extracted_info.get('skills') or [] if str(skill).strip()})
+
+    return {
+        "job_title": normalize_text(title_text(extracted_info.get('job_title'))),
+        "years_of_experience": years_of_experience,
+        "skills": skills,
+        "profile_version": PROFILE_VERSION
+    }
+
+def metadata_to_profile(metadata):
+    """
+    Read the ingest-time profile back from vector metadata. Returns None for vectors ingested without one.
+    """
+    if metadata.get('profile_version') is None:
+        return None
+    return {
+        'job_title': metadata.get('job_title', ""),
+        'years_of_experience': int(metadata.get('years_of_experience', 0)),
+        'skills': list(metadata.get('skills', []))
+    }
+
+def build_metadata_filter(mandatory_conditions):
+    """
+    Compile the mandatory conditions into a Pinecone metadata filter.
+
+    Years of experience and skills are pushed down to the index. The job title check is a substring
+    match, which Pinecone filters cannot express, so it stays in validate_cv. Vectors ingested without
+    a profile (no profile_version) always pass, and are validated through LLM extraction instead.
+    """
+    clauses = []
+
+    required_experience = mandatory_conditions.get('years_of_experience')
+    try:
+        required_experience = int(required_experience) if required_experience is not None else 0
+    except (TypeError, ValueError):
+        required_experience = 0
+    if required_experience > 0:
+        clauses.append({"years_of_experience": {"$gte": required_experience}})
+
+    required_skills = sorted({normalize_text(str(skill)) for skill in mandatory_conditions.get('skills') or [] if str(skill).strip()})
+    if required_skills:
+        clauses.append({"skills": {"$in": required_skills}})
+
+    if not clauses:
+        return None
+    profile_filter = clauses[0] if len(clauses) == 1 else {"$and": clauses}
+    return {"$or": [{"profile_version": {"$exists": False}}, profile_filter]}
@@ -0,0 +1,110 @@
+import re
+
+
+#------------------------------------------------Section Headings------------------------------------------------
+
+# Canonical section -> headings that introduce it. Matched against the whole heading line after
+# markdown markers and punctuation are stripped, so "## WORK EXPERIENCE" and "Work Experience:" both match.
+SECTION_ALIASES = {
+    "summary": ("summary", "profile", "professional summary", "career summary", "objective", "career objective", "about me"),
+    "experience": ("experience", "work experience", "professional experience", "employment", "employment history",
+                   "work history", "career history", "relevant experience"),
+    "skills": ("skills", "technical skills", "key skills", "core skills", "skill set", "skillset", "competencies",
+               "core competencies", "technologies", "tools and technologies"),
+    "education": ("education", "academic background", "academic qualifications", "educational qualifications",
+                  "qualifications", "education and training"),
+    "projects": ("projects", "key projects", "personal projects", "academic projects", "selected projects"),
+    "certifications": ("certifications", "certificates", "certification", "licenses and certifications", "courses", "training"),
+    "achievements": ("achievements", "awards", "honors", "honours", "accomplishments", "publications"),
+    "languages": ("languages",),
+    "interests": ("interests", "hobbies", "extracurricular activities", "volunteering", "volunteer experience"),
+    "references": ("references", "referees")
+}
+
+HEADING_TO_SECTION = {alias: section for section, aliases in SECTION_ALIASES.items() for alias in aliases}
+
+# "Skills: Python, Java" style lines: a known heading followed by its content on the same line
+INLINE_HEADING_PATTERN = re.compile(
+    r"^\W*(" + "|".join(sorted(map(re.escape, HEADING_TO_SECTION), key=len, reverse=True)) + r")\s*[:\-–]\s*(\S.*)$",
+    re.IGNORECASE
+)
+
+def normalize_heading(line):
+    return " ".join(re.sub(r"[#*_|:=\-–•]+", " ", line).lower().split())
+
+def section_for_line(line):
+    """
+    Return (section, remainder) when the line is a section heading, otherwise None.
+    """
+    stripped = line.strip()
+    if not stripped or len(stripped) > 60:
+        return None
+
+    section = HEADING_TO_SECTION.get(normalize_heading(stripped))
+    if section is not None:
+        return section, ""
+
+    inline = INLINE_HEADING_PATTERN.match(stripped)
+    if inline:
+        return HEADING_TO_SECTION[inline.group(1).lower()], inline.group(2)
+    return None
+
+#------------------------------------------------Chunking------------------------------------------------
+
+def split_into_windows(text, max_words, overlap_words):
+    """
+    Split text into windows of at most max_words, breaking between paragraphs where possible.
+    A paragraph longer than a window is cut by words with overlap_words of overlap.
+    """
+    windows, current, current_words = [], [], 0
+    for paragraph in re.split(r"\n\s*\n", text.strip()):
+        words = paragraph.split()
+        if not words:
+            continue
+        if current and current_words + len(words) > max_words:
+            windows.append("\n\n".join(current))
+            current, current_words = [], 0
+        if len(words) > max_words:
+            step = max(1, max_words - overlap_words)
+            for start in range(0, len(words), step):
+                windows.append(" ".join(words[start:start + max_words]))
+                if start + max_words >= len(words):
+                    break
+            continue
+        current.append(paragraph.strip())
+        current_words += len(words)
+    if current:
+        windows.append("\n\n".join(current))
+    return windows
+
+def chunk_cv(cv_text, max_words=300, overlap_words=40):
+    """
+    Split a CV into section-labelled chunks: [{"section": ..., "text": ...}, ...].
+
+    A CV that fits in one window stays a single "full_cv" chunk. Otherwise text before the first recognised
+    heading is the "header" (name, contact, often a summary), sections longer than max_words are windowed,
+    and a CV with no recognised headings is windowed as "cv_part" chunks.
+    """
+    if len(cv_text.split()) <= max_words:
+        return [{"section": "full_cv", "text": cv_text.strip()}]
+
+    sections = []
+    current_section, current_lines = "header", []
+    for line in cv_text.splitlines():
+        heading = section_for_line(line)
+        if heading is None:
+            current_lines.append(line)
+            continue
+        sections.append((current_section, "\n".join(current_lines)))
+        current_section, remainder = heading
+        current_lines = [remainder] if remainder else []
+    sections.append((current_section, "\n".join(current_lines)))
+
+    if len(sections) == 1:
+        return [{"section": "cv_part", "text": window} for window in split_into_windows(cv_text, max_words, overlap_words)]
+
+    chunks = []
+    for section, text in sections:
+        for window in split_into_windows(text, max_words, overlap_words):
+            chunks.append({"section": section, "text": window})
+    return chunks or [{"section": "full_cv", "text": cv_text.strip()}]
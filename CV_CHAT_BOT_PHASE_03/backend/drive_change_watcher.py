@@ -0,0 +1,135 @@
+import time
+
+from googleapiclient.errors import HttpError
+
+
+WATCH_FILE_FIELDS = "id, name, mimeType, parents, trashed, md5Checksum, modifiedTime"
+
+# Drive answers these when a saved page token can no longer be used; the folder has to be listed again
+EXPIRED_TOKEN_STATUSES = (400, 404, 410)
+
+#------------------------------------------------Drive Change Watcher------------------------------------------------
+
+class DriveChangeWatcher:
+    """
+    Follows one Drive folder through the changes feed instead of re-listing it: each poll is a single
+    changes.list call however large the folder is, and only the files that changed come back.
+
+    The page token is kept in a checkpoint store (get_checkpoint / set_checkpoint, e.g. the ingestion
+    manifest) and only advanced after the changes were handled, so a restart resumes where the last run
+    stopped. Without a usable token the whole folder is listed once and handed to on_resync.
+
+    The poll interval starts at min_interval, grows by backoff_factor after every quiet poll or error up
+    to max_interval, and drops back to min_interval as soon as something changes.
+
+    Handlers should only queue work: a poll does not start until they return.
+    """
+
+    def __init__(self, folder_id, service_factory, checkpoints, checkpoint_name="drive_changes_page_token",
+                 min_interval=2.0, max_interval=60.0, backoff_factor=2.0):
+        self.folder_id = folder_id
+        self.service_factory = service_factory
+        self.checkpoints = checkpoints
+        self.checkpoint_name = checkpoint_name
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.polls = 0
+
+    def in_folder(self, file):
+        return (
+            file is not None
+            and not file.get('trashed', False)
+            and file.get('mimeType') == 'application/pdf'
+            and self.folder_id in file.get('parents', [])
+        )
+
+    def list_folder(self):
+        """
+        Every PDF in the folder as {file_id: file}, listed page by page.
+        """
+        files, page_token = {}, None
+        while True:
+            response = self.service_factory().files().list(
+                q=f"'{self.folder_id}' in parents and mimeType='application/pdf' and trashed=false",
+                fields=f"nextPageToken, files({WATCH_FILE_FIELDS})",
+                pageSize=1000,
+                pageToken=page_token
+            ).execute()
+            files.update((file['id'], file) for file in response.get('files', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return files
+
+    def poll(self, page_token):
+        """
+        Read the changes feed from page_token. Returns (changed, removed, new_token): changed maps the id of
+        every PDF added or modified in the folder to its file, removed holds the ids of files deleted,
+        trashed or moved out of it (or of unrelated files, which callers ignore). The last change wins.
+        """
+        changed, removed = {}, set()
+        while True:
+            self.polls += 1
+            response = self.service_factory().changes().list(
+                pageToken=page_token,
+                spaces='drive',
+                fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({WATCH_FILE_FIELDS}))",
+                pageSize=1000
+            ).execute()
+            for change in response.get('changes', []):
+                file = change.get('file')
+                if not change.get('removed') and self.in_folder(file):
+                    changed[change['fileId']] = file
+                    removed.discard(change['fileId'])
+                else:
+                    removed.add(change['fileId'])
+                    changed.pop(change['fileId'], None)
+            if 'newStartPageToken' in response:
+                return changed, removed, response['newStartPageToken']
+            page_token = response['nextPageToken']
+
+    def _resync(self, on_resync):
+        # Taken before listing, so changes made while the listing runs are replayed by the next poll
+        start_token = self.service_factory().changes().getStartPageToken().execute()['startPageToken']
+        on_resync(self.list_folder())
+        self.checkpoints.set_checkpoint(self.checkpoint_name, start_token)
+
+    def watch(self, on_changes, on_resync, on_poll=None):
+        """
+        Poll forever. on_changes(changed, removed) gets every non-empty poll; on_resync(files) gets the full
+        folder listing when there is no saved token or Drive rejected it. on_poll(), if given, runs after
+        every poll, e.g. to retry failed files.
+        """
+        interval = self.min_interval
+        while True:
+            try:
+                page_token = self.checkpoints.get_checkpoint(self.checkpoint_name)
+                if page_token is None:
+                    print("No saved Drive change token. Listing the whole folder.")
+                    self._resync(on_resync)
+                    continue
+
+                try:
+                    changed, removed, new_token = self.poll(page_token)
+                except HttpError as e:
+                    if e.resp.status not in EXPIRED_TOKEN_STATUSES:
+                        raise
+                    print(f"Drive change token rejected ({e.resp.status}). Listing the whole folder.")
+                    self.checkpoints.set_checkpoint(self.checkpoint_name, None)
+                    continue
+
+                if changed or removed:
+                    on_changes(changed, removed)
+                    interval = self.min_interval
+                else:
+                    interval = min(interval * self.backoff_factor, self.max_interval)
+                self.checkpoints.set_checkpoint(self.checkpoint_name, new_token)
+                if on_poll is not None:
+                    on_poll()
+            except HttpError as e:
+                interval = min(interval * self.backoff_factor, self.max_interval)
+                print(f"Error reading Drive changes ({e.resp.status}), retrying in {interval:.0f}s: {e}")
+            except Exception as e:
+                interval = min(interval * self.backoff_factor, self.max_interval)
+                print(f"Error watching Drive folder, retrying in {interval:.0f}s: {e}")
+            time.sleep(interval)
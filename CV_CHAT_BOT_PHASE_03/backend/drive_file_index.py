@@ -0,0 +1,214 @@
+import re
+import time
+import threading
+from collections import Counter
+
+from fuzzywuzzy import process
+from googleapiclient.errors import HttpError
+
+
+FILE_FIELDS = "id, name, mimeType, parents, trashed, webViewLink, md5Checksum, size, modifiedTime"
+
+def normalize_string(s):
+    return re.sub(r"[\W_]+", "", s).lower()
+
+def file_key(file):
+    """
+    Lookup key of a Drive file: its name without the extension, normalized like a cv_id.
+    """
+    return normalize_string(file['name'].rsplit('.', 1)[0])
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+#------------------------------------------------Drive File Index------------------------------------------------
+
+class DriveFileIndex:
+    """
+    Resident index of the PDFs in one Drive folder, keyed by normalized file name.
+
+    The first use lists the whole folder (every page); after that refresh() applies only the Drive
+    changes feed since the last refresh, so lookups never go to Drive. An exact key match is a dict
+    lookup; on a miss, only names sharing the most trigrams with the query are scored by fuzzywuzzy.
+    """
+
+    def __init__(self, folder_id, service_factory, min_score=80, fuzzy_candidates=50, miss_refresh_seconds=10):
+        self.folder_id = folder_id
+        self.service_factory = service_factory
+        self.min_score = min_score
+        self.fuzzy_candidates = fuzzy_candidates
+        self.miss_refresh_seconds = miss_refresh_seconds
+        self._files_by_key = {}         # key -> {file_id: file}
+        self._key_by_file = {}          # file_id -> key
+        self._keys_by_trigram = {}      # trigram -> set of keys
+        self._fuzzy_results = {}        # query key -> matched key or None, cleared on every change
+        self._page_token = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    #----------------------------------------Maintenance----------------------------------------
+
+    def _add(self, file):
+        self._remove(file['id'])
+        key = file_key(file)
+        if not key:
+            return
+        files = self._files_by_key.setdefault(key, {})
+        if not files:
+            for trigram in trigrams(key):
+                self._keys_by_trigram.setdefault(trigram, set()).add(key)
+        files[file['id']] = file
+        self._key_by_file[file['id']] = key
+
+    def _remove(self, file_id):
+        key = self._key_by_file.pop(file_id, None)
+        if key is None:
+            return
+        files = self._files_by_key[key]
+        files.pop(file_id, None)
+        if not files:
+            del self._files_by_key[key]
+            for trigram in trigrams(key):
+                keys = self._keys_by_trigram.get(trigram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._keys_by_trigram[trigram]
+
+    def _in_folder(self, file):
+        return (
+            file is not None
+            and not file.get('trashed', False)
+            and file.get('mimeType') == 'application/pdf'
+            and self.folder_id in file.get('parents', [])
+        )
+
+    def rebuild(self):
+        """
+        List the whole folder page by page and replace the index.
+        """
+        service = self.service_factory()
+        # Taken before listing, so changes made while the listing runs are replayed by the next refresh
+        start_token = service.changes().getStartPageToken().execute()['startPageToken']
+
+        files, page_token = [], None
+        while True:
+            response = service.files().list(
+                q=f"'{self.folder_id}' in parents and mimeType='application/pdf' and trashed=false",
+                fields=f"nextPageToken, files({FILE_FIELDS})",
+                pageSize=1000,
+                pageToken=page_token
+            ).execute()
+            files.extend(response.get('files', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+
+        with self._lock:
+            self._files_by_key, self._key_by_file, self._keys_by_trigram = {}, {}, {}
+            for file in files:
+                self._add(file)
+            self._fuzzy_results = {}
+            self._page_token = start_token
+            self._refreshed_at = time.monotonic()
+        print(f"Indexed {len(files)} CV PDFs from Google Drive.")
+
+    def apply_changes(self):
+        """
+        Apply the changes feed since the last refresh. Returns the number of changes seen.
+        """
+        service = self.service_factory()
+        page_token, seen = self._page_token, 0
+        while page_token:
+            response = service.changes().list(
+                pageToken=page_token,
+                spaces='drive',
+                fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))",
+                pageSize=1000
+            ).execute()
+            changes = response.get('changes', [])
+            seen += len(changes)
+            with self._lock:
+                for change in changes:
+                    file = change.get('file')
+                    if change.get('removed') or not self._in_folder(file):
+                        self._remove(change['fileId'])
+                    else:
+                        self._add(file)
+                if changes:
+                    self._fuzzy_results = {}
+                if 'newStartPageToken' in response:
+                    self._page_token = response['newStartPageToken']
+                self._refreshed_at = time.monotonic()
+            page_token = response.get('nextPageToken')
+        return seen
+
+    def refresh(self):
+        """
+        Bring the index up to date: a full listing the first time, the changes feed afterwards.
+        """
+        with self._refresh_lock:
+            if self._page_token is None:
+                self.rebuild()
+                return
+            try:
+                self.apply_changes()
+            except HttpError as e:
+                if e.resp.status not in (400, 404, 410):
+                    raise
+                print(f"Drive change token rejected ({e.resp.status}), re-listing the folder.")
+                self.rebuild()
+
+    #----------------------------------------Lookup----------------------------------------
+
+    def _best(self, key):
+        files = self._files_by_key.get(key)
+        if not files:
+            return None
+        return max(files.values(), key=lambda file: file.get('modifiedTime', ''))
+
+    def _fuzzy_key(self, query_key):
+        if query_key in self._fuzzy_results:
+            return self._fuzzy_results[query_key]
+
+        shared = Counter()
+        for trigram in trigrams(query_key):
+            shared.update(self._keys_by_trigram.get(trigram, ()))
+        candidates = [key for key, _ in shared.most_common(self.fuzzy_candidates)]
+
+        match = process.extractOne(query_key, candidates) if candidates else None
+        matched_key = match[0] if match and match[1] >= self.min_score else None
+        if len(self._fuzzy_results) >= 10000:
+            self._fuzzy_results = {}
+        self._fuzzy_results[query_key] = matched_key
+        return matched_key
+
+    def _lookup_local(self, query_key):
+        with self._lock:
+            file = self._best(query_key)
+            if file is None:
+                matched_key = self._fuzzy_key(query_key)
+                file = self._best(matched_key) if matched_key else None
+            return file
+
+    def lookup(self, cv_id):
+        """
+        Return the Drive file for a cv_id, or None. Served from memory; only a miss on an index older
+        than miss_refresh_seconds pulls the changes feed once before giving up.
+        """
+        query_key = normalize_string(cv_id)
+        if not query_key:
+            return None
+        if self._page_token is None:
+            self.refresh()
+
+        file = self._lookup_local(query_key)
+        if file is None and time.monotonic() - self._refreshed_at > self.miss_refresh_seconds:
+            self.refresh()
+            file = self._lookup_local(query_key)
+        return file
+
+    def __len__(self):
+        return len(self._key_by_file)
@@ -0,0 +1,40 @@
+import threading
+
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+
+
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
+
+#------------------------------------------------Google Drive Service------------------------------------------------
+
+class DriveServiceFactory:
+    """
+    Call it to get the Google Drive service of the calling thread. httplib2 (used by the Drive client) is
+    not thread-safe, so every thread gets its own service object; the service account credentials are
+    loaded once, on first use, and shared by all of them.
+    """
+
+    def __init__(self, service_account_file, scopes=DRIVE_SCOPES):
+        self.service_account_file = service_account_file
+        self.scopes = scopes
+        self._credentials = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def credentials(self):
+        with self._lock:
+            if self._credentials is None:
+                if not self.service_account_file:
+                    raise ValueError("Service_AP (the service account file) is not set in the .env file")
+                self._credentials = service_account.Credentials.from_service_account_file(
+                    self.service_account_file, scopes=self.scopes
+                )
+            return self._credentials
+
+    def __call__(self):
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = build('drive', 'v3', credentials=self.credentials(), cache_discovery=False)
+            self._local.service = service
+        return service
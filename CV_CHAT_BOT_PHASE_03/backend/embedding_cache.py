@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from llm_cache import LRUCache
+
+
+#------------------------------------------------On-Disk Embedding Cache------------------------------------------------
+
+DEFAULT_EMBEDDING_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "embeddings")
+
+def safe_file_stem(name):
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)
+
+
+class EmbeddingCache:
+    """
+    Content-hash keyed embedding cache.
+
+    Vectors are appended as raw float32 rows to one data file that is read through a memory map, and a
+    small SQLite index maps SHA-256(model + text) to the row number. A bounded LRU keeps hot vectors in
+    memory. The files are safe to share between the backend workers and the ingestion scripts: appends
+    are serialized by an IMMEDIATE transaction on the index.
+    """
+
+    def __init__(self, model_name, dimension=1536, directory=None, memory_bytes=32 * 1024 * 1024):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.row_bytes = dimension * 4
+        self.directory = directory or os.getenv("EMBEDDING_CACHE_DIR", DEFAULT_EMBEDDING_CACHE_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+
+        file_stem = f"{safe_file_stem(model_name)}_{dimension}"
+        self.data_path = os.path.join(self.directory, f"{file_stem}.f32")
+        self.index_path = os.path.join(self.directory, f"{file_stem}.sqlite3")
+
+        self.memory = LRUCache(
+            f"embeddings:{model_name}",
+            max_entries=max(1, memory_bytes // self.row_bytes),
+            max_bytes=memory_bytes,
+            sizeof=lambda vector: vector.nbytes
+        )
+        self._local = threading.local()
+        self._mmap = None
+        self._mmap_lock = threading.Lock()
+
+        open(self.data_path, "ab").close()
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def key_for(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _rows(self, min_rows):
+        """
+        Return the memory-mapped matrix, remapping when another writer has grown the file past it.
+        """
+        with self._mmap_lock:
+            if self._mmap is None or self._mmap.shape[0] < min_rows:
+                rows = os.path.getsize(self.data_path) // self.row_bytes
+                self._mmap = np.memmap(self.data_path, dtype=np.float32, mode="r", shape=(rows, self.dimension)) if rows else None
+            return self._mmap
+
+    def get_vector(self, text):
+        """
+        Return the cached embedding as a float32 array, or None.
+        """
+        key = self.key_for(text)
+        vector = self.memory.get(key)
+        if vector is not None:
+            return vector
+
+        try:
+            row = self._connection().execute("SELECT row FROM embeddings WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading embedding cache: {e}")
+            return None
+        if row is None:
+            return None
+
+        matrix = self._rows(row[0] + 1)
+        if matrix is None or matrix.shape[0] <= row[0]:
+            return None
+        vector = np.array(matrix[row[0]])
+        self.memory.set(key, vector)
+        return vector
+
+    def get(self, text):
+        vector = self.get_vector(text)
+        return vector.tolist() if vector is not None else None
+
+    def put(self, text, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.shape != (self.dimension,):
+            print(f"Skipping embedding cache write: expected {self.dimension} dims, got {vector.shape}")
+            return
+
+        key = self.key_for(text)
+        self.memory.set(key, vector)
+
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("SELECT 1 FROM embeddings WHERE key = ?", (key,)).fetchone() is None:
+                    with open(self.data_path, "ab") as data_file:
+                        offset = data_file.seek(0, os.SEEK_END)
+                        row, remainder = divmod(offset, self.row_bytes)
+                        if remainder:
+                            # A previous writer died mid-row; pad so rows stay aligned.
+                            data_file.write(b"\0" * (self.row_bytes - remainder))
+                            row += 1
+                        data_file.write(vector.tobytes())
+                    conn.execute("INSERT INTO embeddings (key, row) VALUES (?, ?)", (key, row))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except (sqlite3.Error, OSError) as e:
+            print(f"Error writing embedding cache: {e}")
@@ -0,0 +1,80 @@
+import threading
+import numpy as np
+
+
+#------------------------------------------------In-Process Examples Index------------------------------------------------
+
+class ExampleIndex:
+    """
+    Local copy of the small examples_and_instructions namespace.
+
+    The seeded vectors are fetched once into a normalized NumPy matrix and searched with a cosine top-k
+    in process, which saves a Pinecone round trip on every ranking request. Call refresh() whenever the
+    seed set changes.
+    """
+
+    def __init__(self, vector_index, namespace="examples_and_instructions"):
+        self.vector_index = vector_index
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._ids = []
+        self._metadata = []
+        self._matrix = None
+
+    @property
+    def loaded(self):
+        return self._matrix is not None
+
+    def refresh(self):
+        """
+        Reload every vector of the namespace. On failure the previously loaded copy is kept.
+        Returns the number of vectors loaded.
+        """
+        try:
+            ids, metadata, rows = [], [], []
+            for id_batch in self.vector_index.list(namespace=self.namespace):
+                fetch_response = self.vector_index.fetch(ids=list(id_batch), namespace=self.namespace)
+                for vector_id, vector in fetch_response['vectors'].items():
+                    ids.append(vector_id)
+                    metadata.append(dict(vector['metadata'] or {}))
+                    rows.append(vector['values'])
+
+            if not rows:
+                print(f"No vectors found in namespace '{self.namespace}'.")
+                return 0
+
+            matrix = np.asarray(rows, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.where(norms == 0, 1, norms)
+
+            with self._lock:
+                self._ids, self._metadata, self._matrix = ids, metadata, matrix
+            print(f"Loaded {len(ids)} examples and instructions into memory.")
+            return len(ids)
+        except Exception as e:
+            print(f"Error loading examples and instructions: {e}")
+            return 0
+
+    def query(self, vector, top_k=5):
+        """
+        Cosine top-k over the local copy, returned in the same shape as a Pinecone query response.
+        """
+        with self._lock:
+            ids, metadata, matrix = self._ids, self._metadata, self._matrix
+        if matrix is None:
+            raise RuntimeError("Examples index has not been loaded.")
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = matrix @ (query / norm if norm else query)
+
+        top_k = min(top_k, len(ids))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+
+        return {
+            "matches": [
+                {"id": ids[i], "score": float(scores[i]), "metadata": metadata[i]}
+                for i in top
+            ]
+        }
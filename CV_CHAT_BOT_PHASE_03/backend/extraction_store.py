@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from cv_profile import normalize_text, extraction_prompt_version
+
+
+#------------------------------------------------Persistent Extraction Store------------------------------------------------
+
+DEFAULT_EXTRACTION_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "extractions.sqlite3")
+
+
+class ExtractionStore:
+    """
+    Disk-backed store for CV profile extractions, shared by every worker process on the host.
+
+    Entries are keyed by SHA-256(prompt version + normalized CV text), so the CV text itself is never
+    duplicated and a prompt change makes every old entry unreachable. Opening the store never deletes
+anything, since workers on an older prompt may still be running; old entries are removed by prune().
+    """
+
+    def __init__(self, path=None, prompt_version=None):
+        self.path = path or os.getenv("EXTRACTION_STORE_PATH", DEFAULT_EXTRACTION_STORE_PATH)
+        self.prompt_version = prompt_version or extraction_prompt_version()
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                prompt_version TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared across threads, so each thread opens its own.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def key_for(self, full_text):
+        digest = hashlib.sha256()
+        digest.update(self.prompt_version.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(normalize_text(full_text).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, full_text):
+        """
+        Return the stored extraction for this CV text, or None.
+        """
+        try:
+            row = self._connection().execute(
+                "SELECT payload FROM extractions WHERE key = ? AND prompt_version = ?",
+                (self.key_for(full_text), self.prompt_version)
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+        except sqlite3.Error as e:
+            print(f"Error reading extraction store: {e}")
+            return None
+
+    def put(self, full_text, extracted_info):
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, prompt_version, payload, created_at) VALUES (?, ?, ?, ?)",
+                (self.key_for(full_text), self.prompt_version, json.dumps(extracted_info), time.time())
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing extraction store: {e}")
+
+    def prune(self, max_age_seconds=None):
+        """
+        Maintenance: delete the entries of other prompt versions, and with max_age_seconds also the
+        entries older than that. Returns the number of deleted entries.
+        """
+        try:
+            conn = self._connection()
+            if max_age_seconds is None:
+                cursor = conn.execute("DELETE FROM extractions WHERE prompt_version != ?", (self.prompt_version,))
+            else:
+                cursor = conn.execute(
+                    "DELETE FROM extractions WHERE prompt_version != ? OR created_at < ?",
+                    (self.prompt_version, time.time() - max_age_seconds)
+                )
+            conn.commit()
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Error pruning extraction store: {e}")
+            return 0
+
+
+if __name__ == "__main__":
+    # Run once every worker is on the current prompt, e.g. after a deploy:
+    #   python extraction_store.py [max_age_days]
+    import sys
+
+    max_age_days = float(sys.argv[1]) if len(sys.argv) > 1 else None
+    store = ExtractionStore()
+    deleted = store.prune(max_age_days * 86400 if max_age_days is not None else None)
+    print(f"Pruned {deleted} entries from {store.path}.")
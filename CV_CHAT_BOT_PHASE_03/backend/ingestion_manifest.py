@@ -0,0 +1,189 @@
+import os
+import time
+import sqlite3
+import threading
+
+
+#------------------------------------------------Ingestion Manifest------------------------------------------------
+
+DEFAULT_INGESTION_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ingestion_manifest.sqlite3")
+
+FILE_COLUMNS = ("file_id", "file_name", "doc_id", "md5", "modified_time", "stage", "status", "error",
+                "markdown_file_id", "updated_at")
+
+
+class IngestionManifest:
+    """
+    Local record of what ingestion has done with every Drive file: its content version (md5Checksum
+    and modifiedTime), the last stage it reached and whether it finished ("done"), is in progress
+    ("pending"), failed, or was removed from the folder and is being taken out of the index
+    ("removed"). Also holds named checkpoints such as the listing page token.
+
+    A re-run skips a file whose content version matches a "done" entry without any network call,
+    re-processes a file whose content changed, and picks unfinished files up again after a crash.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("INGESTION_MANIFEST_PATH", DEFAULT_INGESTION_MANIFEST_PATH)
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                file_id TEXT PRIMARY KEY,
+                file_name TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                md5 TEXT,
+                modified_time TEXT,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                markdown_file_id TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS files_doc_id ON files (doc_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_status ON files (status)")
+        conn.execute("CREATE TABLE IF NOT EXISTS checkpoints (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.commit()
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared across threads, so each thread opens its own.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _rows(self, query, params=()):
+        rows = self._connection().execute(query, params).fetchall()
+        return [dict(zip(FILE_COLUMNS, row)) for row in rows]
+
+    #----------------------------------------Files----------------------------------------
+
+    def get(self, file_id):
+        rows = self._rows(f"SELECT {', '.join(FILE_COLUMNS)} FROM files WHERE file_id = ?", (file_id,))
+        return rows[0] if rows else None
+
+    def for_doc_id(self, doc_id):
+        """
+        The files that provide this document, leaving out removed ones.
+        """
+        return self._rows(f"SELECT {', '.join(FILE_COLUMNS)} FROM files WHERE doc_id = ? AND status != 'removed'", (doc_id,))
+
+    def is_removed(self, file_id):
+        """
+        True when the file was removed from the folder, whether or not its removal has finished.
+        """
+        entry = self.get(file_id)
+        return entry is None or entry['status'] == 'removed'
+
+    def unfinished(self):
+        """
+        Files that were started but not finished (interrupted or failed), oldest first.
+        """
+        return self._rows(
+            f"SELECT {', '.join(FILE_COLUMNS)} FROM files WHERE status NOT IN ('done', 'removed') ORDER BY updated_at"
+        )
+
+    @staticmethod
+    def same_content(entry, md5, modified_time):
+        if md5 and entry['md5']:
+            return md5 == entry['md5']
+        return modified_time is not None and modified_time == entry['modified_time']
+
+    def is_current(self, file_id, md5, modified_time):
+        """
+        True when this exact content of the file has already been ingested.
+        """
+        entry = self.get(file_id)
+        return entry is not None and entry['status'] == 'done' and self.same_content(entry, md5, modified_time)
+
+    def start(self, file_id, file_name, doc_id, md5, modified_time):
+        """
+        Record that ingestion of this content version has started. The markdown file id is kept,
+        so a changed CV updates its existing markdown copy instead of creating another one.
+        """
+        conn = self._connection()
+        conn.execute(
+            """
+            INSERT INTO files (file_id, file_name, doc_id, md5, modified_time, stage, status, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, 'listed', 'pending', NULL, ?)
+            ON CONFLICT(file_id) DO UPDATE SET
+                file_name = excluded.file_name, doc_id = excluded.doc_id, md5 = excluded.md5,
+                modified_time = excluded.modified_time, stage = 'listed', status = 'pending',
+                error = NULL, updated_at = excluded.updated_at
+            """,
+            (file_id, file_name, doc_id, md5, modified_time, time.time())
+        )
+        conn.commit()
+
+    def mark(self, file_id, stage, status='pending', error=None, markdown_file_id=None):
+        # A removed file stays removed: stages still working on it must not bring it back (start() does)
+        conn = self._connection()
+        conn.execute(
+            """
+            UPDATE files SET stage = ?, status = ?, error = ?,
+                markdown_file_id = COALESCE(?, markdown_file_id), updated_at = ?
+            WHERE file_id = ? AND status != 'removed'
+            """,
+            (stage, status, error, markdown_file_id, time.time(), file_id)
+        )
+        conn.commit()
+
+    def mark_failed(self, file_id, stage, error):
+        self.mark(file_id, stage, status='failed', error=str(error)[:500])
+
+    def mark_docs(self, doc_ids, stage, status, error=None):
+        """
+        Update every pending file behind these vector ids (upserts are reported by doc_id).
+        """
+        conn = self._connection()
+        conn.executemany(
+            "UPDATE files SET stage = ?, status = ?, error = ?, updated_at = ? WHERE doc_id = ? AND status = 'pending'",
+            [(stage, status, error, time.time(), doc_id) for doc_id in doc_ids]
+        )
+        conn.commit()
+
+    def adopt(self, file_id, file_name, doc_id, md5, modified_time):
+        """
+        Record a file found already ingested by an earlier run that had no manifest as "done".
+        """
+        self.start(file_id, file_name, doc_id, md5, modified_time)
+        self.mark(file_id, 'upserted', status='done')
+
+    def mark_removed(self, file_id):
+        conn = self._connection()
+        conn.execute(
+            "UPDATE files SET stage = 'removed', status = 'removed', error = NULL, updated_at = ? WHERE file_id = ?",
+            (time.time(), file_id)
+        )
+        conn.commit()
+
+    def remove(self, file_id):
+        conn = self._connection()
+        conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+        conn.commit()
+
+    def file_ids(self):
+        return {row[0] for row in self._connection().execute("SELECT file_id FROM files").fetchall()}
+
+    def counts(self):
+        return dict(self._connection().execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall())
+
+    #----------------------------------------Checkpoints----------------------------------------
+
+    def get_checkpoint(self, name):
+        row = self._connection().execute("SELECT value FROM checkpoints WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_checkpoint(self, name, value):
+        conn = self._connection()
+        if value is None:
+            conn.execute("DELETE FROM checkpoints WHERE name = ?", (name,))
+        else:
+            conn.execute("INSERT OR REPLACE INTO checkpoints (name, value) VALUES (?, ?)", (name, value))
+        conn.commit()
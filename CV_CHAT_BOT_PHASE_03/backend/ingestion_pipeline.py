@@ -0,0 +1,145 @@
+import time
+import queue
+import threading
+
+
+#------------------------------------------------Staged Pipeline------------------------------------------------
+
+_STOP = object()
+
+class Stage:
+    """
+    One pipeline stage: func(item) returns the item for the next stage, or None to drop it.
+
+    With batch_size > 1, func receives a list of up to batch_size items (collected for at most
+    batch_wait seconds) and returns a list of the same length, for calls that are cheaper in bulk.
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=None, batch_size=1, batch_wait=0.5):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.queue_size = queue_size or max(self.workers * 2, self.batch_size * self.workers)
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+
+    def stats(self):
+        return {"processed": self.processed, "dropped": self.dropped, "errors": self.errors,
+                "busy_seconds": round(self.busy_seconds, 2)}
+
+class StagedPipeline:
+    """
+    Thread pipeline for ingestion: each stage has its own worker threads and reads from a bounded queue
+    fed by the stage before it, so downloads, parsing, embedding and upserts of different files overlap
+    while a slow stage applies backpressure instead of letting work pile up in memory.
+
+    An exception in a stage is printed and drops only the items it was given; on_error(stage_name,
+    item, error) is then called for each of them, e.g. to record the failure.
+    """
+
+    def __init__(self, stages, describe=lambda item: str(item), on_error=None):
+        self.stages = stages
+        self.describe = describe
+        self.on_error = on_error
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+        self._remaining = [stage.workers for stage in stages]
+        self._lock = threading.Lock()
+
+    def _next_batch(self, stage, inbox):
+        """
+        Block for one item, then gather more until the batch is full or batch_wait runs out.
+        Returns (items, stopped).
+        """
+        item = inbox.get()
+        if item is _STOP:
+            return [], True
+        items = [item]
+        deadline = time.monotonic() + stage.batch_wait
+        while len(items) < stage.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = inbox.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def _process(self, stage, items):
+        start = time.perf_counter()
+        try:
+            if stage.batch_size > 1:
+                results = stage.func(items)
+            else:
+                results = [stage.func(items[0])]
+        except Exception as e:
+            results = [None] * len(items)
+            with self._lock:
+                stage.errors += len(items)
+            print(f"Error in {stage.name} stage for {', '.join(self.describe(item) for item in items)}: {e}")
+            if self.on_error is not None:
+                for item in items:
+                    # A failing callback must not kill the worker, or the stages after it never get _STOP
+                    try:
+                        self.on_error(stage.name, item, e)
+                    except Exception as callback_error:
+                        print(f"Error recording the {stage.name} failure of {self.describe(item)}: {callback_error}")
+        with self._lock:
+            stage.busy_seconds += time.perf_counter() - start
+            stage.processed += len(items)
+            stage.dropped += sum(result is None for result in results)
+        return [result for result in results if result is not None]
+
+    def _worker(self, index):
+        stage = self.stages[index]
+        inbox = self._queues[index]
+        outbox = self._queues[index + 1] if index + 1 < len(self.stages) else None
+
+        stopped = False
+        while not stopped:
+            items, stopped = self._next_batch(stage, inbox)
+            if not items:
+                continue
+            for result in self._process(stage, items):
+                if outbox is not None:
+                    outbox.put(result)
+
+        # The last worker of a stage to finish stops the next stage
+        with self._lock:
+            self._remaining[index] -= 1
+            last = self._remaining[index] == 0
+        if last and outbox is not None:
+            for _ in range(self.stages[index + 1].workers):
+                outbox.put(_STOP)
+
+    def run(self, items):
+        """
+        Push every item through all stages and wait for the pipeline to drain. Returns per-stage stats.
+        """
+        start = time.perf_counter()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(target=self._worker, args=(index,), name=f"ingest-{stage.name}-{n}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        try:
+            for item in items:
+                self._queues[0].put(item)
+        finally:
+            for _ in range(self.stages[0].workers):
+                self._queues[0].put(_STOP)
+            for thread in threads:
+                thread.join()
+
+        stats = {stage.name: stage.stats() for stage in self.stages}
+        stats["elapsed_seconds"] = round(time.perf_counter() - start, 2)
+        return stats
@@ -0,0 +1,259 @@
+import os
+import io
+import re
+from dotenv import load_dotenv
+from googleapiclient.http import MediaIoBaseUpload
+from googleapiclient.errors import HttpError
+from llama_index.embeddings.openai import OpenAIEmbedding
+from openai import OpenAI
+
+from extraction_store import ExtractionStore
+from embedding_cache import EmbeddingCache
+from sparse_encoder import BM25SparseEncoder
+from cv_profile import extract_cv_profile, profile_to_metadata
+from local_vector_store import open_vector_index
+from ingestion_pipeline import Stage, StagedPipeline
+from pdf_extraction import PDFExtractor
+from vector_batching import UpsertBuffer
+from batch_embedder import BatchEmbedder
+from ingestion_manifest import IngestionManifest
+from drive_service import DriveServiceFactory
+
+# Shared by the ingestion scripts in Database_&_Others: the full folder ingestion and the folder watcher
+# run CVs through the same stages, clients and manifest.
+
+#------------------------------------------------Load Environment Variables------------------------------------------------
+
+load_dotenv()
+
+OpenAI_Key = os.getenv("OpenAI_Key")
+Pinecone_API_Key = os.getenv("PINECONE_API_KEY")
+SERVICE_ACCOUNT_FILE = os.getenv("Service_AP")  # Add the path to the service account file
+
+os.environ["OPENAI_API_KEY"] = OpenAI_Key
+if Pinecone_API_Key:        # not needed with VECTOR_STORE=local
+    os.environ["PINECONE_API_KEY"] = Pinecone_API_Key
+
+SOURCE_FOLDER_ID = os.getenv("G-DRIVE_CV_STORE_FOLDER_ID")  # CV_Storage
+TARGET_FOLDER_ID = os.getenv("G-DRIVE_CV_MARKDOWN_FOLDER_ID")  # Markdown_Cvs
+
+# get_drive_service() returns the Drive service of the calling pipeline thread
+get_drive_service = DriveServiceFactory(SERVICE_ACCOUNT_FILE)
+
+#------------------------------------------------Clients and Stores------------------------------------------------
+
+index_name = "database"
+namespace = "cvs-info"
+embedding_dimension = 1536
+
+# Pinecone index with dotproduct metric, or the local engine with VECTOR_STORE=local
+pinecone_index = open_vector_index(index_name, dimension=embedding_dimension, create_if_missing=True)
+# CVs per embedding request; the batch embedder also keeps each request under the token limits
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "100"))
+
+embed_model = OpenAIEmbedding(embed_batch_size=EMBED_BATCH_SIZE)
+embedding_cache = EmbeddingCache(embed_model.model_name, dimension=embedding_dimension)
+batch_embedder = BatchEmbedder(embed_model, cache=embedding_cache)
+openai_client = OpenAI(api_key=OpenAI_Key)
+extraction_store = ExtractionStore()
+sparse_encoder = BM25SparseEncoder()
+# Worker processes that turn PDFs into Markdown on every available core
+pdf_extractor = PDFExtractor()
+
+# What every Drive file's ingestion reached, so re-runs skip unchanged files and resume after a crash.
+# The ingestion scripts also keep their Drive listing and change tokens here.
+manifest = IngestionManifest()
+
+# Worker threads per ingestion stage. Parse threads hand PDFs to the extraction processes, one per process;
+# the other stages wait on the network, so they can run wide.
+DOWNLOAD_WORKERS = int(os.getenv("INGEST_DOWNLOAD_WORKERS", "8"))
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(pdf_extractor.workers)))
+UPLOAD_WORKERS = int(os.getenv("INGEST_UPLOAD_WORKERS", "4"))
+EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+PROFILE_WORKERS = int(os.getenv("INGEST_PROFILE_WORKERS", "8"))
+UPSERT_WORKERS = int(os.getenv("INGEST_UPSERT_WORKERS", "2"))
+
+# Vectors per upsert request. Requests are also capped by size, since each vector carries the CV text.
+UPSERT_BATCH_SIZE = int(os.getenv("INGEST_UPSERT_BATCH_SIZE", "100"))
+
+#------------------------------------------------Utility Functions------------------------------------------------
+
+def normalize_doc_id(doc_id):
+    """Normalize the document ID to ensure it matches the stored ID in Pinecone."""
+    return re.sub(r'\s+', '_', doc_id)
+
+def convert_pdf_to_markdown(pdf_content):
+    """Convert PDF content to Markdown format in the extraction worker processes."""
+    return pdf_extractor.convert(pdf_content)
+
+def generate_bm25_sparse_vector(doc_id, text):
+    """Fit the document into the shared BM25 corpus statistics and return its sparse vector."""
+    try:
+        sparse_encoder.fit_document(doc_id, text)
+        return sparse_encoder.encode_document(text)
+    except Exception as e:
+        print(f"Error generating BM25 sparse vectors: {e}")
+        return None
+
+def upload_markdown_to_drive(markdown_content, filename, folder_id, markdown_file_id=None):
+    """Upload the Markdown copy of a CV, or replace its content if it is already in the folder. Returns its file id."""
+    try:
+        drive_service = get_drive_service()
+        media = MediaIoBaseUpload(io.BytesIO(markdown_content.encode("utf-8")), mimetype='text/markdown')
+
+        # The manifest remembers the copy made by an earlier run, so no lookup is needed
+        if not markdown_file_id:
+            existing_files = drive_service.files().list(
+                q=f"'{folder_id}' in parents and name='{filename}'",
+                fields="files(id, name)"
+            ).execute().get('files', [])
+            markdown_file_id = existing_files[0]['id'] if existing_files else None
+
+        if markdown_file_id:
+            drive_service.files().update(fileId=markdown_file_id, media_body=media).execute()
+            print(f"Updated {filename} in Google Drive folder.")
+            return markdown_file_id
+
+        file_metadata = {
+            'name': filename,
+            'parents': [folder_id],
+            'mimeType': 'text/markdown'
+        }
+        created = drive_service.files().create(body=file_metadata, media_body=media, fields="id").execute()
+        print(f"Successfully uploaded {filename} to Google Drive folder.")
+        return created['id']
+    except Exception as e:
+        print(f"Error uploading {filename} to Google Drive: {e}")
+        return None
+
+def work_item(file_id, file_name, md5, modified_time, markdown_file_id=None):
+    return {
+        "file_id": file_id,
+        "file_name": file_name,
+        "doc_id": normalize_doc_id(os.path.splitext(file_name)[0]),
+        "md5": md5,
+        "modified_time": modified_time,
+        "markdown_file_id": markdown_file_id
+    }
+
+#------------------------------------------------Ingestion Stages------------------------------------------------
+
+# Each stage takes the work item dict of one file and returns it for the next stage, or None to stop there.
+# Progress is written to the manifest after every stage.
+
+def download_stage(item):
+    print(f"Processing file: {item['file_name']} (ID: {item['file_id']})")
+    try:
+        item['pdf_content'] = get_drive_service().files().get_media(fileId=item['file_id']).execute()
+    except HttpError as e:
+        if e.resp.status != 404:
+            raise
+        print(f"{item['file_name']} is no longer in Google Drive.")
+        manifest.remove(item['file_id'])
+        return None
+    if not item['pdf_content']:
+        print(f"Failed to download {item['file_name']}.")
+        manifest.mark_failed(item['file_id'], 'download', "Empty download.")
+        return None
+    manifest.mark(item['file_id'], 'downloaded')
+    return item
+
+def parse_stage(item):
+    item['markdown_content'] = convert_pdf_to_markdown(item.pop('pdf_content'))
+    if not item['markdown_content']:
+        print(f"Failed to convert {item['file_name']} to Markdown.")
+        manifest.mark_failed(item['file_id'], 'parse', "No text could be extracted.")
+        return None
+    manifest.mark(item['file_id'], 'parsed')
+    return item
+
+def upload_stage(item, target_folder_id):
+    markdown_filename = f"{os.path.splitext(item['file_name'])[0]}.md"
+    markdown_file_id = upload_markdown_to_drive(item['markdown_content'], markdown_filename, target_folder_id, item['markdown_file_id'])
+    if not markdown_file_id:
+        manifest.mark_failed(item['file_id'], 'upload', "Markdown upload failed.")
+        return None
+    manifest.mark(item['file_id'], 'uploaded', markdown_file_id=markdown_file_id)
+    return item
+
+def embed_stage(items):
+    # One embedding request for the whole batch of CVs (dense vectors)
+    embeddings = batch_embedder.embed([item['markdown_content'] for item in items])
+    for item, embedding in zip(items, embeddings):
+        item['dense_embedding'] = embedding
+        if embedding:
+            manifest.mark(item['file_id'], 'embedded')
+        else:
+            manifest.mark_failed(item['file_id'], 'embed', "Embedding failed.")
+    return [item if item['dense_embedding'] else None for item in items]
+
+def profile_stage(item):
+    markdown_content = item['markdown_content']
+
+    # Generate the sparse vector
+    item['sparse_data'] = generate_bm25_sparse_vector(item['doc_id'], markdown_content)
+    if not item['sparse_data']:
+        manifest.mark_failed(item['file_id'], 'profile', "Sparse encoding failed.")
+        return None
+
+    # Extract the candidate profile once here so ranking can filter on it without LLM calls
+    item['profile_metadata'] = profile_to_metadata(extract_cv_profile(openai_client, markdown_content, extraction_store))
+    manifest.mark(item['file_id'], 'profiled')
+    return item
+
+def upsert_stage(items, upsert_buffer):
+    # Queue the vectors with both dense and sparse values; the buffer writes them to Pinecone in batches
+    # and the manifest marks each file done once its batch is written
+    for item in items:
+        if manifest.is_removed(item['file_id']):
+            print(f"{item['file_name']} was removed from the folder meanwhile. Skipping its upsert.")
+            continue
+        upsert_buffer.add({
+            "id": item['doc_id'],
+            "values": item['dense_embedding'],  # Dense vector
+            "metadata": {"text": item['markdown_content'], **item['profile_metadata']},
+            "sparse_values": item['sparse_data']  # Sparse vector data
+        })
+    # Write what is left once the stream pauses, so a long-lived pipeline does not hold a partial batch back
+    upsert_buffer.flush()
+    return items
+
+#------------------------------------------------Ingestion Pipeline------------------------------------------------
+
+def record_upserted(doc_ids):
+    """Mark the files behind written vectors done, and delete again the vectors of files removed while they were written."""
+    manifest.mark_docs(doc_ids, 'upserted', 'done')
+    orphaned = [doc_id for doc_id in doc_ids if not manifest.for_doc_id(doc_id)]
+    if not orphaned:
+        return
+    try:
+        pinecone_index.delete(ids=orphaned, namespace=namespace)
+        for doc_id in orphaned:
+            sparse_encoder.remove_document(doc_id)
+        print(f"Deleted {len(orphaned)} removed documents from Pinecone again.")
+    except Exception as e:
+        print(f"Error deleting removed documents from Pinecone: {e}")
+
+def new_upsert_buffer():
+    """Upsert buffer that records in the manifest which files' vectors were written or failed."""
+    return UpsertBuffer(
+        pinecone_index, namespace, max_vectors=UPSERT_BATCH_SIZE,
+        on_written=record_upserted,
+        on_failed=lambda doc_ids: manifest.mark_docs(doc_ids, 'upsert', 'failed', "Upsert failed.")
+    )
+
+def new_ingestion_pipeline(upsert_buffer, target_folder_id=TARGET_FOLDER_ID):
+    """The download -> parse -> upload -> embed -> profile -> upsert pipeline, writing through upsert_buffer."""
+    return StagedPipeline(
+        [
+            Stage("download", download_stage, DOWNLOAD_WORKERS),
+            Stage("parse", parse_stage, PARSE_WORKERS),
+            Stage("upload", lambda item: upload_stage(item, target_folder_id), UPLOAD_WORKERS),
+            Stage("embed", embed_stage, EMBED_WORKERS, batch_size=EMBED_BATCH_SIZE, batch_wait=2.0),
+            Stage("profile", profile_stage, PROFILE_WORKERS),
+            Stage("upsert", lambda items: upsert_stage(items, upsert_buffer), UPSERT_WORKERS,
+                  batch_size=UPSERT_BATCH_SIZE, batch_wait=2.0)
+        ],
+        describe=lambda item: item['file_name'],
+        on_error=lambda stage_name, item, error: manifest.mark_failed(item['file_id'], stage_name, error)
+    )
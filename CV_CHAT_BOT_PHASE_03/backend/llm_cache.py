@@ -0,0 +1,132 @@
+import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+#------------------------------------------------Size Estimation------------------------------------------------
+
+def estimate_size(value):
+    """
+    Rough deep size in bytes of a cached value (dicts, lists, tuples, sets, strings and scalars).
+    """
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+def make_key(*parts):
+    """
+    Hash the parts of a cache key so entries never keep a second copy of large inputs such as CV text.
+    """
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+#------------------------------------------------LRU / TTL Cache------------------------------------------------
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate bytes, with an optional TTL per entry.
+    """
+
+    def __init__(self, namespace, max_entries=1024, max_bytes=16 * 1024 * 1024, ttl=None, sizeof=estimate_size):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._entries = OrderedDict()       # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return  # Never let a single oversized value flush the whole namespace
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._remove(key)
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+#------------------------------------------------Namespace Registry------------------------------------------------
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_cache(namespace, **kwargs):
+    """
+    Return the process-wide cache for a namespace, creating it with the given bounds on first use.
+    """
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = LRUCache(namespace, **kwargs)
+            _caches[namespace] = cache
+        return cache
+
+def cache_stats():
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.namespace: cache.stats() for cache in caches}
@@ -0,0 +1,390 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+
+#------------------------------------------------Vector Store Selection------------------------------------------------
+
+# VECTOR_STORE=pinecone (default) talks to the hosted index. VECTOR_STORE=local serves the same calls from
+# LocalVectorIndex below, which keeps everything on disk under LOCAL_VECTOR_STORE_DIR and needs no network.
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone").lower()
+DEFAULT_LOCAL_VECTOR_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vector_store")
+
+def open_vector_index(index_name, dimension=1536, create_if_missing=False):
+    """
+    Return the configured vector index. Both backends answer query/fetch/upsert/update/list/delete.
+    """
+    if VECTOR_STORE == "local":
+        directory = os.getenv("LOCAL_VECTOR_STORE_DIR", DEFAULT_LOCAL_VECTOR_STORE_DIR)
+        return LocalVectorIndex(os.path.join(directory, index_name), dimension=dimension)
+
+    from pinecone import Pinecone, ServerlessSpec
+
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    if create_if_missing and index_name not in pc.list_indexes().names():
+        pc.create_index(
+            name=index_name,
+            dimension=dimension,
+            metric="dotproduct",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1")
+        )
+    return pc.Index(index_name)
+
+#------------------------------------------------Metadata Filters------------------------------------------------
+
+def _as_values(value):
+    return value if isinstance(value, list) else [value]
+
+def _compare(field_value, operator, operand):
+    values = _as_values(field_value)
+    if operator == "$eq":
+        return operand in values
+    if operator == "$ne":
+        return operand not in values
+    if operator == "$in":
+        return any(value in operand for value in values)
+    if operator == "$nin":
+        return all(value not in operand for value in values)
+    if operator == "$exists":
+        return (field_value is not None) == operand
+    if field_value is None or isinstance(field_value, list):
+        return False
+    try:
+        if operator == "$gt":
+            return field_value > operand
+        if operator == "$gte":
+            return field_value >= operand
+        if operator == "$lt":
+            return field_value < operand
+        if operator == "$lte":
+            return field_value <= operand
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported filter operator: {operator}")
+
+def matches_filter(metadata, metadata_filter):
+    """
+    Evaluate a Pinecone-style metadata filter against one metadata dict.
+    """
+    if not metadata_filter:
+        return True
+    for key, condition in metadata_filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            field_value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator != "$exists" and field_value is None and operator not in ("$ne", "$nin"):
+                    return False
+                if not _compare(field_value, operator, operand):
+                    return False
+        elif not _compare(metadata.get(key), "$eq", condition):
+            return False
+    return True
+
+#------------------------------------------------Local Hybrid Index------------------------------------------------
+
+class _Namespace:
+    """
+    One namespace: dense rows in a memory-mapped float32 file, ids / metadata / sparse values in SQLite,
+    and an in-memory inverted index over the sparse values.
+    """
+
+    def __init__(self, directory, dimension):
+        os.makedirs(directory, exist_ok=True)
+        self.dimension = dimension
+        self.row_bytes = dimension * 4
+        self.dense_path = os.path.join(directory, "dense.f32")
+        self.lock = threading.RLock()
+
+        self.conn = sqlite3.connect(os.path.join(directory, "records.sqlite3"), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                id TEXT PRIMARY KEY,
+                row INTEGER NOT NULL,
+                metadata TEXT NOT NULL,
+                sparse TEXT
+            )
+        """)
+        self.conn.commit()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.dense_path):
+            open(self.dense_path, "wb").close()
+        self.capacity = os.path.getsize(self.dense_path) // self.row_bytes
+        self.dense = self._map(self.capacity)
+
+        self.row_of = {}
+        self.ids = {}
+        self.metadata = {}
+        self.sparse = {}
+        self.postings = {}
+        self._posting_arrays = {}
+        for vector_id, row, metadata, sparse in self.conn.execute("SELECT id, row, metadata, sparse FROM records"):
+            self._index(vector_id, row, json.loads(metadata), json.loads(sparse) if sparse else None)
+        self.next_row = max(self.ids, default=-1) + 1
+        self.data_version = self._data_version()
+
+    def _map(self, rows):
+        return np.memmap(self.dense_path, dtype=np.float32, mode="r+", shape=(rows, self.dimension)) if rows else None
+
+    def _data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def refresh_if_changed(self):
+        """
+        Reload when another process (e.g. an ingestion run) has committed writes since the last load.
+        """
+        if self._data_version() != self.data_version:
+            self._load()
+
+    def _index(self, vector_id, row, metadata, sparse):
+        self.row_of[vector_id] = row
+        self.ids[row] = vector_id
+        self.metadata[row] = metadata
+        self._set_sparse(row, sparse)
+
+    def _set_sparse(self, row, sparse):
+        previous = self.sparse.pop(row, None)
+        if previous:
+            for term in previous["indices"]:
+                self.postings[term].pop(row, None)
+                self._posting_arrays.pop(term, None)
+        if sparse and sparse.get("indices"):
+            self.sparse[row] = sparse
+            for term, value in zip(sparse["indices"], sparse["values"]):
+                self.postings.setdefault(term, {})[row] = value
+                self._posting_arrays.pop(term, None)
+
+    def _ensure_capacity(self, rows):
+        if rows <= self.capacity:
+            return
+        if self.dense is not None:
+            self.dense.flush()
+        self.dense = None
+        # Another process may already have grown the file; never shrink it
+        file_capacity = os.path.getsize(self.dense_path) // self.row_bytes
+        new_capacity = file_capacity if file_capacity >= rows else max(1024, file_capacity * 2, rows)
+        if new_capacity > file_capacity:
+            with open(self.dense_path, "r+b") as dense_file:
+                dense_file.truncate(new_capacity * self.row_bytes)
+        self.capacity = new_capacity
+        self.dense = self._map(new_capacity)
+
+    @contextmanager
+    def _write_transaction(self):
+        """
+        Hold SQLite's write lock from the refresh to the commit. The backend, the watcher and the bulk
+        ingestion script can share a store, so row allocation and dense writes must be serialized
+        across processes, not only across threads.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.refresh_if_changed()
+                yield
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.data_version = self._data_version()
+
+    def _postings_for(self, term):
+        arrays = self._posting_arrays.get(term)
+        if arrays is None:
+            posting = self.postings.get(term, {})
+            arrays = (np.fromiter(posting.keys(), dtype=np.int64, count=len(posting)),
+                      np.fromiter(posting.values(), dtype=np.float32, count=len(posting)))
+            self._posting_arrays[term] = arrays
+        return arrays
+
+    def upsert(self, vectors):
+        with self._write_transaction():
+            next_row = self.conn.execute("SELECT COALESCE(MAX(row), -1) + 1 FROM records").fetchone()[0]
+            rows = []
+            for vector in vectors:
+                row = self.row_of.get(vector["id"])
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                rows.append(row)
+            self.next_row = max(self.next_row, next_row)
+            self._ensure_capacity(self.next_row)
+
+            records = []
+            for vector, row in zip(vectors, rows):
+                metadata = dict(vector.get("metadata") or {})
+                sparse = vector.get("sparse_values")
+                self.dense[row] = np.asarray(vector["values"], dtype=np.float32)
+                self._index(vector["id"], row, metadata, sparse)
+                records.append((vector["id"], row, json.dumps(metadata), json.dumps(sparse) if sparse else None))
+            self.dense.flush()
+
+            self.conn.executemany("INSERT OR REPLACE INTO records (id, row, metadata, sparse) VALUES (?, ?, ?, ?)", records)
+            return len(records)
+
+    def update(self, vector_id, values=None, set_metadata=None, sparse_values=None):
+        with self._write_transaction():
+            row = self.row_of.get(vector_id)
+            if row is None:
+                raise KeyError(f"Vector '{vector_id}' not found")
+            if values is not None:
+                self.dense[row] = np.asarray(values, dtype=np.float32)
+                self.dense.flush()
+            if set_metadata:
+                self.metadata[row] = {**self.metadata[row], **set_metadata}
+            if sparse_values is not None:
+                self._set_sparse(row, sparse_values)
+            sparse = self.sparse.get(row)
+            self.conn.execute(
+                "UPDATE records SET metadata = ?, sparse = ? WHERE id = ?",
+                (json.dumps(self.metadata[row]), json.dumps(sparse) if sparse else None, vector_id)
+            )
+
+    def delete(self, ids=None, delete_all=False):
+        with self._write_transaction():
+            targets = list(self.row_of) if delete_all else list(ids or [])
+            for vector_id in targets:
+                row = self.row_of.pop(vector_id, None)
+                if row is None:
+                    continue
+                self._set_sparse(row, None)
+                self.ids.pop(row, None)
+                self.metadata.pop(row, None)
+            self.conn.executemany("DELETE FROM records WHERE id = ?", [(vector_id,) for vector_id in targets])
+
+    def fetch(self, ids):
+        with self.lock:
+            self.refresh_if_changed()
+            vectors = {}
+            for vector_id in ids:
+                row = self.row_of.get(vector_id)
+                if row is None:
+                    continue
+                vector = {"id": vector_id, "values": self.dense[row].tolist(), "metadata": dict(self.metadata[row])}
+                if row in self.sparse:
+                    vector["sparse_values"] = self.sparse[row]
+                vectors[vector_id] = vector
+            return vectors
+
+    def query(self, vector, sparse_vector, top_k, include_metadata, include_values, metadata_filter):
+        with self.lock:
+            self.refresh_if_changed()
+            if not self.ids:
+                return []
+
+            rows = np.fromiter(self.ids.keys(), dtype=np.int64, count=len(self.ids))
+            if metadata_filter:
+                keep = np.fromiter((matches_filter(self.metadata[row], metadata_filter) for row in rows), dtype=bool, count=len(rows))
+                rows = rows[keep]
+                if not len(rows):
+                    return []
+
+            # dotproduct metric: dense dot + sparse dot, like a Pinecone dotproduct index
+            scores = np.zeros(self.next_row, dtype=np.float32)
+            if vector is not None:
+                scores[:self.next_row] = self.dense[:self.next_row] @ np.asarray(vector, dtype=np.float32)
+            if sparse_vector:
+                for term, weight in zip(sparse_vector["indices"], sparse_vector["values"]):
+                    posting_rows, posting_values = self._postings_for(term)
+                    if len(posting_rows):
+                        np.add.at(scores, posting_rows, posting_values * weight)
+
+            candidate_scores = scores[rows]
+            top_k = min(top_k, len(rows))
+            top = np.argpartition(-candidate_scores, top_k - 1)[:top_k]
+            top = top[np.argsort(-candidate_scores[top])]
+
+            matches = []
+            for i in top:
+                row = int(rows[i])
+                match = {"id": self.ids[row], "score": float(candidate_scores[i])}
+                if include_metadata:
+                    match["metadata"] = dict(self.metadata[row])
+                if include_values:
+                    match["values"] = self.dense[row].tolist()
+                matches.append(match)
+            return matches
+
+    def list_ids(self):
+        with self.lock:
+            self.refresh_if_changed()
+            return sorted(self.row_of)
+
+
+class LocalVectorIndex:
+    """
+    In-process hybrid index implementing the subset of the pinecone.Index API used by this project.
+    Responses are plain dicts in the same shape as Pinecone's, so callers index them the same way.
+    """
+
+    def __init__(self, directory, dimension=1536):
+        self.directory = directory
+        self.dimension = dimension
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace):
+        namespace = namespace or ""
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                ns = _Namespace(os.path.join(self.directory, namespace or "__default__"), self.dimension)
+                self._namespaces[namespace] = ns
+            return ns
+
+    def upsert(self, vectors, namespace=None, **kwargs):
+        vectors = [
+            vector if isinstance(vector, dict) else dict(zip(("id", "values", "metadata"), vector))
+            for vector in vectors
+        ]
+        return {"upserted_count": self._namespace(namespace).upsert(vectors)}
+
+    def update(self, id, values=None, set_metadata=None, sparse_values=None, namespace=None, **kwargs):
+        self._namespace(namespace).update(id, values=values, set_metadata=set_metadata, sparse_values=sparse_values)
+        return {}
+
+    def delete(self, ids=None, delete_all=False, namespace=None, **kwargs):
+        self._namespace(namespace).delete(ids=ids, delete_all=delete_all)
+        return {}
+
+    def fetch(self, ids, namespace=None, **kwargs):
+        return {"vectors": self._namespace(namespace).fetch(ids), "namespace": namespace or ""}
+
+    def query(self, vector=None, sparse_vector=None, top_k=10, include_metadata=False, include_values=False,
+              namespace=None, filter=None, id=None, **kwargs):
+        ns = self._namespace(namespace)
+        if vector is None and id is not None:
+            fetched = ns.fetch([id])
+            vector = fetched[id]["values"] if id in fetched else None
+        matches = ns.query(vector, sparse_vector, top_k, include_metadata, include_values, filter)
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def list(self, namespace=None, prefix=None, limit=100, **kwargs):
+        """
+        Yield pages of ids, like pinecone.Index.list.
+        """
+        ids = [vector_id for vector_id in self._namespace(namespace).list_ids() if not prefix or vector_id.startswith(prefix)]
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def describe_index_stats(self, **kwargs):
+        namespaces = {}
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                namespace = "" if name == "__default__" else name
+                namespaces[namespace] = {"vector_count": len(self._namespace(namespace).list_ids())}
+        return {
+            "dimension": self.dimension,
+            "namespaces": namespaces,
+            "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values())
+        }
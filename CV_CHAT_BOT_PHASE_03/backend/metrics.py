@@ -0,0 +1,164 @@
+import time
+import math
+import asyncio
+import functools
+import threading
+
+from llm_cache import cache_stats
+
+
+#------------------------------------------------Metric Types------------------------------------------------
+
+# Seconds. Spans from sub-millisecond cache hits up to slow LLM calls.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+    Monotonic counter with labels. Values are per process (each uvicorn worker exposes its own).
+    """
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in values]
+        return lines
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram with labels, rendered in the Prometheus text format.
+    """
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}       # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, values in series:
+            for bound, count in zip(self.buckets, values):
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {values[-2]!r}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {values[-1]}")
+        return lines
+
+#------------------------------------------------Backend Metrics------------------------------------------------
+
+stage_duration = Histogram("cv_stage_duration_seconds", "Time spent in one pipeline stage.")
+stage_errors = Counter("cv_stage_errors_total", "Pipeline stage spans that ended with an exception.")
+http_request_duration = Histogram("cv_http_request_duration_seconds", "Time to answer an HTTP request, by route and status.")
+cv_validations = Counter("cv_validations_total", "CVs checked against the mandatory conditions, by result.")
+cv_extraction_skips = Counter("cv_extraction_skips_total", "CVs dropped from a ranking because their extraction failed or timed out.")
+
+REGISTRY = [stage_duration, stage_errors, http_request_duration, cv_validations, cv_extraction_skips]
+
+class timed:
+    """
+    Time a pipeline stage into cv_stage_duration_seconds.
+
+    Use as a context manager (`with timed("pinecone_query"):`) or as a decorator on a sync or async
+    function (`@timed("embedding")`). Exceptions that leave the span are counted in cv_stage_errors_total.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stage_duration.observe(time.perf_counter() - self._start, stage=self.stage)
+        if exc_type is not None:
+            stage_errors.inc(stage=self.stage)
+        return False
+
+    def __call__(self, func):
+        stage = self.stage
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+#------------------------------------------------Exposition------------------------------------------------
+
+CACHE_COUNTERS = ("hits", "misses", "evictions", "expirations")
+CACHE_GAUGES = ("entries", "bytes")
+
+def render_cache_metrics():
+    stats = sorted(cache_stats().items())
+    lines = []
+    for field in CACHE_COUNTERS:
+        name = f"cv_cache_{field}_total"
+        lines += [f"# HELP {name} In-memory cache {field}, per cache namespace.", f"# TYPE {name} counter"]
+        lines += [f"{name}{_format_labels((('namespace', namespace),))} {values[field]}" for namespace, values in stats]
+    for field in CACHE_GAUGES:
+        name = f"cv_cache_{field}"
+        lines += [f"# HELP {name} Current cache {field}, per cache namespace.", f"# TYPE {name} gauge"]
+        lines += [f"{name}{_format_labels((('namespace', namespace),))} {values[field]}" for namespace, values in stats]
+    return lines
+
+def render_metrics():
+    """
+    Every backend metric in the Prometheus text exposition format (version 0.0.4).
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    lines += render_cache_metrics()
+    return "\n".join(lines) + "\n"
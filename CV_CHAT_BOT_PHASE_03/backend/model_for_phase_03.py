@@ -1,19 +1,43 @@
 import os
 import webbrowser
-import re
 import ast
-from pathlib import Path
+import asyncio
+import functools
+import hashlib
+import time
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import aclosing
 from dotenv import load_dotenv
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.core import VectorStoreIndex
-from llama_index.core.schema import Document
-from pinecone import Pinecone
-from fuzzywuzzy import process
-from openai import OpenAI
-from rank_bm25 import BM25Okapi
-from googleapiclient.discovery import build
+from llama_index.core.schema import TextNode, MetadataMode
+from llama_index.core.memory import ChatMemoryBuffer
+from openai import OpenAI, AsyncOpenAI
 from googleapiclient.http import MediaIoBaseDownload
-from google.oauth2 import service_account
+from cv_profile import (
+    normalize_text,
+    chat_completion_request,
+    EXTRACTION_SYSTEM_PROMPT,
+    build_extraction_prompt,
+    empty_extracted_info,
+    parse_extraction_response,
+    metadata_to_profile,
+    title_text,
+    build_metadata_filter
+)
+from extraction_store import ExtractionStore
+from llm_cache import get_cache, make_key
+from embedding_cache import EmbeddingCache
+from example_index import ExampleIndex
+from sparse_encoder import BM25SparseEncoder
+from local_vector_store import open_vector_index
+from chat_sessions import CVChatContext, ChatSession, ChatSessionStore
+from cv_sections import chunk_cv
+from drive_file_index import DriveFileIndex
+from drive_service import DriveServiceFactory
+from pdf_cache import PDFCache
+from metrics import timed, stage_duration, cv_validations, cv_extraction_skips
 
 
 load_dotenv()
@@ -22,32 +46,85 @@ OPENAI_API_KEY = os.getenv("OpenAI_Key")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 
 os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
-os.environ["PINECONE_API_KEY"] = PINECONE_API_KEY
+if PINECONE_API_KEY:        # not needed with VECTOR_STORE=local
+    os.environ["PINECONE_API_KEY"] = PINECONE_API_KEY
 
 SERVICE_ACCOUNT_FILE = os.getenv("Service_AP")      #------add the path to the service account file------------
 
-SCOPES = ['https://www.googleapis.com/auth/drive']
-credentials = service_account.Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE, scopes=SCOPES
-)
-drive_service = build('drive', 'v3', credentials=credentials)
-
 SOURCE_FOLDER_ID = os.getenv("G-DRIVE_CV_STORE_FOLDER_ID")
 
 
 client = OpenAI(api_key=OPENAI_API_KEY)
+async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
 embed_model = OpenAIEmbedding()
-pc = Pinecone(api_key=PINECONE_API_KEY)
 
 index_name = "database"  
 namespace = "cvs-info"  
-pinecone_index = pc.Index(index_name)
+pinecone_index = open_vector_index(index_name)      # Pinecone, or the local engine with VECTOR_STORE=local
+
+#------------------------------------------------Google Drive Service------------------------------------------------
+
+# get_drive_service() returns the Drive service of the calling thread
+get_drive_service = DriveServiceFactory(SERVICE_ACCOUNT_FILE)
+
+# Resident index of the CV PDFs in the source folder, kept fresh from the Drive changes feed
+DRIVE_INDEX_REFRESH_SECONDS = int(os.getenv("DRIVE_INDEX_REFRESH_SECONDS", "60"))
+drive_file_index = DriveFileIndex(SOURCE_FOLDER_ID, get_drive_service)
+
+def refresh_drive_file_index():
+    drive_file_index.refresh()
+    return len(drive_file_index)
+
+#------------------------------------------------Blocking Call Executor------------------------------------------------
+
+# Pinecone, Drive and llama-index index builds are synchronous. The async endpoints push them onto this
+# bounded pool so a slow call never blocks the event loop and at most BACKEND_IO_WORKERS run at once.
+BACKEND_IO_WORKERS = int(os.getenv("BACKEND_IO_WORKERS", "16"))
+io_executor = ThreadPoolExecutor(max_workers=BACKEND_IO_WORKERS, thread_name_prefix="cv-backend-io")
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking function on the bounded I/O executor and await its result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args, **kwargs))
+
+def shutdown_executor():
+    io_executor.shutdown(wait=False, cancel_futures=True)
+    extraction_executor.shutdown(wait=False, cancel_futures=True)
 
 #------------------------------------------------Generate Embeddings------------------------------------------------
 
+# Repeated job descriptions and refined JDs are served from the on-disk embedding cache (see embedding_cache.py).
+embedding_cache = EmbeddingCache(embed_model.model_name)
+
+@timed("embedding")
 def generate_embeddings(text):
     try:
+        embedding = embedding_cache.get(text)
+        if embedding is not None:
+            return embedding
+
         embedding = embed_model.get_text_embedding(text)
+        embedding_cache.put(text, embedding)
+        return embedding
+    except Exception as e:
+        print(f"Error generating embeddings: {e}")
+        return None
+
+@timed("embedding")
+async def agenerate_embeddings(text):
+    """
+    Async variant of generate_embeddings. The cache (SQLite plus a memmap write) is used from the
+    I/O executor, since a write locked by ingestion could otherwise stall the event loop.
+    """
+    try:
+        embedding = await run_blocking(embedding_cache.get, text)
+        if embedding is not None:
+            return embedding
+
+        embedding = await embed_model.aget_text_embedding(text)
+        await run_blocking(embedding_cache.put, text, embedding)
         return embedding
     except Exception as e:
         print(f"Error generating embeddings: {e}")
@@ -55,30 +132,81 @@ def generate_embeddings(text):
     
 #------------------------------------------------Generate Sparse Vectors------------------------------------------------
 
+# Shares its hashed vocabulary and corpus IDF statistics with the ingestion scripts (see sparse_encoder.py).
+sparse_encoder = BM25SparseEncoder()
+
 def generate_bm25_sparse_vector(texts):
     """
-    Generate BM25 sparse vectors for a list of texts.
+    Generate the BM25 query sparse vector for a list of query texts.
 
     Args:
         texts (list of str): List of texts to process.
 
     Returns:
-        tuple: Sparse vectors and idf keys.
+        dict: Pinecone sparse vector (`indices`, `values`) holding only the query terms, or None.
     """
     try:
-        tokenized_corpus = [text.split() for text in texts]
-        bm25 = BM25Okapi(tokenized_corpus)
-        sparse_vectors = [bm25.get_scores(doc_tokens) for doc_tokens in tokenized_corpus]
-        return sparse_vectors, list(bm25.idf.keys())
+        return sparse_encoder.encode_query(texts)
     except Exception as e:
         print(f"Error generating BM25 sparse vectors: {e}")
-        return None, None
+        return None
 
 #-------------------------------------------------Retrieve Examples and Instructions------------------------------------------------
 
+# The examples_and_instructions namespace only holds the handful of vectors seeded by examples_and_instruction.py,
+# so it is searched in process once loaded. Until then (or if loading fails) the Pinecone query is used.
+example_index = ExampleIndex(pinecone_index, namespace="examples_and_instructions")
+
+def refresh_example_index():
+    """
+    (Re)load the examples and instructions into memory. Call after the seed set changes.
+    """
+    return example_index.refresh()
+
+def parse_examples_and_instructions(query_results):
+    """
+    Split the matches of an examples_and_instructions query into examples and the instruction text.
+    """
+    retrieved_data = []
+    instructions = None  
+
+    for match in query_results['matches']:
+        metadata = match.get('metadata', {})
+        data_type = metadata.get('type', '') 
+
+        if data_type == 'example':
+            job_description = metadata.get('job_description', '')
+            mandatory_keywords = metadata.get('mandatory_keywords', [])
+            retrieved_data.append({
+                'job_description': job_description,
+                'mandatory_keywords': mandatory_keywords
+            })
+        elif data_type == 'instruction':
+            instructions = metadata.get('content', '')  
+
+    return retrieved_data, instructions
+
+def query_examples(user_embedding):
+    """
+    Query the examples and instructions, from the in-process copy when it is loaded.
+    """
+    if example_index.loaded:
+        return example_index.query(user_embedding, top_k=5)
+    return pinecone_index.query(
+        vector=user_embedding,
+        top_k=5,  
+        include_metadata=True,
+        namespace="examples_and_instructions"
+    )
+
+def examples_retrieval_failed(error):
+    print(f"Error retrieving data from Pinecone: {error}")
+    return [], ""
+
+@timed("example_retrieval")
 def retrieve_examples_and_instructions(user_input):
     """
-    Retrieve relevant examples and instructions from Pinecone.
+    Retrieve relevant examples and instructions.
     """
     try:
         user_embedding = generate_embeddings(user_input)
@@ -87,34 +215,30 @@ def retrieve_examples_and_instructions(user_input):
             print("Failed to generate user embedding.")
             return [], ""
 
-        query_results = pinecone_index.query(
-            vector=user_embedding,
-            top_k=5,  
-            include_metadata=True,
-            namespace="examples_and_instructions"
-        )
+        return parse_examples_and_instructions(query_examples(user_embedding))
+    except Exception as e:
+        return examples_retrieval_failed(e)
 
-        retrieved_data = []
-        instructions = None  
+@timed("example_retrieval")
+async def aretrieve_examples_and_instructions(user_input):
+    """
+    Async variant of retrieve_examples_and_instructions.
+    """
+    try:
+        user_embedding = await agenerate_embeddings(user_input)
 
-        for match in query_results['matches']:
-            metadata = match.get('metadata', {})
-            data_type = metadata.get('type', '') 
+        if user_embedding is None:
+            print("Failed to generate user embedding.")
+            return [], ""
 
-            if data_type == 'example':
-                job_description = metadata.get('job_description', '')
-                mandatory_keywords = metadata.get('mandatory_keywords', [])
-                retrieved_data.append({
-                    'job_description': job_description,
-                    'mandatory_keywords': mandatory_keywords
-                })
-            elif data_type == 'instruction':
-                instructions = metadata.get('content', '')  
+        if example_index.loaded:
+            query_results = query_examples(user_embedding)      # in memory, no I/O
+        else:
+            query_results = await run_blocking(query_examples, user_embedding)
 
-        return retrieved_data, instructions
+        return parse_examples_and_instructions(query_results)
     except Exception as e:
-        print(f"Error retrieving data from Pinecone: {e}")
-        return [], ""
+        return examples_retrieval_failed(e)
 
 # ------------------------------------------------- Generate Combined Prompt ------------------------------------------------
 
@@ -140,161 +264,152 @@ def generate_combined_prompt(user_input, retrieved_data, instructions):
 
 # ------------------------------------------------- Refine User Prompt with LLM ------------------------------------------------
 
-# In-memory cache for consistency---------------------------
-cache = {}
+#-------------------------------------------------LLM Result Caches------------------------------------------------
 
-def refine_user_prompt_with_llm(user_input, examples, instructions):
+# One bounded namespace per LLM stage. Entries are keyed by a hash of the normalized input, so a repeated
+# job description costs no LLM calls and memory stays flat under sustained traffic.
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+
+refine_cache = get_cache("refine_user_prompt", max_entries=2048, max_bytes=8 * 1024 * 1024, ttl=LLM_CACHE_TTL_SECONDS)
+extraction_cache = get_cache("extract_skills_and_experience", max_entries=4096, max_bytes=8 * 1024 * 1024, ttl=LLM_CACHE_TTL_SECONDS)
+conditions_cache = get_cache("extract_mandatory_conditions", max_entries=2048, max_bytes=8 * 1024 * 1024, ttl=LLM_CACHE_TTL_SECONDS)
+
+REFINE_SYSTEM_PROMPT = "You are a highly precise assistant. Always produce structured and consistent outputs based on the examples and instructions."
+
+def refine_cache_key(normalized_input, examples, instructions):
     """
-    Use OpenAI's LLM to refine the user's input with deterministic and consistent outputs.
-    Includes caching to prevent re-generating results for the same input.
+    Create a unique cache key using normalized input, examples, and instructions.
     """
-    def normalize_text(input_text):
-        """
-        Normalize text by removing extra spaces, converting to lowercase, and ensuring consistency.
-        """
-        return " ".join(input_text.strip().split()).lower()
+    return make_key(normalized_input, tuple((ex['job_description'], tuple(ex['mandatory_keywords'])) for ex in examples), instructions)
 
-    try:
-        normalized_input = normalize_text(user_input)
-
-        # Create a unique cache key using normalized input, examples, and instructions
-        cache_key = (normalized_input, tuple((ex['job_description'], tuple(ex['mandatory_keywords'])) for ex in examples), instructions)
-        if cache_key in cache:
-            return cache[cache_key]
+# The sync and async stages below share these helpers for the cache lookup, the handling of the LLM reply
+# and the fallback, so they only differ in how the LLM is called.
 
-        combined_prompt = generate_combined_prompt(normalized_input, examples, instructions)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a highly precise assistant. Always produce structured and consistent outputs based on the examples and instructions."},
-                {"role": "user", "content": combined_prompt}
-            ],
-            max_tokens=300,
-            temperature=0.0,  
-            top_p=1.0  
-        )
+def lookup_refinement(user_input, examples, instructions):
+    """
+    Returns (cache_key, request, cached refined input or None).
+    """
+    normalized_input = normalize_text(user_input)
+    cache_key = refine_cache_key(normalized_input, examples, instructions)
+    combined_prompt = generate_combined_prompt(normalized_input, examples, instructions)
+    return cache_key, chat_completion_request(REFINE_SYSTEM_PROMPT, combined_prompt), refine_cache.get(cache_key)
 
-        refined_input = normalize_text(response.choices[0].message.content)
+def store_refinement(cache_key, response):
+    refined_input = normalize_text(response.choices[0].message.content)
+    refine_cache.set(cache_key, refined_input)
+    return refined_input
 
-        cache[cache_key] = refined_input
+def refinement_failed(error):
+    print(f"Error refining the prompt using LLM: {error}")
+    return "Failed to refine the input."
 
-        return refined_input
+@timed("refinement")
+def refine_user_prompt_with_llm(user_input, examples, instructions):
+    """
+    Use OpenAI's LLM to refine the user's input with deterministic and consistent outputs.
+    Includes caching to prevent re-generating results for the same input.
+    """
+    try:
+        cache_key, request, cached_input = lookup_refinement(user_input, examples, instructions)
+        if cached_input is not None:
+            return cached_input
+        return store_refinement(cache_key, client.chat.completions.create(**request))
+    except Exception as e:
+        return refinement_failed(e)
 
+@timed("refinement")
+async def arefine_user_prompt_with_llm(user_input, examples, instructions):
+    """
+    Async variant of refine_user_prompt_with_llm sharing the same cache.
+    """
+    try:
+        cache_key, request, cached_input = lookup_refinement(user_input, examples, instructions)
+        if cached_input is not None:
+            return cached_input
+        return store_refinement(cache_key, await async_client.chat.completions.create(**request))
     except Exception as e:
-        print(f"Error refining the prompt using LLM: {e}")
-        return "Failed to refine the input."
+        return refinement_failed(e)
     
 
 #----------------------------------------Function for extract_skills_and_experience From CVS----------------------------------------------------
 
-def extract_skills_and_experience(full_text):
+# Shared by all uvicorn workers and kept across restarts (see extraction_store.py).
+extraction_store = ExtractionStore()
+
+def lookup_extraction(full_text):
     """
-    Extract structured data (skills and years of experience) from the full_text section of a CV.
-    Includes caching to prevent re-processing the same input.
+    Returns (cache_key, cached extraction or None), from the memory cache or else the extraction store.
     """
-    def normalize_text_2(input_text):
-        """
-        Normalize text by removing extra spaces, converting to lowercase, and ensuring consistency.
-        """
-        return " ".join(input_text.strip().split()).lower()
-
-    try:
-        normalized_text_2 = normalize_text_2(full_text)
+    cache_key = extraction_store.key_for(full_text)
+    cached_info = extraction_cache.get(cache_key)
+    if cached_info is not None:
+        return cache_key, cached_info
 
-        if normalized_text_2 in cache:
-            return cache[normalized_text_2]
+    stored_info = extraction_store.get(full_text)
+    if stored_info is not None:
+        extraction_cache.set(cache_key, stored_info)
+    return cache_key, stored_info
 
+def store_extraction(full_text, cache_key, response):
+    """
+    Parse the LLM reply and save it in the memory cache and the persistent store.
+    """
+    extracted_info = parse_extraction_response(response.choices[0].message.content.strip())
+    if extracted_info is None:
+        return empty_extracted_info()
 
-        prompt = f"""
-
-        Given the following full_text,
-        - Job_Title (remove Just get the title. remove words like junior, senior and etc. Ex: If prompt say senior engineer, remove senior word and just extract engineer.)
-
-        Given the following full_text, extract the following details ONLY from the 'skills' section:
-        - Skills (technologies, programming languages, etc)
-         
-        Given the following full_text, extract the following details:
-        - Identify date ranges for job experience in the format 'YYYY-MM to YYYY-MM' or similar. 
-        - If no end date is provided, assume it is the current date.
-        - Calculate the total years of experience from these date ranges and provide it as an integer.
-       
-        Please ignore other sections like education or personal information when calculating total years of experience. 
-        
+    extraction_cache.set(cache_key, extracted_info)
+    extraction_store.put(full_text, extracted_info)
+    return extracted_info
 
-        Ensure the output format is:
-        {{  
-            'job_title': <job_title>,
-            'years_of_experience': <integer>,
-            'skills': ['<skill1>', '<skill2>', ...],
-        }}
+def extraction_failed(error):
+    print(f"Error extracting skills and experience: {error}")
+    return empty_extracted_info()
 
-        full_text: 
-        {full_text}
-        """
+@timed("cv_extraction")
+def extract_skills_and_experience(full_text):
+    """
+    Extract structured data (skills and years of experience) from the full_text section of a CV.
+    Results are kept in a bounded memory cache in front of the persistent extraction store, both keyed
+    by a hash of the CV text and prompt version.
+    """
+    try:
+        cache_key, cached_info = lookup_extraction(full_text)
+        if cached_info is not None:
+            return cached_info
 
         response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an assistant that extracts structured data from CV text."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=300,
-            temperature=0.0,
-            top_p=1.0
+            **chat_completion_request(EXTRACTION_SYSTEM_PROMPT, build_extraction_prompt(full_text))
         )
+        return store_extraction(full_text, cache_key, response)
+    except Exception as e:
+        return extraction_failed(e)
 
-        response_message = response.choices[0].message.content.strip()
-
-        # Validate response format
-        if not response_message.startswith("{") or not response_message.endswith("}"):
-            print("Invalid response format:", response_message)
-            return {
-                'job_title': [],
-                'years_of_experience': 0,
-                'skills': []
-            }
-
-        # Parse response safely
-        try:
-            user_conditions = ast.literal_eval(response_message)
-        except (SyntaxError, ValueError) as e:
-            print(f"Error parsing response: {e}")
-            return {
-                'years_of_experience': 0,
-                'skills': []
-            }
-
-        # Prepare the structured output
-        extracted_info = {
-            'job_title': user_conditions.get('job_title', []),
-            'years_of_experience': int(user_conditions.get('years_of_experience', 0)),
-            'skills': user_conditions.get('skills', [])
-        }
-
-        # Save the result in cache
-        cache[normalized_text_2] = extracted_info
-
-        return extracted_info
+@timed("cv_extraction")
+async def aextract_skills_and_experience(full_text):
+    """
+    Async variant of extract_skills_and_experience sharing the same cache and extraction store.
+    The store is SQLite, shared with ingestion, so it is only used from the I/O executor.
+    """
+    try:
+        cache_key, cached_info = await run_blocking(lookup_extraction, full_text)
+        if cached_info is not None:
+            return cached_info
 
+        response = await async_client.chat.completions.create(
+            **chat_completion_request(EXTRACTION_SYSTEM_PROMPT, build_extraction_prompt(full_text))
+        )
+        return await run_blocking(store_extraction, full_text, cache_key, response)
     except Exception as e:
-        print(f"Error extracting skills and experience: {e}")
-        return {
-            'job_title': [],
-            'years_of_experience': 0,
-            'skills': []
-        }
+        return extraction_failed(e)
 
 
 #-------------------------------------------------Extract Mandatory Keywords------------------------------------------------
 
+MANDATORY_CONDITIONS_SYSTEM_PROMPT = "You are an assistant that extracts mandatory conditions from job descriptions."
 
-def extract_mandatory_conditions(job_description):
-    """
-    Use OpenAI's LLM to extract mandatory conditions (experience, skills, certifications, tools) from a refined job description.
-    """
-    try:
-        
-        prompt = f"""
+def build_mandatory_conditions_prompt(job_description):
+    return f"""
         Given the following job description, extract the mandatory conditions:
         - Job title
         - Years of experience(If years of experience not included in users prompt set it as 0)
@@ -316,46 +431,85 @@ def extract_mandatory_conditions(job_description):
         }}
         """
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo", 
-            messages=[{"role": "system", "content": "You are an assistant that extracts mandatory conditions from job descriptions."},
-                      {"role": "user", "content": prompt}],
-            max_tokens=300,
-            temperature=0.0,  
-            top_p=1.0  
-        )
+def empty_mandatory_conditions():
+    # Same shape as a parsed reply: job_title is a string, or None when there is no title condition
+    return {
+        'job_title': None,
+        'years_of_experience': None,
+        'skills': [],
+        'certifications': [],
+        'tools': []
+    }
 
-        response_message = response.choices[0].message.content.strip()
-        mandatory_conditions = ast.literal_eval(response_message)
+def parse_mandatory_conditions_response(response_message):
+    """
+    Turn the LLM reply into the mandatory conditions dict and the flattened keyword list used for sparse search.
+    """
+    mandatory_conditions = ast.literal_eval(response_message)
+
+    mandatory_conditions = {
+        'job_title': mandatory_conditions.get('job_title') or None,
+        'years_of_experience': mandatory_conditions.get('years_of_experience', None),
+        'skills': mandatory_conditions.get('skills', []),
+        'certifications': mandatory_conditions.get('certifications', []),
+        'tools': mandatory_conditions.get('tools', [])
+    }
 
-        mandatory_conditions = {
-            'job_title': mandatory_conditions.get('job_title', []),
-            'years_of_experience': mandatory_conditions.get('years_of_experience', None),
-            'skills': mandatory_conditions.get('skills', []),
-            'certifications': mandatory_conditions.get('certifications', []),
-            'tools': mandatory_conditions.get('tools', [])
-        }
+    key_words_for_search = list(mandatory_conditions.values())
+    flattened_list = [key_words_for_search[0]] + [key_words_for_search[1]]+ [skill for sublist in key_words_for_search[2:] for skill in sublist]
+    print(f"Mandatory keywords : {mandatory_conditions}")
 
-        key_words_for_search = list(mandatory_conditions.values())
-        flattened_list = [key_words_for_search[0]] + [key_words_for_search[1]]+ [skill for sublist in key_words_for_search[2:] for skill in sublist]
-        print(f"Mandatory keywords : {mandatory_conditions}")
-        
-        return mandatory_conditions, flattened_list
-    
+    return mandatory_conditions, flattened_list
+
+def lookup_conditions(job_description):
+    """
+    Returns (cache_key, request, cached (conditions, keywords) or None).
+    """
+    cache_key = make_key(normalize_text(job_description))
+    request = chat_completion_request(MANDATORY_CONDITIONS_SYSTEM_PROMPT, build_mandatory_conditions_prompt(job_description))
+    return cache_key, request, conditions_cache.get(cache_key)
+
+def store_conditions(cache_key, response):
+    conditions = parse_mandatory_conditions_response(response.choices[0].message.content.strip())
+    conditions_cache.set(cache_key, conditions)
+    return conditions
+
+def conditions_failed(error):
+    print(f"Error extracting mandatory conditions with LLM: {error}")
+    return empty_mandatory_conditions(), []
+
+@timed("condition_extraction")
+def extract_mandatory_conditions(job_description):
+    """
+    Use OpenAI's LLM to extract mandatory conditions (experience, skills, certifications, tools) from a refined job description.
+    Results are cached per normalized job description.
+    """
+    try:
+        cache_key, request, cached_conditions = lookup_conditions(job_description)
+        if cached_conditions is not None:
+            return cached_conditions
+        return store_conditions(cache_key, client.chat.completions.create(**request))
     except Exception as e:
-        print(f"Error extracting mandatory conditions with LLM: {e}")
-        return {
-            'job_title': [],
-            'years_of_experience': None,
-            'skills': [],
-            'certifications': [],
-            'tools': []
-        }
+        return conditions_failed(e)
+
+@timed("condition_extraction")
+async def aextract_mandatory_conditions(job_description):
+    """
+    Async variant of extract_mandatory_conditions.
+    """
+    try:
+        cache_key, request, cached_conditions = lookup_conditions(job_description)
+        if cached_conditions is not None:
+            return cached_conditions
+        return store_conditions(cache_key, await async_client.chat.completions.create(**request))
+    except Exception as e:
+        return conditions_failed(e)
 
 
 
 #----------------------Validate-------------------------------------
 
+@timed("validation")
 def validate_cv(extracted_info_from_user, mandatory_conditions):
 
 
@@ -374,11 +528,9 @@ def validate_cv(extracted_info_from_user, mandatory_conditions):
 
     # check job_title------------------------
 
-    required_job_title = set(mandatory_conditions.get('job_title', []))
-    required_job_title = normalize_text(mandatory_conditions.get('job_title', []))
+    required_job_title = normalize_text(title_text(mandatory_conditions.get('job_title')))
     if required_job_title:
-        cv_job_title = set(extracted_info_from_user.get('job_title', []))
-        cv_job_title = normalize_text(extracted_info_from_user.get('job_title', []))
+        cv_job_title = normalize_text(title_text(extracted_info_from_user.get('job_title')))
         if not (required_job_title in cv_job_title):
             print("No matching job titles....")
             return False
@@ -390,7 +542,7 @@ def validate_cv(extracted_info_from_user, mandatory_conditions):
     
     if required_experience is not None:
 
-        cv_experience = extracted_info_from_user.get('years_of_experience', 0)
+        cv_experience = extracted_info_from_user.get('years_of_experience') or 0
         
         print(f"CV Experience: {cv_experience}")
         
@@ -432,29 +584,128 @@ def validate_cv(extracted_info_from_user, mandatory_conditions):
 
 #-------------------------------------------------Rank CVs by Description------------------------------------------------
 
-def rank_and_validate_cvs(refined_job_description, mandatory_conditions, mandatory_keywords):
+def build_query_sparse_vector(mandatory_keywords):
     """
-    Rank CVs by relevance and validate them based on mandatory conditions (skills, experience, certificates).
+    Build the sparse half of the hybrid query from the mandatory keywords.
+    Returns None when the keywords contain no searchable terms; the query is then dense only.
     """
-    print("Ranking CVs based on refined job description...")
+    # Convert all items in the list to strings
+    query_texts = [str(item) for item in mandatory_keywords if item]
 
+    return generate_bm25_sparse_vector(query_texts)
 
-    # Convert all items in the list to strings
-    query_texts = [str(item) for item in mandatory_keywords]
+# CVs ingested with a stored profile (see cv_profile.py) are validated straight from their metadata, and
+# the experience / skills conditions are pushed down to Pinecone as a metadata filter. Vectors not yet
+# backfilled have no profile and always pass the filter, so they are still ranked through LLM extraction.
+PROFILE_FILTER_PUSHDOWN = os.getenv("PROFILE_FILTER_PUSHDOWN", "true").lower() == "true"
 
-    query_sparse_vector, idf_keys = generate_bm25_sparse_vector(query_texts)
+def build_query_filter(mandatory_conditions):
+    if not PROFILE_FILTER_PUSHDOWN:
+        return None
+    return build_metadata_filter(mandatory_conditions)
 
-    if query_sparse_vector is None:
-        raise ValueError("Failed to generate sparse vectors for the query.")
+# CVs without a stored profile fall back to LLM extraction, which fans out with bounded concurrency. A CV whose
+# extraction fails or is not done CV_EXTRACTION_TIMEOUT seconds into the batch is dropped instead of holding it up.
+CV_EXTRACTION_CONCURRENCY = int(os.getenv("CV_EXTRACTION_CONCURRENCY", "5"))
+CV_EXTRACTION_TIMEOUT = float(os.getenv("CV_EXTRACTION_TIMEOUT", "30"))
+# Shared by all ranking requests of the process, so concurrent requests stay within the same bound
+extraction_executor = ThreadPoolExecutor(max_workers=CV_EXTRACTION_CONCURRENCY, thread_name_prefix="cv-extract")
 
-    # Use the first sparse vector from the query
-    query_vector = query_sparse_vector[0]
+def build_validated_cv(match, extracted_info, mandatory_conditions):
+    """
+    Validate one Pinecone match against the mandatory conditions. Returns the ranked entry or None.
+    """
+    metadata = match.get('metadata', {})
+    print(f"\nCV's Info: {extracted_info}")
+
+    # One CV with malformed extracted data is skipped; it must not fail the whole ranking request
+    try:
+        is_valid = validate_cv(extracted_info, mandatory_conditions)
+    except Exception as e:
+        print(f"Skipping CV {match['id']}: validation failed ({e!r})")
+        cv_validations.inc(result="error")
+        return None
+    cv_validations.inc(result="valid" if is_valid else "invalid")
 
-    # Convert the NumPy array to a Python list for Pinecone
-    query_sparse = {
-            "indices": list(range(len(query_vector))),
-            "values": query_vector.tolist()  # Convert ndarray to list
+    if is_valid:
+        return {
+            "cv_id": match['id'],
+            "score": match['score'],
+            "metadata": metadata,
+            "extracted_info": extracted_info  
         }
+    return None
+
+def extract_and_validate_matches(matches, mandatory_conditions):
+    """
+    Extract and validate every match on the shared extraction pool. Results keep the order of the matches.
+    """
+    profiles = [metadata_to_profile(match.get('metadata', {})) for match in matches]
+    futures = [
+        None if profile is not None
+        else extraction_executor.submit(extract_skills_and_experience, match.get('metadata', {}).get('text', ''))
+        for match, profile in zip(matches, profiles)
+    ]
+
+    # One deadline for the whole batch; extractions still queued after it are cancelled
+    _, not_done = wait([future for future in futures if future is not None], timeout=CV_EXTRACTION_TIMEOUT)
+    for future in not_done:
+        future.cancel()
+
+    validated = []
+    for match, profile, future in zip(matches, profiles, futures):
+        if profile is not None:
+            validated.append(build_validated_cv(match, profile, mandatory_conditions))
+            continue
+        if future in not_done:
+            print(f"Skipping CV {match['id']}: extraction timed out")
+            cv_extraction_skips.inc()
+            validated.append(None)
+            continue
+        try:
+            extracted_info = future.result()
+        except Exception as e:
+            print(f"Skipping CV {match['id']}: extraction failed ({e!r})")
+            cv_extraction_skips.inc()
+            validated.append(None)
+            continue
+        validated.append(build_validated_cv(match, extracted_info, mandatory_conditions))
+    return validated
+
+async def aextract_and_validate_match(match, mandatory_conditions, semaphore):
+    profile = metadata_to_profile(match.get('metadata', {}))
+    if profile is not None:
+        return build_validated_cv(match, profile, mandatory_conditions)
+
+    async with semaphore:
+        try:
+            extracted_info = await asyncio.wait_for(
+                aextract_skills_and_experience(match.get('metadata', {}).get('text', '')),
+                timeout=CV_EXTRACTION_TIMEOUT
+            )
+        except Exception as e:
+            print(f"Skipping CV {match['id']}: extraction failed ({e!r})")
+            cv_extraction_skips.inc()
+            return None
+    return build_validated_cv(match, extracted_info, mandatory_conditions)
+
+async def aextract_and_validate_matches(matches, mandatory_conditions):
+    """
+    Async variant of extract_and_validate_matches using a semaphore-bounded gather.
+    """
+    semaphore = asyncio.Semaphore(CV_EXTRACTION_CONCURRENCY)
+    return await asyncio.gather(*(
+        aextract_and_validate_match(match, mandatory_conditions, semaphore)
+        for match in matches
+    ))
+
+def rank_and_validate_cvs(refined_job_description, mandatory_conditions, mandatory_keywords):
+    """
+    Rank CVs by relevance and validate them based on mandatory conditions (skills, experience, certificates).
+    """
+    print("Ranking CVs based on refined job description...")
+
+    query_sparse = build_query_sparse_vector(mandatory_keywords)
 
     query_embedding = generate_embeddings(refined_job_description)
     if query_embedding is None:
@@ -463,37 +714,99 @@ def rank_and_validate_cvs(refined_job_description, mandatory_conditions, mandato
     
     hdense, hsparse = hybrid_score_norm(query_embedding, query_sparse, alpha=0.20)
 
-    query_results = pinecone_index.query(
-        vector=hdense,
-        sparse_vector=hsparse,
-        top_k=10, 
-        include_metadata=True,
-        namespace="cvs-info"
-    )
+    with timed("pinecone_query"):
+        query_results = pinecone_index.query(
+            vector=hdense,
+            sparse_vector=hsparse,
+            top_k=10, 
+            include_metadata=True,
+            namespace="cvs-info",
+            filter=build_query_filter(mandatory_conditions)
+        )
 
-    valid_cvs = []
-    for match in query_results['matches']:
-        metadata = match.get('metadata', {})
-        # print(f"metadata : {metadata}")
+    validated = extract_and_validate_matches(query_results['matches'], mandatory_conditions)
+    valid_cvs = [cv for cv in validated if cv is not None]
 
-        extracted_info = extract_skills_and_experience(metadata.get('text', ''))
-        print(f"\nCV's Info: {extracted_info}")
-        
-        is_valid = validate_cv(extracted_info, mandatory_conditions)
+    valid_cvs.sort(key=lambda x: x['score'], reverse=True)  
+    print(f"Found {len(valid_cvs)} valid CVs based on the job description.")
 
-        if is_valid:
-            valid_cvs.append({
-                "cv_id": match['id'],
-                "score": match['score'],
-                "metadata": metadata,
-                "extracted_info": extracted_info  
-            })
+    return valid_cvs
 
-    valid_cvs.sort(key=lambda x: x['score'], reverse=True)  
+async def aquery_cv_matches(refined_job_description, mandatory_conditions, mandatory_keywords):
+    """
+    Run the hybrid Pinecone query for a refined job description and return its matches (empty on failure).
+    """
+    query_sparse = build_query_sparse_vector(mandatory_keywords)
+
+    query_embedding = await agenerate_embeddings(refined_job_description)
+    if query_embedding is None:
+        print("Error: Failed to generate embedding for the job description.")
+        return []
+
+    hdense, hsparse = hybrid_score_norm(query_embedding, query_sparse, alpha=0.20)
+
+    with timed("pinecone_query"):
+        query_results = await run_blocking(
+            pinecone_index.query,
+            vector=hdense,
+            sparse_vector=hsparse,
+            top_k=10,
+            include_metadata=True,
+            namespace="cvs-info",
+            filter=build_query_filter(mandatory_conditions)
+        )
+    return query_results['matches']
+
+async def arank_and_validate_cvs(refined_job_description, mandatory_conditions, mandatory_keywords):
+    """
+    Async variant of rank_and_validate_cvs. The embedding and LLM calls are awaited and the
+    Pinecone query runs on the I/O executor, so the event loop stays free for other requests.
+    """
+    print("Ranking CVs based on refined job description...")
+
+    matches = await aquery_cv_matches(refined_job_description, mandatory_conditions, mandatory_keywords)
+
+    validated = await aextract_and_validate_matches(matches, mandatory_conditions)
+    valid_cvs = [cv for cv in validated if cv is not None]
+
+    valid_cvs.sort(key=lambda x: x['score'], reverse=True)
     print(f"Found {len(valid_cvs)} valid CVs based on the job description.")
 
     return valid_cvs
 
+async def astream_rank_and_validate_cvs(refined_job_description, mandatory_conditions, mandatory_keywords):
+    """
+    Streaming variant of arank_and_validate_cvs. Yields ("matches", count) once the Pinecone query is back,
+    then ("candidate", cv) for every valid CV as soon as its extraction finishes, and finally
+    ("done", ranked_cvs) with the same sorted list arank_and_validate_cvs returns.
+    Extractions still running when the consumer stops (e.g. the client disconnected) are cancelled.
+    """
+    print("Ranking CVs based on refined job description...")
+
+    matches = await aquery_cv_matches(refined_job_description, mandatory_conditions, mandatory_keywords)
+    yield "matches", len(matches)
+
+    semaphore = asyncio.Semaphore(CV_EXTRACTION_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(aextract_and_validate_match(match, mandatory_conditions, semaphore))
+        for match in matches
+    ]
+    try:
+        valid_cvs = []
+        for next_done in asyncio.as_completed(tasks):
+            cv = await next_done
+            if cv is not None:
+                valid_cvs.append(cv)
+                yield "candidate", cv
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    valid_cvs.sort(key=lambda x: x['score'], reverse=True)
+    print(f"Found {len(valid_cvs)} valid CVs based on the job description.")
+
+    yield "done", valid_cvs
+
 
 #------------------ Function For Hybrid Algorithm--------------------------------
 
@@ -504,11 +817,13 @@ def hybrid_score_norm(dense, sparse, alpha: float):
 
     Args:
         dense: Array of floats representing
-        sparse: a dict of `indices` and `values`
+        sparse: a dict of `indices` and `values`, or None for a dense-only query
         alpha: scale between 0 and 1
     """
     if alpha < 0 or alpha > 1:
         raise ValueError("Alpha must be between 0 and 1")
+    if sparse is None:
+        return [v * alpha for v in dense], None
     hs = {
         'indices': sparse['indices'],
         'values':  [v * (1 - alpha) for v in sparse['values']]
@@ -577,77 +892,371 @@ def query_cv_by_id(cv_id):
 
 #-----------------use to integrate with front_end---------------------to run only backend use above code and comment this part--------#
 
+# Loaded CVs (index + query engine, see chat_sessions.CVChatContext) are cached per CV and content version
+# (a hash of the CV text), so follow-up questions skip the chunk embedding and the index build. Every lookup
+# fetches the stored vector first, so a re-ingested CV is answered from its new text at once; the entry built
+# from the old text is never hit again and ages out.
+CHAT_ENGINE_CACHE_SIZE = int(os.getenv("CHAT_ENGINE_CACHE_SIZE", "64"))
+CHAT_ENGINE_CACHE_BYTES = int(os.getenv("CHAT_ENGINE_CACHE_BYTES", str(256 * 1024 * 1024)))
+CHAT_ENGINE_TTL_SECONDS = float(os.getenv("CHAT_ENGINE_TTL_SECONDS", "3600"))
+
+chat_engine_cache = get_cache(
+    "chat_engines",
+    max_entries=CHAT_ENGINE_CACHE_SIZE,
+    max_bytes=CHAT_ENGINE_CACHE_BYTES,
+    ttl=CHAT_ENGINE_TTL_SECONDS,
+    sizeof=lambda context: context.size
+)
+
+def cv_content_version(cv_text):
+    return hashlib.sha256(cv_text.encode("utf-8")).hexdigest()[:16]
+
+# Long CVs are split into section chunks (see cv_sections.py) and only the CHAT_TOP_K_CHUNKS most relevant
+# chunks go into each prompt. CVs of up to CHAT_CHUNK_MAX_WORDS words stay one chunk that reuses the stored
+# Pinecone vector. Chunk embeddings go through the shared embedding cache, so a CV's chunks are embedded once
+# across sessions, restarts and workers.
+CHAT_CHUNK_MAX_WORDS = int(os.getenv("CHAT_CHUNK_MAX_WORDS", "300"))
+CHAT_TOP_K_CHUNKS = int(os.getenv("CHAT_TOP_K_CHUNKS", "3"))
+
+def estimate_engine_bytes(nodes):
+    """
+    Rough footprint of a CV index: each chunk's text is held by the node and the docstore, and its
+    embedding as a list of Python floats (~32 bytes each), plus fixed llama-index overhead.
+    """
+    return sum(2 * len(node.text.encode("utf-8")) + 32 * len(node.embedding or []) for node in nodes) + 64 * 1024
+
+@timed("embedding")
+def embed_chunk_nodes(nodes):
+    """
+    Set the embedding of every node, from the embedding cache where possible and one batched call for the rest.
+    """
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+    missing = []
+    for node, text in zip(nodes, texts):
+        node.embedding = embedding_cache.get(text)
+        if node.embedding is None:
+            missing.append((node, text))
+
+    if missing:
+        embeddings = embed_model.get_text_embedding_batch([text for _, text in missing])
+        for (node, text), embedding in zip(missing, embeddings):
+            embedding_cache.put(text, embedding)
+            node.embedding = embedding
+
+def build_cv_nodes(cv_id, cv_text, cv_embedding):
+    chunks = chunk_cv(cv_text, max_words=CHAT_CHUNK_MAX_WORDS)
+    if len(chunks) == 1 and cv_embedding:
+        return [TextNode(text=cv_text, id_=cv_id, embedding=cv_embedding)]
+
+    nodes = [
+        TextNode(text=chunk["text"], id_=f"{cv_id}#{i}", metadata={"section": chunk["section"]})
+        for i, chunk in enumerate(chunks)
+    ]
+    embed_chunk_nodes(nodes)
+    return nodes
+
+def fetch_cv_vector(cv_id):
+    """
+    The stored vector of a CV with its text, or None when the CV is not in the index.
+    """
+    print(f"Fetching details for CV ID {cv_id}...")
+    fetch_response = pinecone_index.fetch(ids=[cv_id], namespace=namespace)
+
+    if 'vectors' not in fetch_response or cv_id not in fetch_response['vectors']:
+        return None
+    vector = fetch_response['vectors'][cv_id]
+    if not (vector['metadata'] or {}).get('text'):
+        return None
+    return vector
+
+@timed("chat_index_build")
+def build_cv_chat_context(cv_id, vector):
+    """
+    Build a llama-index index over one CV's section chunks. A short CV reuses its stored vector;
+    chunk embeddings come from the embedding cache when available.
+    """
+    cv_text = vector['metadata']['text']
+    nodes = build_cv_nodes(cv_id, cv_text, vector.get('values') or None)
+    index = VectorStoreIndex(nodes, embed_model=embed_model, show_progress=False)
+    return CVChatContext(
+        cv_id, cv_content_version(cv_text), index, estimate_engine_bytes(nodes), similarity_top_k=CHAT_TOP_K_CHUNKS
+    )
+
+def get_cv_chat_context(cv_id):
+    """
+    Chat context built from the CV's current text, from the cache when that version was already built.
+    Returns (CVChatContext, error_message).
+    """
+    vector = fetch_cv_vector(cv_id)
+    if vector is None:
+        return None, "Error: CV not found."
+
+    cache_key = (cv_id, cv_content_version(vector['metadata']['text']))
+    context = chat_engine_cache.get(cache_key)
+    if context is None:
+        context = build_cv_chat_context(cv_id, vector)
+        chat_engine_cache.set(cache_key, context)
+    return context, None
+
+async def aget_cv_chat_context(cv_id):
+    """
+    Async variant of get_cv_chat_context: the fetch and any index build run on the I/O executor.
+    """
+    return await run_blocking(get_cv_chat_context, cv_id)
+
 def start_chatbot_with_cv(cv_id, question):
-    cv_text = query_cv_by_id(cv_id)
-    if cv_text:
+    try:
+        context, error = get_cv_chat_context(cv_id)
+        if context is None:
+            return error
+
+        with timed("chat_query"):
+            response = context.query_engine.query(question)
+        return str(response) 
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+async def astart_chatbot_with_cv(cv_id, question):
+    """
+    Async variant of start_chatbot_with_cv. On a cache miss the Pinecone fetch and index build
+    run on the I/O executor; the LLM answer is awaited.
+    """
+    try:
+        context, error = await aget_cv_chat_context(cv_id)
+        if context is None:
+            return error
+
+        with timed("chat_query"):
+            response = await context.query_engine.aquery(question)
+        return str(response)
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+#-----------------------------------------------Multi-Candidate Comparison-------------------------------------------------------
+
+# One question asked about several CVs at once. Answers run concurrently (at most CHAT_COMPARE_CONCURRENCY
+# at a time) on the cached CV contexts, and an optional final LLM call writes the side-by-side comparison.
+CHAT_COMPARE_CONCURRENCY = int(os.getenv("CHAT_COMPARE_CONCURRENCY", "4"))
+CHAT_COMPARE_TIMEOUT = float(os.getenv("CHAT_COMPARE_TIMEOUT", "60"))
+CHAT_COMPARE_MAX_CVS = int(os.getenv("CHAT_COMPARE_MAX_CVS", "20"))
+
+COMPARISON_SYSTEM_PROMPT = "You are an assistant helping a recruiter compare candidates. Be concise and factual."
+
+def build_comparison_prompt(question, answers):
+    prompt = f"Question asked about each candidate: {question}\n\n"
+    for answer in answers:
+        prompt += f"Candidate {answer['cv_id']}: {answer['answer'] if answer['error'] is None else 'No answer (' + answer['error'] + ')'}\n"
+    prompt += "\nCompare the candidates on this question. Name the candidates that satisfy it best, and say which ones do not."
+    return prompt
+
+async def aanswer_for_cv(cv_id, question, semaphore):
+    """
+    Answer the question for one CV. Returns {"cv_id", "answer", "error"}; failures never raise.
+    """
+    async with semaphore:
         try:
-    
-            fetch_response = pinecone_index.fetch(ids=[cv_id], namespace=namespace)
-            
-            if 'vectors' in fetch_response and cv_id in fetch_response['vectors']:
-                cv_metadata = fetch_response['vectors'][cv_id]['metadata']
-                cv_embedding = fetch_response['vectors'][cv_id]['values']  
-                
-                document_node = Document(
-                    text=cv_text,
-                    doc_id=cv_id,
-                    embedding=cv_embedding
-                )
-                
-                index = VectorStoreIndex.from_documents([document_node], embed_model=embed_model, show_progress=False)
-                query_engine = index.as_query_engine()
+            context, error = await aget_cv_chat_context(cv_id)
+            if context is None:
+                return {"cv_id": cv_id, "answer": None, "error": error}
+            with timed("chat_query"):
+                response = await asyncio.wait_for(context.query_engine.aquery(question), timeout=CHAT_COMPARE_TIMEOUT)
+            return {"cv_id": cv_id, "answer": str(response), "error": None}
+        except asyncio.TimeoutError:
+            return {"cv_id": cv_id, "answer": None, "error": "Timed out."}
+        except Exception as e:
+            return {"cv_id": cv_id, "answer": None, "error": f"Error: {str(e)}"}
 
-                response = query_engine.query(question)
-                return str(response) 
+@timed("chat_comparison")
+async def asummarize_comparison(question, answers):
+    response = await async_client.chat.completions.create(
+        **chat_completion_request(COMPARISON_SYSTEM_PROMPT, build_comparison_prompt(question, answers))
+    )
+    return response.choices[0].message.content.strip()
 
-            else:
-                return "Error: No vectors found for the provided CV."
+async def astream_compare_candidates(cv_ids, question, summarize=True):
+    """
+    Yields ("answer", answer) for each CV as soon as it is answered, then ("summary", text) when
+    summarize is set, and finally ("done", answers) with the answers in the order of cv_ids.
+    Answers still running when the consumer stops are cancelled.
+    """
+    cv_ids = list(dict.fromkeys(cv_ids))
+    semaphore = asyncio.Semaphore(CHAT_COMPARE_CONCURRENCY)
+    tasks = [asyncio.ensure_future(aanswer_for_cv(cv_id, question, semaphore)) for cv_id in cv_ids]
+    try:
+        answers = {}
+        for next_done in asyncio.as_completed(tasks):
+            answer = await next_done
+            answers[answer['cv_id']] = answer
+            yield "answer", answer
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    ordered = [answers[cv_id] for cv_id in cv_ids]
+    if summarize and any(answer['error'] is None for answer in ordered):
+        try:
+            yield "summary", await asummarize_comparison(question, ordered)
         except Exception as e:
-            return f"Error: {str(e)}"
-    else:
-        return "Error: CV not found."
+            print(f"Error summarizing the comparison: {e}")
+            yield "summary", None
+    yield "done", ordered
 
+async def acompare_candidates(cv_ids, question, summarize=True):
+    """
+    Non-streaming variant of astream_compare_candidates. Returns {"answers": [...], "summary": text or None}.
+    """
+    result = {"answers": [], "summary": None}
+    async with aclosing(astream_compare_candidates(cv_ids, question, summarize)) as events:
+        async for event, payload in events:
+            if event == "summary":
+                result["summary"] = payload
+            elif event == "done":
+                result["answers"] = payload
+    return result
+
+#-----------------------------------------------Chat Sessions-------------------------------------------------------
+
+# Multi-turn chats about one CV. A session keeps the loaded CV context and a context chat engine whose
+# memory holds the conversation, trimmed to the most recent CHAT_HISTORY_TOKEN_LIMIT tokens.
+CHAT_SESSION_IDLE_SECONDS = float(os.getenv("CHAT_SESSION_IDLE_SECONDS", "1800"))
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "1000"))
+CHAT_HISTORY_TOKEN_LIMIT = int(os.getenv("CHAT_HISTORY_TOKEN_LIMIT", "3000"))
+
+CHAT_SYSTEM_PROMPT = (
+    "You are an assistant helping a recruiter evaluate one candidate. Answer questions using the CV "
+    "provided as context and the earlier conversation. If the CV does not contain the answer, say so."
+)
 
+chat_sessions = ChatSessionStore(idle_timeout=CHAT_SESSION_IDLE_SECONDS, max_sessions=CHAT_SESSION_MAX)
 
-def normalize_string(s):
-    return re.sub(r"[\W_]+", "", s).lower()
+def new_cv_chat_engine(context):
+    """
+    Context chat engine over a loaded CV with its own, empty, token-budgeted memory.
+    """
+    return context.index.as_chat_engine(
+        chat_mode="context",
+        similarity_top_k=context.similarity_top_k,
+        memory=ChatMemoryBuffer.from_defaults(token_limit=CHAT_HISTORY_TOKEN_LIMIT),
+        system_prompt=CHAT_SYSTEM_PROMPT
+    )
 
-#--------------------------------------------------Show CV Function-----------------------------------------------------
+async def acreate_chat_session(cv_id):
+    """
+    Load the CV (or reuse its cached context) and open a session. Returns (ChatSession, error_message).
+    """
+    context, error = await aget_cv_chat_context(cv_id)
+    if context is None:
+        return None, error
 
-def show_cv(cv_id):
-    print(f"Searching for the original CV with ID '{cv_id}'...")
+    return chat_sessions.add(ChatSession(cv_id, context, new_cv_chat_engine(context))), None
+
+async def asend_chat_message(session_id, message):
+    """
+    Answer one message in a session. Returns None when the session does not exist or has expired.
+    """
+    session = chat_sessions.get(session_id)
+    if session is None:
+        return None
 
-    normalized_cv_id = normalize_string(cv_id)
+    async with session.lock:
+        with timed("chat_query"):
+            response = await session.chat_engine.achat(message)
+        session.turns += 1
+    return str(response)
+
+def close_chat_session(session_id):
+    return chat_sessions.close(session_id)
+
+#-----------------------------------------------Streaming Chat Answers-------------------------------------------------------
+
+async def astream_chat_reply(chat_engine, message):
+    """
+    Yield the answer to a message token by token as the LLM produces them. The time to the first token
+    is recorded as the chat_first_token stage. If the consumer stops early (client disconnected) the
+    LLM stream is closed, which cancels the generation, and the unfinished turn is not added to memory.
+    """
+    start = time.perf_counter()
+    with timed("chat_query"):
+        response = await chat_engine.astream_chat(message)
+        stream = response.achat_stream
+        first_token = True
+        try:
+            async for chat_response in stream:
+                if not chat_response.delta:
+                    continue
+                if first_token:
+                    stage_duration.observe(time.perf_counter() - start, stage="chat_first_token")
+                    first_token = False
+                yield chat_response.delta
+        finally:
+            await stream.aclose()
+
+async def astream_cv_answer(context, question):
+    """
+    Streaming variant of astart_chatbot_with_cv: the same query engine's answer, token by token. Timed
+    like astream_chat_reply, and closing the generator early stops the LLM stream.
+    """
+    start = time.perf_counter()
+    with timed("chat_query"):
+        response = await context.streaming_query_engine.aquery(question)
+        stream = response.response_gen
+        first_token = True
+        try:
+            async for token in stream:
+                if not token:
+                    continue
+                if first_token:
+                    stage_duration.observe(time.perf_counter() - start, stage="chat_first_token")
+                    first_token = False
+                yield token
+        finally:
+            await stream.aclose()
+
+async def astream_session_message(session, message):
+    """
+    Streaming variant of asend_chat_message for an open session.
+    """
+    async with session.lock:
+        async with aclosing(astream_chat_reply(session.chat_engine, message)) as tokens:
+            async for token in tokens:
+                yield token
+        session.turns += 1
+
+async def aquery_cv_by_id(cv_id):
+    return await run_blocking(query_cv_by_id, cv_id)
 
-    try:
-        # Search for files in the Google Drive folder
-        query = f"'{SOURCE_FOLDER_ID}' in parents and mimeType='application/pdf'"
-        results = drive_service.files().list(
-            q=query, fields="files(id, name, webViewLink)"
-        ).execute()
-        files = results.get('files', [])
 
-        if not files:
-            print("Error: No files found in the Google Drive folder.")
-            return {"success": False, "message": "No files found in the Google Drive folder."}
 
-        normalized_filenames = [(normalize_string(file['name'].rsplit('.', 1)[0]), file) for file in files]
+#--------------------------------------------------Show CV Function-----------------------------------------------------
+
+def cv_pdf_url(cv_id):
+    return f"/cvs/{quote(cv_id, safe='')}/pdf"
 
-        best_match = process.extractOne(normalized_cv_id, [filename[0] for filename in normalized_filenames])
+def show_cv(cv_id, open_browser=True):
+    """
+    Find the original CV PDF. Returns its pdf_url (served by GET /cvs/{cv_id}/pdf) and Drive link;
+    open_browser additionally opens the Drive link on this machine, for local command line use.
+    """
+    print(f"Searching for the original CV with ID '{cv_id}'...")
 
-        if best_match and best_match[1] >= 80:
-            matched_file = next(file for name, file in normalized_filenames if name == best_match[0])
+    try:
+        matched_file = drive_file_index.lookup(cv_id)
 
+        if matched_file:
             file_name = matched_file['name']
             web_view_link = matched_file['webViewLink']
 
             print(f"Found CV: {file_name}")
-            print(f"Opening CV '{file_name}' in browser...")
 
-            # Open the file in the default web browser
-            webbrowser.open(web_view_link)
+            if open_browser:
+                print(f"Opening CV '{file_name}' in browser...")
+                webbrowser.open(web_view_link)
+                message = f"Opened CV '{file_name}' successfully in the browser."
+            else:
+                message = f"Found CV '{file_name}'."
 
-            return {"success": True, "message": f"Opened CV '{file_name}' successfully in the browser."}
+            return {"success": True, "message": message, "file_name": file_name,
+                    "pdf_url": cv_pdf_url(cv_id), "web_view_link": web_view_link}
 
         else:
             print(f"No matching CV PDF found for ID '{cv_id}'.")
@@ -657,6 +1266,54 @@ def show_cv(cv_id):
         print(f"Error accessing Google Drive or processing files: {e}")
         return {"success": False, "message": f"Error accessing Google Drive: {e}"}
         
+async def ashow_cv(cv_id, open_browser=False):
+    return await run_blocking(show_cv, cv_id, open_browser)
+
+#--------------------------------------------------CV PDF Download-----------------------------------------------------
+
+# Original PDFs served by the backend, cached on disk by their Drive MD5 so repeat views never touch Drive
+pdf_cache = PDFCache()
+
+def download_drive_file(file_id, file_object):
+    request = get_drive_service().files().get_media(fileId=file_id)
+    downloader = MediaIoBaseDownload(file_object, request, chunksize=4 * 1024 * 1024)
+    done = False
+    while not done:
+        _, done = downloader.next_chunk()
+
+def find_cv_pdf(cv_id):
+    """
+    Return (file, None) for the Drive file of a CV's original PDF, with its md5Checksum, or
+    (None, message) when there is none. Served from the Drive file index, without a download.
+    """
+    matched_file = drive_file_index.lookup(cv_id)
+    if matched_file is None:
+        return None, f"No matching CV PDF found for ID '{cv_id}'."
+    if not matched_file.get('md5Checksum'):
+        return None, f"Google Drive has no checksum for '{matched_file['name']}'."
+    return matched_file, None
+
+@timed("cv_pdf")
+def get_cv_pdf(file):
+    """
+    Return the cached path of a file found by find_cv_pdf, downloading it into the cache on first use.
+    The file stays pinned in the cache until release_cv_pdf(file) is called.
+    """
+    return pdf_cache.fetch(
+        file['md5Checksum'],
+        lambda file_object: download_drive_file(file['id'], file_object),
+        pin=True
+    )
+
+def release_cv_pdf(file):
+    pdf_cache.unpin(file['md5Checksum'])
+
+async def afind_cv_pdf(cv_id):
+    return await run_blocking(find_cv_pdf, cv_id)
+
+async def aget_cv_pdf(file):
+    return await run_blocking(get_cv_pdf, file)
+
 #-------------------------------------------------Main Section------------------------------------------------------
 
 if __name__ == "__main__":
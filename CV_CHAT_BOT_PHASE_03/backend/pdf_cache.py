@@ -0,0 +1,137 @@
+import os
+import re
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+
+
+#------------------------------------------------On-Disk PDF Cache------------------------------------------------
+
+DEFAULT_PDF_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "pdfs")
+
+CONTENT_KEY_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class PDFCache:
+    """
+    Content-addressed cache of original CV PDFs: each file is stored once as <md5>.pdf, so a renamed
+    or re-shared Drive file with the same bytes is never downloaded again and a changed file gets a new
+    key. Downloads go to a temp file and are renamed into place only after their MD5 is verified, so
+    readers never see a partial PDF. Beyond max_bytes the least recently served files are removed,
+    except those pinned by a response that is still reading them (fetch(pin=True) ... unpin).
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or os.getenv("CV_PDF_CACHE_DIR", DEFAULT_PDF_CACHE_DIR)
+        self.max_bytes = max_bytes or int(os.getenv("CV_PDF_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+        os.makedirs(self.directory, exist_ok=True)
+        self._key_locks = {}
+        self._pins = Counter()
+        self._lock = threading.Lock()
+
+    def path_for(self, md5):
+        if not CONTENT_KEY_PATTERN.match(md5):
+            raise ValueError(f"Not an MD5 checksum: {md5!r}")
+        return os.path.join(self.directory, f"{md5}.pdf")
+
+    def get(self, md5):
+        """
+        Return the cached path for md5, or None. A hit refreshes the file's access time for eviction.
+        """
+        path = self.path_for(md5)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def _key_lock(self, md5):
+        with self._lock:
+            return self._key_locks.setdefault(md5, threading.Lock())
+
+    def pin(self, md5):
+        with self._lock:
+            self._pins[md5] += 1
+
+    def unpin(self, md5):
+        with self._lock:
+            self._pins[md5] -= 1
+            if self._pins[md5] <= 0:
+                del self._pins[md5]
+
+    def fetch(self, md5, download, pin=False):
+        """
+        Return the cached path for md5, calling download(file_object) to fill it on a miss. Concurrent
+        misses for the same PDF share one download. With pin=True the file is kept out of eviction
+        until unpin(md5) is called.
+        """
+        if pin:
+            self.pin(md5)
+        try:
+            return self._fetch(md5, download)
+        except BaseException:
+            if pin:
+                self.unpin(md5)
+            raise
+
+    def _fetch(self, md5, download):
+        path = self.get(md5)
+        if path is not None:
+            return path
+
+        with self._key_lock(md5):
+            path = self.get(md5)
+            if path is not None:
+                return path
+
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as temp_file:
+                    download(temp_file)
+                if file_md5(temp_path) != md5:
+                    raise ValueError("Downloaded PDF does not match its Drive checksum.")
+                path = self.path_for(md5)
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+        # Dropped only once the PDF is in place: after a failed download, callers still waiting on this
+        # lock must share it, or a new lock would let a second download run alongside their retry
+        with self._lock:
+            self._key_locks.pop(md5, None)
+
+        self.evict()
+        return path
+
+    def evict(self):
+        """
+        Remove the least recently served PDFs that are not pinned until the cache fits in max_bytes.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pdf"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            with self._lock:
+                # Checked under the lock, so a fetch that pins this file cannot slip in before the remove
+                if os.path.basename(path)[:-len(".pdf")] in self._pins:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+def file_md5(path, chunk_size=1024 * 1024):
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,214 @@
+import io
+import os
+import time
+import queue
+import itertools
+import threading
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import markdownify
+from PyPDF2 import PdfReader
+
+
+def available_cpus():
+    """
+    Cores this process may run on (its CPU affinity, e.g. under taskset or a container cpuset).
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+#------------------------------------------------Worker Tasks------------------------------------------------
+
+# Module level, so the process pool can send them to workers by reference. This module has no import-time
+# setup, so the workers only load markdownify and PyPDF2 besides it.
+
+_started = None  # Queue on which a worker reports each task it starts
+
+def _init_worker(started):
+    global _started
+    _started = started
+
+def _run_task(task_id, func, *args):
+    _started.put(task_id)
+    return func(*args)
+
+def _open_pdf(source):
+    """
+    source is the PDF bytes, or (shared memory name, size) for a PDF that several page tasks read.
+    """
+    if isinstance(source, tuple):
+        name, size = source
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            pdf_content = bytes(shm.buf[:size])
+        finally:
+            shm.close()
+    else:
+        pdf_content = source
+    return PdfReader(io.BytesIO(pdf_content))
+
+def extract_page_text(source, start=0, stop=None):
+    """
+    Text of pages start..stop of a PDF. Each page is extracted once; empty pages are skipped.
+    """
+    texts = (page.extract_text() for page in _open_pdf(source).pages[start:stop])
+    return "".join(text for text in texts if text)
+
+def extract_markdown(source):
+    return markdownify.markdownify(extract_page_text(source))
+
+#------------------------------------------------PDF Extractor------------------------------------------------
+
+class PDFExtractor:
+    """
+    Converts CV PDFs to Markdown in a pool of worker processes, so text extraction (CPU-bound, and
+    serialized by the GIL in threads) runs on every available core while ingestion threads wait.
+
+    A PDF with at least page_parallel_threshold pages is split into tasks of pages_per_task pages that
+    run on several workers at once. Its bytes are placed once in shared memory, which those tasks
+    map by name instead of each receiving a pickled copy.
+
+    A task still running timeout seconds after a worker started it is given up on, along with its
+    document; time spent queued behind other PDFs does not count. The worker is stuck in the PDF and
+    cannot be interrupted, so the pool is killed and a fresh one started; conversions that were
+    running in it are retried once there.
+
+    Workers are started by a fork server (spawn where there is none), never forked from this process,
+    so pool restarts are safe while ingestion threads hold locks. Like any spawned process they import
+    the main script again, as __mp_main__, so its setup must be skipped under that name.
+    """
+
+    def __init__(self, workers=None, timeout=None, page_parallel_threshold=None, pages_per_task=None):
+        self.workers = workers or int(os.getenv("PDF_EXTRACTION_WORKERS", str(available_cpus())))
+        self.timeout = timeout or float(os.getenv("PDF_EXTRACTION_TIMEOUT_SECONDS", "60"))
+        self.page_parallel_threshold = page_parallel_threshold or int(os.getenv("PDF_PAGE_PARALLEL_THRESHOLD", "16"))
+        self.pages_per_task = pages_per_task or int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+        self.timeouts = 0
+        self._executor = None
+        self._started_queue = None
+        self._started = {}  # task_id -> time.monotonic() when its start was seen, for tasks being waited on
+        self._task_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                context = multiprocessing.get_context(method)
+                if method == "forkserver":
+                    context.set_forkserver_preload(["pdf_extraction"])
+                if os.name == "posix":
+                    # Workers must share this process's tracker, or each one reports the shared memory
+                    # it attached as leaked when it exits
+                    resource_tracker.ensure_running()
+                self._started_queue = context.Queue()
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=context, initializer=_init_worker, initargs=(self._started_queue,)
+                )
+            return self._executor
+
+    def start(self):
+        """
+        Start the fork server and a worker now, so the first PDF does not wait for them.
+        """
+        self._pool().submit(int).result()
+
+    def _submit(self, executor, func, *args):
+        task_id = next(self._task_ids)
+        with self._lock:
+            self._started[task_id] = None
+        return task_id, executor.submit(_run_task, task_id, func, *args)
+
+    def _start_time(self, task_id):
+        with self._lock:
+            while self._started_queue is not None:
+                try:
+                    started_id = self._started_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if self._started.get(started_id, 0) is None:
+                    self._started[started_id] = time.monotonic()
+            return self._started.get(task_id)
+
+    def _result(self, task):
+        """
+        Wait for a task, raising FutureTimeoutError once it has run for timeout seconds. The clock
+        starts when a worker picks the task up.
+        """
+        task_id, future = task
+        try:
+            while True:
+                started = self._start_time(task_id)
+                wait = 0.05 if started is None else started + self.timeout - time.monotonic()
+                if wait <= 0:
+                    raise FutureTimeoutError()
+                try:
+                    return future.result(timeout=wait)
+                except FutureTimeoutError:
+                    continue
+        finally:
+            with self._lock:
+                self._started.pop(task_id, None)
+
+    def _recycle(self, executor):
+        with self._lock:
+            if self._executor is not executor:
+                return  # Another thread already replaced it
+            self._executor = None
+            self._started_queue = None
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _convert(self, executor, pdf_content):
+        page_count = len(PdfReader(io.BytesIO(pdf_content)).pages) if self.workers > 1 else 0
+        if page_count < self.page_parallel_threshold:
+            return self._result(self._submit(executor, extract_markdown, pdf_content))
+
+        shm = shared_memory.SharedMemory(create=True, size=len(pdf_content))
+        try:
+            shm.buf[:len(pdf_content)] = pdf_content
+            source = (shm.name, len(pdf_content))
+            tasks = [
+                self._submit(executor, extract_page_text, source, start, start + self.pages_per_task)
+                for start in range(0, page_count, self.pages_per_task)
+            ]
+            try:
+                text = "".join(self._result(task) for task in tasks)
+            finally:
+                for _, future in tasks:
+                    future.cancel()
+                with self._lock:
+                    for task_id, _ in tasks:
+                        self._started.pop(task_id, None)
+        finally:
+            shm.close()
+            shm.unlink()
+        return self._result(self._submit(executor, markdownify.markdownify, text))
+
+    def convert(self, pdf_content):
+        """
+        Markdown text of a PDF, or None if it could not be read or timed out.
+        """
+        for attempt in range(2):
+            executor = self._pool()
+            try:
+                return self._convert(executor, pdf_content)
+            except FutureTimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                print(f"PDF conversion timed out after {self.timeout:.0f}s. Restarting the extraction workers.")
+                self._recycle(executor)
+                return None
+            except BrokenProcessPool:
+                self._recycle(executor)
+                if attempt == 1:
+                    print("Error converting PDF to Markdown: the extraction workers stopped.")
+            except Exception as e:
+                print(f"Error converting PDF to Markdown: {e}")
+                return None
+        return None
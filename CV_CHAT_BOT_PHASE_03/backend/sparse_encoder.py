@@ -0,0 +1,168 @@
+import os
+import re
+import json
+import math
+import sqlite3
+import hashlib
+import threading
+from collections import Counter
+
+
+#------------------------------------------------Tokenization------------------------------------------------
+
+# Keeps tech tokens such as "c++", "c#", "node.js" and "ci/cd" intact.
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#./\-]*[a-z0-9+#]|[a-z0-9]")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the to was were will with
+we our you your they their this these those i me my he she his her them us not no but if than then
+""".split())
+
+def tokenize(text):
+    """
+    Lowercase, split into word tokens and drop stopwords.
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def term_id(token):
+    """
+    Stable 32-bit id for a token. Hashing gives ingestion and query the same vocabulary without storing one.
+    """
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "big")
+
+#------------------------------------------------BM25 Sparse Encoder------------------------------------------------
+
+DEFAULT_SPARSE_ENCODER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "bm25_stats.sqlite3")
+
+
+class BM25SparseEncoder:
+    """
+    BM25 split across the two sides of a sparse dot product.
+
+    Documents are encoded with the BM25 term-frequency part, and queries with the IDF of their own
+    terms only, so the dot product Pinecone computes is the BM25 score. Corpus statistics (document
+    count, total length, per-term document frequency) live in SQLite next to the other backend data.
+    fit_document updates them incrementally at ingest, and re-fitting a doc_id replaces its old
+    contribution.
+    """
+
+    def __init__(self, path=None, k1=1.2, b=0.75):
+        self.path = path or os.getenv("SPARSE_ENCODER_PATH", DEFAULT_SPARSE_ENCODER_PATH)
+        self.k1 = k1
+        self.b = b
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = self._connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS corpus_stats (key TEXT PRIMARY KEY, value REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS doc_freq (term_id INTEGER PRIMARY KEY, df INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS documents (doc_id TEXT PRIMARY KEY, length INTEGER NOT NULL, term_ids TEXT NOT NULL);
+        """)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def corpus_stats(self):
+        rows = dict(self._connection().execute("SELECT key, value FROM corpus_stats").fetchall())
+        n_docs = int(rows.get("n_docs", 0))
+        avg_length = rows.get("total_length", 0) / n_docs if n_docs else 0.0
+        return n_docs, avg_length
+
+    def fit_document(self, doc_id, text):
+        """
+        Add (or replace) one document in the corpus statistics.
+        """
+        tokens = tokenize(text)
+        term_ids = sorted({term_id(token) for token in tokens})
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._remove(conn, doc_id)
+            conn.executemany(
+                "INSERT INTO doc_freq (term_id, df) VALUES (?, 1) ON CONFLICT(term_id) DO UPDATE SET df = df + 1",
+                [(t,) for t in term_ids]
+            )
+            conn.execute("DELETE FROM doc_freq WHERE df <= 0")
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, length, term_ids) VALUES (?, ?, ?)",
+                (doc_id, len(tokens), json.dumps(term_ids))
+            )
+            self._add_stat(conn, "n_docs", 1)
+            self._add_stat(conn, "total_length", len(tokens))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def remove_document(self, doc_id):
+        """
+        Take a deleted document out of the corpus statistics.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._remove(conn, doc_id)
+            conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+            conn.execute("DELETE FROM doc_freq WHERE df <= 0")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _remove(self, conn, doc_id):
+        previous = conn.execute("SELECT length, term_ids FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        if previous is not None:
+            old_length, old_term_ids = previous
+            conn.executemany("UPDATE doc_freq SET df = df - 1 WHERE term_id = ?", [(t,) for t in json.loads(old_term_ids)])
+            self._add_stat(conn, "n_docs", -1)
+            self._add_stat(conn, "total_length", -old_length)
+
+    @staticmethod
+    def _add_stat(conn, key, delta):
+        conn.execute(
+            "INSERT INTO corpus_stats (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = value + ?",
+            (key, delta, delta)
+        )
+
+    def encode_document(self, text):
+        """
+        Sparse vector holding the BM25 term-frequency weight of every distinct term in the document.
+        """
+        counts = Counter(term_id(token) for token in tokenize(text))
+        if not counts:
+            return None
+
+        length = sum(counts.values())
+        _, avg_length = self.corpus_stats()
+        norm = self.k1 * (1 - self.b + self.b * length / (avg_length or length))
+
+        indices = sorted(counts)
+        return {
+            "indices": indices,
+            "values": [counts[t] * (self.k1 + 1) / (counts[t] + norm) for t in indices]
+        }
+
+    def encode_query(self, texts):
+        """
+        Sparse vector holding the IDF of the distinct query terms only.
+        """
+        term_ids = sorted({term_id(token) for text in texts for token in tokenize(text)})
+        if not term_ids:
+            return None
+
+        n_docs, _ = self.corpus_stats()
+        conn = self._connection()
+        placeholders = ",".join("?" * len(term_ids))
+        doc_freq = dict(conn.execute(f"SELECT term_id, df FROM doc_freq WHERE term_id IN ({placeholders})", term_ids).fetchall())
+
+        return {
+            "indices": term_ids,
+            "values": [math.log(1 + (n_docs - doc_freq.get(t, 0) + 0.5) / (doc_freq.get(t, 0) + 0.5)) for t in term_ids]
+        }
@@ -0,0 +1,126 @@
+import json
+import time
+import threading
+
+
+#------------------------------------------------Batched Existence Checks------------------------------------------------
+
+# Pinecone fetch sends the ids in the query string, so keep each request well under URL length limits
+FETCH_BATCH_SIZE = 200
+
+def fetch_existing_ids(index, ids, namespace, batch_size=FETCH_BATCH_SIZE):
+    """
+    Return the subset of ids already stored in the namespace, using one fetch per batch_size ids.
+    A failed fetch is printed and its ids treated as missing, like the single-id checks it replaces.
+    """
+    ids = list(dict.fromkeys(ids))
+    existing = set()
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        try:
+            fetch_response = index.fetch(ids=batch, namespace=namespace)
+            existing.update(fetch_response.get('vectors', {}) or {})
+        except Exception as e:
+            print(f"Error checking document existence in Pinecone: {e}")
+    return existing
+
+#------------------------------------------------Buffered Upserts------------------------------------------------
+
+def vector_bytes(vector):
+    """
+    Approximate request size of one vector: its JSON encoding, which is what the Pinecone client sends.
+    """
+    return len(json.dumps(vector, default=str))
+
+class UpsertBuffer:
+    """
+    Collects vectors and upserts them in batches bounded by count (max_vectors) and request size
+    (max_bytes; Pinecone rejects requests over 2 MB, and CV vectors carry the full text as metadata).
+
+    Transient failures are retried with backoff. A batch the server rejects (4xx) is split in half and
+    each half written on its own, so one bad vector costs only itself. Ids that could not be written
+    end up in failed_ids.
+
+    on_written(ids) and on_failed(ids) are called after each batch is written or given up on.
+    Safe to share between pipeline threads. Use as a context manager, or call flush() when done.
+    """
+
+    def __init__(self, index, namespace, max_vectors=100, max_bytes=1536 * 1024, max_retries=3, backoff_seconds=1.0,
+                 on_written=None, on_failed=None):
+        self.index = index
+        self.namespace = namespace
+        self.on_written = on_written
+        self.on_failed = on_failed
+        self.max_vectors = max_vectors
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.upserted = 0
+        self.requests = 0
+        self.failed_ids = []
+        self._pending = []
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, vector):
+        size = vector_bytes(vector)
+        with self._lock:
+            batch = None
+            if self._pending and (len(self._pending) >= self.max_vectors or self._pending_bytes + size > self.max_bytes):
+                batch = self._take()
+            self._pending.append(vector)
+            self._pending_bytes += size
+        if batch:
+            self._write(batch)
+
+    def _take(self):
+        batch, self._pending, self._pending_bytes = self._pending, [], 0
+        return batch
+
+    def flush(self):
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        rejected = False
+        for attempt in range(self.max_retries):
+            try:
+                with self._lock:
+                    self.requests += 1
+                self.index.upsert(vectors=batch, namespace=self.namespace)
+                with self._lock:
+                    self.upserted += len(batch)
+                print(f"Upserted {len(batch)} vectors into namespace '{self.namespace}'.")
+                if self.on_written is not None:
+                    self.on_written([vector['id'] for vector in batch])
+                return
+            except Exception as e:
+                print(f"Error upserting a batch of {len(batch)} vectors (attempt {attempt + 1}/{self.max_retries}): {e}")
+                # A 4xx other than rate limiting means the request itself is bad: retrying it as is cannot help
+                status = getattr(e, "status", None)
+                rejected = isinstance(status, int) and 400 <= status < 500 and status != 429
+                if rejected:
+                    break
+                if attempt + 1 < self.max_retries:
+                    time.sleep(self.backoff_seconds * 2 ** attempt)
+
+        if rejected and len(batch) > 1:
+            middle = len(batch) // 2
+            self._write(batch[:middle])
+            self._write(batch[middle:])
+            return
+
+        with self._lock:
+            self.failed_ids.extend(vector['id'] for vector in batch)
+        print(f"Giving up on {len(batch)} vectors: {', '.join(vector['id'] for vector in batch[:5])}{' ...' if len(batch) > 5 else ''}")
+        if self.on_failed is not None:
+            self.on_failed([vector['id'] for vector in batch])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
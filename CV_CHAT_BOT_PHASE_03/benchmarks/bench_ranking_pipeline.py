@@ -0,0 +1,372 @@
+"""
+Stage-level benchmark for the /rank_cvs pipeline and the CV chatbot.
+
+model_for_phase_03 runs unchanged against in-process fakes: FakeOpenAI / FakeEmbedding / FakeLLM for OpenAI,
+and the local vector engine (VECTOR_STORE=local) behind LatencyVectorIndex for Pinecone. The injected
+latencies are configurable, and a synthetic CV corpus is ingested into a scratch directory on every run.
+
+Every stage is reported with p50/p95/p99 latency and throughput, and so is the whole ranking request, both
+sequential and with concurrent async requests the way app.py serves them. Each run is appended to
+results/history.jsonl with the git commit and compared against the last run that used the same settings.
+
+Usage (from CV_CHAT_BOT_PHASE_03):
+    python benchmarks/bench_ranking_pipeline.py
+    python benchmarks/bench_ranking_pipeline.py --iterations 100 --llm-latency-ms 600 --cache warm
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCHMARK_DIR, "..", "backend")
+DEFAULT_RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+
+sys.path.append(BACKEND_DIR)
+
+
+#------------------------------------------------Arguments------------------------------------------------
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the CV ranking pipeline stage by stage.")
+    parser.add_argument("--iterations", type=int, default=30, help="measured requests per stage")
+    parser.add_argument("--warmup", type=int, default=3, help="unmeasured requests before measuring")
+    parser.add_argument("--corpus-size", type=int, default=500, help="synthetic CVs in the cvs-info namespace")
+    parser.add_argument("--unprofiled-fraction", type=float, default=0.0,
+                        help="share of CVs ingested without a stored profile (ranked through LLM extraction)")
+    parser.add_argument("--cache", choices=["cold", "warm"], default="cold",
+                        help="cold: a new job description per request and empty LLM caches; warm: a small repeated set")
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=60.0)
+    parser.add_argument("--vector-latency-ms", type=float, default=40.0)
+    parser.add_argument("--jitter", type=float, default=0.2, help="uniform +/- spread of every latency, as a fraction")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent requests in the async end-to-end run")
+    parser.add_argument("--workdir", help="scratch directory for the corpus and caches (default: a temp dir)")
+    parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR)
+    parser.add_argument("--no-save", action="store_true", help="do not append this run to the history")
+    parser.add_argument("--regression-threshold", type=float, default=0.10,
+                        help="flag stages whose p95 grew by more than this fraction against the baseline")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if a stage regressed")
+    parser.add_argument("--verbose", action="store_true", help="keep the backend's own print output")
+    return parser.parse_args()
+
+#------------------------------------------------Environment------------------------------------------------
+
+def configure_environment(workdir):
+    """
+    Point every backend store at the scratch directory. Must run before model_for_phase_03 is imported.
+    """
+    os.environ["OpenAI_Key"] = "benchmark"
+    os.environ["VECTOR_STORE"] = "local"
+    os.environ["LOCAL_VECTOR_STORE_DIR"] = os.path.join(workdir, "vector_store")
+    os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(workdir, "embeddings")
+    os.environ["EXTRACTION_STORE_PATH"] = os.path.join(workdir, "extractions.sqlite3")
+    os.environ["SPARSE_ENCODER_PATH"] = os.path.join(workdir, "bm25_stats.sqlite3")
+
+def install_fakes(model, args):
+    """
+    Swap the backend's OpenAI clients, embedding model, LLM and vector index for the fakes.
+    """
+    from llama_index.core import Settings
+    from embedding_cache import EmbeddingCache
+    from example_index import ExampleIndex
+    from fakes import FakeOpenAI, FakeAsyncOpenAI, FakeEmbedding, FakeLLM, LatencyVectorIndex
+
+    model.client = FakeOpenAI(args.llm_latency_ms, args.jitter)
+    model.async_client = FakeAsyncOpenAI(args.llm_latency_ms, args.jitter)
+    model.embed_model = FakeEmbedding(latency_ms=args.embedding_latency_ms, jitter=args.jitter)
+    model.embedding_cache = EmbeddingCache(model.embed_model.model_name)
+    Settings.llm = FakeLLM(latency_ms=args.llm_latency_ms, jitter=args.jitter)
+    Settings.embed_model = model.embed_model
+
+    model.pinecone_index = LatencyVectorIndex(model.pinecone_index, args.vector_latency_ms, args.jitter)
+    model.example_index = ExampleIndex(model.pinecone_index, namespace="examples_and_instructions")
+
+#------------------------------------------------Synthetic Data------------------------------------------------
+
+SEED_EXAMPLES = [
+    ("We need a Software Engineer with 3+ years of experience in Python and Django.", ["software engineer", "3+ years", "python", "django"]),
+    ("Seeking a Data Scientist with 5+ years of experience in Python, TensorFlow and PyTorch.", ["data scientist", "5+ years", "python", "tensorflow", "pytorch"]),
+    ("Looking for a Project Manager with 7+ years of experience and Agile expertise.", ["project manager", "7+ years", "agile"]),
+    ("We are looking for a QA Engineer with Selenium and JIRA experience.", ["qa engineer", "selenium", "jira"]),
+    ("We need a Backend Developer with Node.js, PostgreSQL and AWS.", ["backend developer", "node.js", "postgresql", "aws"]),
+    ("Seeking a Frontend Developer with React and TypeScript.", ["frontend developer", "react", "typescript"])
+]
+
+SEED_INSTRUCTIONS = "Refine the job description, keep the mandatory skills and years of experience, and end with an exclusion statement."
+
+CHAT_QUESTIONS = [
+    "What are the candidate's key skills?",
+    "How many years of experience does the candidate have?",
+    "Has the candidate worked with cloud platforms?"
+]
+
+def ingest_synthetic_data(model, args):
+    """
+    Load the examples namespace and the synthetic CV corpus into the local vector store.
+    Returns the corpus.
+    """
+    from cv_profile import profile_to_metadata
+    from fakes import build_corpus, hashed_embedding
+
+    index = model.pinecone_index._index
+
+    seed_vectors = [{
+        "id": "instructions",
+        "values": hashed_embedding(SEED_INSTRUCTIONS),
+        "metadata": {"type": "instruction", "content": SEED_INSTRUCTIONS}
+    }]
+    for i, (job_description, keywords) in enumerate(SEED_EXAMPLES, start=1):
+        seed_vectors.append({
+            "id": f"example_{i}",
+            "values": hashed_embedding(job_description),
+            "metadata": {"type": "example", "job_description": job_description, "mandatory_keywords": keywords}
+        })
+    index.upsert(vectors=seed_vectors, namespace="examples_and_instructions")
+
+    corpus = build_corpus(args.corpus_size)
+    unprofiled = int(round(len(corpus) * args.unprofiled_fraction))
+
+    # Two passes, like reencode_sparse_vectors: fit the corpus statistics first, then encode every CV
+    for cv in corpus:
+        model.sparse_encoder.fit_document(cv["id"], cv["text"])
+
+    vectors = []
+    for position, cv in enumerate(corpus):
+        metadata = {"text": cv["text"]}
+        if position >= unprofiled:
+            metadata.update(profile_to_metadata(cv["profile"]))
+        vectors.append({
+            "id": cv["id"],
+            "values": hashed_embedding(cv["text"]),
+            "metadata": metadata,
+            "sparse_values": model.sparse_encoder.encode_document(cv["text"])
+        })
+    for start in range(0, len(vectors), 100):
+        index.upsert(vectors=vectors[start:start + 100], namespace="cvs-info")
+
+    model.refresh_example_index()
+    return corpus
+
+#------------------------------------------------Measurement------------------------------------------------
+
+def summarize(latencies, wall_seconds=None):
+    """
+    Latency percentiles in milliseconds. Throughput is requests per second of wall time when given,
+    otherwise of the summed latencies (one request at a time).
+    """
+    samples = np.asarray(latencies, dtype=np.float64)
+    elapsed = wall_seconds if wall_seconds is not None else float(samples.sum())
+    return {
+        "count": int(samples.size),
+        "mean_ms": float(samples.mean() * 1000),
+        "p50_ms": float(np.percentile(samples, 50) * 1000),
+        "p95_ms": float(np.percentile(samples, 95) * 1000),
+        "p99_ms": float(np.percentile(samples, 99) * 1000),
+        "max_ms": float(samples.max() * 1000),
+        "throughput_per_s": float(samples.size / elapsed) if elapsed else 0.0
+    }
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {}
+
+    def call(self, stage, func, *args, record=True, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        if record:
+            self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+        return result
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+def reset_caches(model, args, run_number):
+    """
+    Cold runs start every request with empty LLM caches and an empty extraction store.
+    Embeddings need no reset: every cold request uses a job description that was never embedded.
+    """
+    if args.cache == "warm":
+        return
+    from extraction_store import ExtractionStore
+
+    model.refine_cache.clear()
+    model.extraction_cache.clear()
+    model.conditions_cache.clear()
+    model.extraction_store = ExtractionStore(path=os.path.join(args.workdir, "extractions", f"run_{run_number}.sqlite3"))
+
+def job_description_for(job_descriptions, args, run_number):
+    job_description = job_descriptions[run_number % len(job_descriptions)]
+    if args.cache == "cold":
+        job_description = f"{job_description} Requisition {run_number}."
+    return job_description
+
+def run_sequential(model, args, job_descriptions, corpus):
+    timer = StageTimer()
+
+    for run_number in range(args.warmup + args.iterations):
+        record = run_number >= args.warmup
+        reset_caches(model, args, run_number)
+        job_description = job_description_for(job_descriptions, args, run_number)
+
+        # The /rank_cvs request, stage by stage
+        start = time.perf_counter()
+        examples, instructions = timer.call("retrieve_examples_and_instructions", model.retrieve_examples_and_instructions, job_description, record=record)
+        refined = timer.call("refine_user_prompt_with_llm", model.refine_user_prompt_with_llm, job_description, examples, instructions, record=record)
+        conditions, keywords = timer.call("extract_mandatory_conditions", model.extract_mandatory_conditions, refined, record=record)
+        ranked = timer.call("rank_and_validate_cvs", model.rank_and_validate_cvs, refined, conditions, keywords, record=record)
+        if record:
+            timer.add("end_to_end_rank_cvs", time.perf_counter() - start)
+
+        # CPU-only stages inside rank_and_validate_cvs, measured on the same inputs
+        query_texts = [str(item) for item in keywords if item]
+        sparse = timer.call("generate_bm25_sparse_vector", model.generate_bm25_sparse_vector, query_texts, record=record)
+        dense = model.generate_embeddings(refined)
+        timer.call("hybrid_score_norm", model.hybrid_score_norm, dense, sparse, 0.20, record=record)
+
+        # The /chatbot request for the best match (or any CV when nothing validated)
+        cv_id = ranked[0]["cv_id"] if ranked else corpus[run_number % len(corpus)]["id"]
+        timer.call("start_chatbot_with_cv", model.start_chatbot_with_cv, cv_id, CHAT_QUESTIONS[run_number % len(CHAT_QUESTIONS)], record=record)
+
+    return {stage: summarize(samples) for stage, samples in timer.samples.items()}
+
+def run_concurrent(model, args, job_descriptions):
+    """
+    The async /rank_cvs handler path with args.concurrency requests in flight.
+    """
+    reset_caches(model, args, "concurrent")
+    offset = args.warmup + args.iterations
+
+    async def one_request(run_number, semaphore, latencies):
+        async with semaphore:
+            job_description = job_description_for(job_descriptions, args, offset + run_number)
+            start = time.perf_counter()
+            examples, instructions = await model.aretrieve_examples_and_instructions(job_description)
+            refined = await model.arefine_user_prompt_with_llm(job_description, examples, instructions)
+            conditions, keywords = await model.aextract_mandatory_conditions(refined)
+            await model.arank_and_validate_cvs(refined, conditions, keywords)
+            latencies.append(time.perf_counter() - start)
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request(i, semaphore, latencies) for i in range(args.iterations)))
+        return latencies, time.perf_counter() - start
+
+    latencies, wall_seconds = asyncio.run(run_all())
+    return {f"end_to_end_rank_cvs_async_c{args.concurrency}": summarize(latencies, wall_seconds)}
+
+#------------------------------------------------Results History------------------------------------------------
+
+def current_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BENCHMARK_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except Exception:
+        return "unknown"
+
+def comparable_config(args):
+    return {
+        "iterations": args.iterations,
+        "corpus_size": args.corpus_size,
+        "unprofiled_fraction": args.unprofiled_fraction,
+        "cache": args.cache,
+        "llm_latency_ms": args.llm_latency_ms,
+        "embedding_latency_ms": args.embedding_latency_ms,
+        "vector_latency_ms": args.vector_latency_ms,
+        "jitter": args.jitter,
+        "concurrency": args.concurrency
+    }
+
+def load_baseline(history_path, config):
+    """
+    The most recent stored run with the same settings, or None.
+    """
+    if not os.path.exists(history_path):
+        return None
+    baseline = None
+    with open(history_path, encoding="utf-8") as history:
+        for line in history:
+            try:
+                run = json.loads(line)
+            except ValueError:
+                continue
+            if run.get("config") == config:
+                baseline = run
+    return baseline
+
+def print_report(stages, baseline, threshold):
+    """
+    Print the stage table. Returns the names of stages whose p95 regressed past the threshold.
+    """
+    regressions = []
+    print(f"\n{'stage':<42}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}  vs baseline p95")
+    for stage, stats in stages.items():
+        change = ""
+        previous = (baseline or {}).get("stages", {}).get(stage)
+        if previous and previous["p95_ms"] > 0:
+            ratio = stats["p95_ms"] / previous["p95_ms"] - 1
+            change = f"{ratio:+.1%}"
+            if ratio > threshold:
+                change += "  REGRESSION"
+                regressions.append(stage)
+        print(f"{stage:<42}{stats['count']:>5}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['throughput_per_s']:>9.2f}  {change}")
+    if baseline:
+        print(f"\nBaseline: commit {baseline['commit']} at {baseline['timestamp']}")
+    return regressions
+
+#------------------------------------------------Main------------------------------------------------
+
+def main():
+    args = parse_args()
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix="cv-bench-")
+    configure_environment(args.workdir)
+
+    backend_output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with backend_output:
+        import model_for_phase_03 as model
+        from fakes import build_job_descriptions
+
+        install_fakes(model, args)
+        corpus = ingest_synthetic_data(model, args)
+        job_descriptions = build_job_descriptions(5 if args.cache == "warm" else 50)
+
+        stages = run_sequential(model, args, job_descriptions, corpus)
+        stages.update(run_concurrent(model, args, job_descriptions))
+        model.shutdown_executor()
+
+    config = comparable_config(args)
+    history_path = os.path.join(args.results_dir, "history.jsonl")
+    baseline = load_baseline(history_path, config)
+    regressions = print_report(stages, baseline, args.regression_threshold)
+
+    if not args.no_save:
+        os.makedirs(args.results_dir, exist_ok=True)
+        run = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": current_commit(),
+            "config": config,
+            "stages": stages
+        }
+        with open(history_path, "a", encoding="utf-8") as history:
+            history.write(json.dumps(run) + "\n")
+        print(f"Saved results to {history_path}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
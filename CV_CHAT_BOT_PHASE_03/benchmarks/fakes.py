@@ -0,0 +1,287 @@
+import re
+import time
+import random
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import numpy as np
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.llms import CustomLLM, CompletionResponse, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+from sparse_encoder import tokenize, term_id
+
+
+#------------------------------------------------Injected Latency------------------------------------------------
+
+def latency_seconds(latency_ms, jitter):
+    """
+    Latency for one fake call: the configured mean, spread uniformly by +/- jitter (a fraction of the mean).
+    """
+    if latency_ms <= 0:
+        return 0.0
+    spread = latency_ms * jitter
+    return max(0.0, random.uniform(latency_ms - spread, latency_ms + spread)) / 1000
+
+#------------------------------------------------Synthetic CV Corpus------------------------------------------------
+
+JOB_TITLES = [
+    "software engineer", "data scientist", "project manager", "qa engineer",
+    "devops engineer", "frontend developer", "backend developer", "accountant"
+]
+
+SKILLS = [
+    "python", "django", "flask", "java", "spring", "node.js", "react", "angular", "vue.js", "typescript",
+    "postgresql", "mongodb", "mysql", "redis", "aws", "azure", "gcp", "docker", "kubernetes", "terraform",
+    "tensorflow", "pytorch", "pandas", "spark", "selenium", "jira", "git", "agile", "quickbooks", "sap"
+]
+
+FILLER_SENTENCES = [
+    "Delivered features end to end in a cross-functional team.",
+    "Improved the reliability of production services and reduced incident counts.",
+    "Mentored junior colleagues and reviewed code on a daily basis.",
+    "Worked closely with stakeholders to gather and refine requirements.",
+    "Automated manual reporting and cut turnaround time significantly.",
+    "Led the migration of a legacy system to a modern architecture.",
+    "Wrote technical documentation and ran knowledge sharing sessions.",
+    "Monitored key metrics and tuned performance of critical paths."
+]
+
+def build_corpus(size, seed=7):
+    """
+    Deterministic synthetic CVs. Each CV states its title, experience and skills on fixed lines so the
+    fake LLM can "extract" them, and carries filler paragraphs to give it a realistic length.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        title = rng.choice(JOB_TITLES)
+        years = rng.randint(0, 15)
+        skills = rng.sample(SKILLS, rng.randint(4, 10))
+        paragraphs = [" ".join(rng.sample(FILLER_SENTENCES, 4)) for _ in range(rng.randint(3, 8))]
+        text = (
+            f"# Candidate {i:04d}\n\n"
+            f"Title: {title}\n"
+            f"Experience: {years} years\n"
+            f"Skills: {', '.join(skills)}\n\n"
+            f"## Experience\n\n" + "\n\n".join(paragraphs)
+        )
+        corpus.append({
+            "id": f"Candidate_{i:04d}",
+            "text": text,
+            "profile": {"job_title": title, "years_of_experience": years, "skills": skills}
+        })
+    return corpus
+
+def build_job_descriptions(count, seed=11):
+    rng = random.Random(seed)
+    job_descriptions = []
+    for _ in range(count):
+        title = rng.choice(JOB_TITLES)
+        skills = rng.sample(SKILLS, 2)
+        years = rng.randint(0, 6)
+        job_descriptions.append(f"We need a {title} with {years}+ years of experience in {skills[0]} and {skills[1]}.")
+    return job_descriptions
+
+#------------------------------------------------Fake OpenAI Client------------------------------------------------
+
+def fake_completion_text(user_prompt):
+    """
+    Canned answer for the three gpt-3.5 prompts of the ranking pipeline, derived from the prompt itself.
+    """
+    if "extract the mandatory conditions" in user_prompt:
+        job_description = user_prompt.split("Job Description:", 1)[1].split("Output format:", 1)[0].lower()
+        years = re.search(r"(\d+)\+?\s*years", job_description)
+        return repr({
+            'job_title': next((title for title in JOB_TITLES if title in job_description), ''),
+            'years_of_experience': int(years.group(1)) if years else 0,
+            'skills': [skill for skill in SKILLS if re.search(rf"(?<![\w.]){re.escape(skill)}(?![\w])", job_description)],
+            'certifications': [],
+            'tools': []
+        })
+
+    if "full_text:" in user_prompt:
+        full_text = user_prompt.split("full_text:", 1)[1]
+        title = re.search(r"Title: (.+)", full_text)
+        years = re.search(r"Experience: (\d+) years", full_text)
+        skills = re.search(r"Skills: (.+)", full_text)
+        return repr({
+            'job_title': title.group(1).strip() if title else '',
+            'years_of_experience': int(years.group(1)) if years else 0,
+            'skills': [s.strip() for s in skills.group(1).split(",")] if skills else []
+        })
+
+    user_input = user_prompt.split("User Input:", 1)[-1].split("\n", 1)[0].strip()
+    return f"We are seeking a candidate for the following role. {user_input} Applicants without these qualifications will not be considered."
+
+def completion_response(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+class _FakeCompletions:
+    def __init__(self, latency_ms, jitter):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.calls = 0
+
+    def create(self, messages, **kwargs):
+        self.calls += 1
+        time.sleep(latency_seconds(self.latency_ms, self.jitter))
+        return completion_response(fake_completion_text(messages[-1]["content"]))
+
+class _FakeAsyncCompletions(_FakeCompletions):
+    async def create(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(latency_seconds(self.latency_ms, self.jitter))
+        return completion_response(fake_completion_text(messages[-1]["content"]))
+
+class FakeOpenAI:
+    """
+    Stands in for openai.OpenAI: only client.chat.completions.create is used by the backend.
+    """
+    def __init__(self, latency_ms=0.0, jitter=0.0):
+        self.chat = SimpleNamespace(completions=_FakeCompletions(latency_ms, jitter))
+
+class FakeAsyncOpenAI:
+    def __init__(self, latency_ms=0.0, jitter=0.0):
+        self.chat = SimpleNamespace(completions=_FakeAsyncCompletions(latency_ms, jitter))
+
+#------------------------------------------------Fake Embeddings and LLM (llama-index)------------------------------------------------
+
+def hashed_embedding(text, dimension=1536):
+    """
+    Normalized bag of hashed tokens, so texts sharing words get a higher dot product like real embeddings.
+    """
+    vector = np.zeros(dimension, dtype=np.float32)
+    for token in tokenize(text):
+        vector[term_id(token) % dimension] += 1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector.tolist()
+
+class FakeEmbedding(BaseEmbedding):
+    """
+    Drop-in for OpenAIEmbedding with injected latency per request.
+    """
+    model_name: str = "fake-embedding"
+    dimension: int = 1536
+    latency_ms: float = 0.0
+    jitter: float = 0.0
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeEmbedding"
+
+    def _get_query_embedding(self, query: str):
+        time.sleep(latency_seconds(self.latency_ms, self.jitter))
+        return hashed_embedding(query, self.dimension)
+
+    def _get_text_embedding(self, text: str):
+        time.sleep(latency_seconds(self.latency_ms, self.jitter))
+        return hashed_embedding(text, self.dimension)
+
+    def _get_text_embeddings(self, texts):
+        time.sleep(latency_seconds(self.latency_ms, self.jitter))
+        return [hashed_embedding(text, self.dimension) for text in texts]
+
+    async def _aget_query_embedding(self, query: str):
+        await asyncio.sleep(latency_seconds(self.latency_ms, self.jitter))
+        return hashed_embedding(query, self.dimension)
+
+    async def _aget_text_embedding(self, text: str):
+        await asyncio.sleep(latency_seconds(self.latency_ms, self.jitter))
+        return hashed_embedding(text, self.dimension)
+
+class FakeLLM(CustomLLM):
+    """
+    llama-index LLM that answers after the injected latency. Streaming spreads the latency over the tokens.
+    """
+    latency_ms: float = 0.0
+    jitter: float = 0.0
+    answer: str = "The candidate has relevant experience according to the CV."
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="fake-llm", is_chat_model=False)
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        time.sleep(latency_seconds(self.latency_ms, self.jitter))
+        return CompletionResponse(text=self.answer)
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        await asyncio.sleep(latency_seconds(self.latency_ms, self.jitter))
+        return CompletionResponse(text=self.answer)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        tokens = self.answer.split(" ")
+        delay = latency_seconds(self.latency_ms, self.jitter) / len(tokens)
+
+        def gen():
+            text = ""
+            for i, token in enumerate(tokens):
+                time.sleep(delay)
+                delta = token if i == 0 else " " + token
+                text += delta
+                yield CompletionResponse(text=text, delta=delta)
+        return gen()
+
+    @llm_completion_callback()
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        tokens = self.answer.split(" ")
+        delay = latency_seconds(self.latency_ms, self.jitter) / len(tokens)
+
+        async def gen():
+            text = ""
+            for i, token in enumerate(tokens):
+                await asyncio.sleep(delay)
+                delta = token if i == 0 else " " + token
+                text += delta
+                yield CompletionResponse(text=text, delta=delta)
+        return gen()
+
+#------------------------------------------------Vector Index With Latency------------------------------------------------
+
+class LatencyVectorIndex:
+    """
+    Wraps a LocalVectorIndex and sleeps before every call, to stand in for the Pinecone round trip.
+    """
+    def __init__(self, index, latency_ms=0.0, jitter=0.0):
+        self._index = index
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+
+    def _wait(self):
+        time.sleep(latency_seconds(self.latency_ms, self.jitter))
+
+    def query(self, *args, **kwargs):
+        self._wait()
+        return self._index.query(*args, **kwargs)
+
+    def fetch(self, *args, **kwargs):
+        self._wait()
+        return self._index.fetch(*args, **kwargs)
+
+    def upsert(self, *args, **kwargs):
+        self._wait()
+        return self._index.upsert(*args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        self._wait()
+        return self._index.update(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        self._wait()
+        return self._index.delete(*args, **kwargs)
+
+    def list(self, *args, **kwargs):
+        for page in self._index.list(*args, **kwargs):
+            self._wait()
+            yield page
+
+    def describe_index_stats(self, **kwargs):
+        self._wait()
+        return self._index.describe_index_stats(**kwargs)
@@ -15,52 +15,93 @@ const App = () => {
   const [isJobSubmitted, setIsJobSubmitted] = useState(false);
   const [selectedCandidate, setSelectedCandidate] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
+  const [isRanking, setIsRanking] = useState(false);
 
   //---------------------------------Handle Cv Ranking Function-----------------------------------------
 
   const handleJobSubmit = async (description) => {
     setJobDescription(description);
+    setCandidates([]);
+    setIsJobSubmitted(false);
     setIsLoading(true);
+    setIsRanking(true);
     try {
-      const response = await fetch("http://localhost:8000/rank_cvs", {
+      // Streamed as NDJSON: each validated candidate arrives as soon as its extraction finishes
+      const response = await fetch("http://localhost:8000/rank_cvs/stream", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
         },
         body: JSON.stringify({ description }),
       });
-
-      const data = await response.json();
-      if (data.ranked_cvs) {
-        setCandidates(data.ranked_cvs); // Update candidates with the backend response
-        setIsJobSubmitted(true);
-      } else {
+      if (!response.ok || !response.body) {
         throw new Error("Failed to fetch ranked candidates.");
       }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let finished = false;
+
+      const handleEvent = (event) => {
+        if (event.type === "candidate") {
+          setCandidates((previous) =>
+            [...previous, event.cv].sort((a, b) => b.score - a.score)
+          );
+          setIsJobSubmitted(true);
+          setIsLoading(false); // Show the first candidates while the rest are validated
+        } else if (event.type === "done") {
+          setCandidates(event.ranked_cvs); // Final order from the backend
+          setIsJobSubmitted(true);
+          finished = true;
+        } else if (event.type === "error") {
+          throw new Error(event.detail);
+        }
+      };
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop();
+        lines.filter((line) => line.trim()).forEach((line) => handleEvent(JSON.parse(line)));
+      }
+      if (buffer.trim()) handleEvent(JSON.parse(buffer));
+
+      if (!finished) {
+        throw new Error("Ranking stream ended early.");
+      }
     } catch (error) {
       console.error("Error fetching candidates:", error);
       alert("Something went wrong while fetching candidates.");
     }
     setIsLoading(false);
+    setIsRanking(false);
   };
 
   //----------------------------Handle Show CV Function---------------------------------
 
   const handleShowCV = async (candidate) => {
     setSelectedCandidateId(candidate.cv_id); // Highlight the candidate
+    // Open the tab right away (inside the click) so the browser does not block it as a popup
+    const viewer = window.open("", "_blank");
     try {
       const response = await axios.post("http://localhost:8000/show_cv", {
         cv_id: candidate.cv_id,
       });
 
-      // Backend opens the CV itself; no need to open another tab here
-      if (response.data && response.data.message) {
-        console.log("CV opened successfully on the backend.");
-        alert(response.data.message); // Optionally display a message
+      // The backend serves the original PDF itself (cached, with Range support for the viewer)
+      if (response.data && response.data.pdf_url) {
+        if (viewer) {
+          viewer.location.href = `http://localhost:8000${response.data.pdf_url}`;
+        }
       } else {
+        if (viewer) viewer.close();
         alert("CV not available.");
       }
     } catch (error) {
+      if (viewer) viewer.close();
       console.error("Error fetching CV:", error);
       alert("Failed to fetch CV");
     }
@@ -134,7 +175,12 @@ const App = () => {
             jobDescription={jobDescription}
             handleClearDescription={handleClearDescription}
           />
-          {isJobSubmitted && candidates.length === 0 ? (
+          {isRanking && candidates.length > 0 && (
+            <p className="text-center text-gray-500 dark:text-gray-300 mt-4">
+              Validating more candidates...
+            </p>
+          )}
+          {isJobSubmitted && !isRanking && candidates.length === 0 ? (
             <p className="text-center text-gray-500 dark:text-gray-300 mt-4">
               No candidates available.
             </p>
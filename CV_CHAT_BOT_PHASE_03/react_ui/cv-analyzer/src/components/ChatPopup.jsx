@@ -18,6 +18,8 @@ const ChatPopup = ({ candidate, onClose }) => {
   const [isMinimized, setIsMinimized] = useState(false);
   const [isMaximized, setIsMaximized] = useState(false);
   const messagesEndRef = useRef(null);
+  const sessionIdRef = useRef(null); // Server-side chat session holding the conversation memory
+  const abortRef = useRef(null); // Aborting the answer stream cancels the generation on the backend
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -32,8 +34,37 @@ const ChatPopup = ({ candidate, onClose }) => {
     localStorage.setItem("chatMessages", JSON.stringify(messages));
   }, [messages]);
 
+  //-----------------------------------Chat Session for the Selected Candidate----------------------------------------
+
+  const openSession = async () => {
+    const response = await axios.post("http://localhost:8000/chat/sessions", {
+      cv_id: candidate?.cv_id,
+    });
+    sessionIdRef.current = response.data.session_id;
+    return sessionIdRef.current;
+  };
+
+  const closeSession = () => {
+    abortRef.current?.abort();
+    if (sessionIdRef.current) {
+      axios
+        .delete(`http://localhost:8000/chat/sessions/${sessionIdRef.current}`)
+        .catch(() => {}); // Already expired sessions are fine
+      sessionIdRef.current = null;
+    }
+  };
+
+  useEffect(() => {
+    openSession().catch((error) =>
+      console.error("Error opening chat session:", error.response || error.message)
+    );
+    return closeSession;
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [candidate?.cv_id]);
+
   // Clear chat when popup closes
   const handleClose = () => {
+    closeSession();
     // Clear messages from state and localStorage
     setMessages([]);
     localStorage.removeItem("chatMessages");
@@ -54,26 +85,69 @@ const ChatPopup = ({ candidate, onClose }) => {
   
     try {
       const requestData = {
-        cv_id: candidate?.cv_id, // Candidate's CV ID
-        question: userMessage, // User's message (question)
+        message: userMessage, // User's message (question)
       };
   
       console.log("Sending data:", requestData); // Log the request data for debugging
-  
-      const response = await axios.post("http://localhost:8000/chatbot", requestData);
-  
-      if (response.data.response) {
-        setMessages((prev) => [
-          ...prev,
-          { sender: "bot", text: response.data.response },
-        ]);
-      } else {
-        setMessages((prev) => [
-          ...prev,
-          { sender: "bot", text: "No response from chatbot." },
-        ]);
+
+      // The answer is streamed as Server-Sent Events, one token per event
+      abortRef.current = new AbortController();
+      const streamMessage = async (sessionId) =>
+        fetch(`http://localhost:8000/chat/sessions/${sessionId}/messages/stream`, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify(requestData),
+          signal: abortRef.current.signal,
+        });
+
+      let response = await streamMessage(sessionIdRef.current || (await openSession()));
+      if (response.status === 404) {
+        response = await streamMessage(await openSession()); // Session expired while idle
+      }
+      if (!response.ok || !response.body) {
+        throw new Error(`Chat request failed with status ${response.status}`);
+      }
+
+      setMessages((prev) => [...prev, { sender: "bot", text: "" }]);
+      const appendToAnswer = (token) => {
+        setIsTyping(false);
+        setMessages((prev) => {
+          const updated = [...prev];
+          const last = updated[updated.length - 1];
+          updated[updated.length - 1] = { ...last, text: last.text + token };
+          return updated;
+        });
+      };
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let answered = false;
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const block of events) {
+          const eventLine = block.split("\n").find((line) => line.startsWith("event: "));
+          const dataLine = block.split("\n").find((line) => line.startsWith("data: "));
+          if (!dataLine) continue;
+          const eventType = eventLine ? eventLine.slice(7) : "token";
+          const data = JSON.parse(dataLine.slice(6));
+          if (eventType === "error") throw new Error(data.detail);
+          if (eventType === "token") {
+            answered = true;
+            appendToAnswer(data.token);
+          }
+        }
+      }
+
+      if (!answered) {
+        appendToAnswer("No response from chatbot.");
       }
     } catch (error) {
+      if (error.name === "AbortError") return; // Popup closed while answering
       console.error("Error:", error.response || error.message);
       setMessages((prev) => [
         ...prev,
@@ -0,0 +1,85 @@
+"""
+One CV whose extraction fails, or whose extracted data is malformed, is dropped from a ranking
+without failing the other CVs. Runs model_for_phase_03 against the local vector engine and a stub
+OpenAI client, so no network access or API keys are needed.
+"""
+import os
+import sys
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+
+EXTRACTIONS = {
+    "good-1": "{'job_title': 'software engineer', 'years_of_experience': 5, 'skills': ['python', 'sql']}",
+    "good-2": "{'job_title': 'senior software engineer', 'years_of_experience': 3, 'skills': ['python']}",
+    "malformed": "{'job_title': 'software engineer', 'years_of_experience': 4, 'skills': [None, 'python']}",
+}
+
+def reply_for(request):
+    prompt = request["messages"][-1]["content"]
+    for cv_id, reply in EXTRACTIONS.items():
+        if f"cv-text-{cv_id}" in prompt:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+    raise RuntimeError("extraction LLM call failed")
+
+class StubCompletions:
+    def create(self, **request):
+        return reply_for(request)
+
+class AsyncStubCompletions:
+    async def create(self, **request):
+        return reply_for(request)
+
+@pytest.fixture(scope="module")
+def model(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("rank_validation")
+    os.environ.update({
+        "OpenAI_Key": "test",
+        "VECTOR_STORE": "local",
+        "LOCAL_VECTOR_STORE_DIR": str(workdir / "vector_store"),
+        "EMBEDDING_CACHE_DIR": str(workdir / "embeddings"),
+        "EXTRACTION_STORE_PATH": str(workdir / "extractions.sqlite3"),
+        "SPARSE_ENCODER_PATH": str(workdir / "bm25_stats.sqlite3"),
+    })
+    sys.path.insert(0, BACKEND_DIR)
+    model = importlib.import_module("model_for_phase_03")
+    model.client = SimpleNamespace(chat=SimpleNamespace(completions=StubCompletions()))
+    model.async_client = SimpleNamespace(chat=SimpleNamespace(completions=AsyncStubCompletions()))
+    return model
+
+def make_matches():
+    # No profile_version in the metadata, so every CV goes through LLM extraction
+    return [
+        {"id": cv_id, "score": score, "metadata": {"text": f"cv-text-{cv_id}"}}
+        for cv_id, score in [("good-1", 0.9), ("failing", 0.8), ("malformed", 0.7), ("good-2", 0.6)]
+    ]
+
+MANDATORY_CONDITIONS = {
+    'job_title': 'software engineer',
+    'years_of_experience': 2,
+    'skills': ['python'],
+    'certifications': [],
+    'tools': []
+}
+
+def valid_ids(validated):
+    return [cv["cv_id"] for cv in validated if cv is not None]
+
+def test_failed_cvs_are_skipped(model):
+    validated = model.extract_and_validate_matches(make_matches(), MANDATORY_CONDITIONS)
+    assert valid_ids(validated) == ["good-1", "good-2"]
+
+def test_failed_cvs_are_skipped_async(model):
+    validated = asyncio.run(model.aextract_and_validate_matches(make_matches(), MANDATORY_CONDITIONS))
+    assert valid_ids(validated) == ["good-1", "good-2"]
+
+def test_failed_condition_extraction_does_not_break_validation(model):
+    conditions, keywords = model.conditions_failed(RuntimeError("conditions LLM call failed"))
+    profile = {'job_title': ['software engineer'], 'years_of_experience': 1, 'skills': ['python']}
+    assert model.validate_cv(profile, conditions) is True
+    assert model.validate_cv(model.empty_extracted_info(), conditions) is True
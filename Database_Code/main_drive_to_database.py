@@ -41,7 +41,8 @@ if index_name not in pc.list_indexes().names():
         spec=ServerlessSpec(cloud="aws", region="us-east-1")
     )
 pinecone_index = pc.Index(index_name)
-embed_model = OpenAIEmbedding()
+# CVs per embedding request; small enough that a batch of long CVs stays under the per-request token limit
+embed_model = OpenAIEmbedding(embed_batch_size=32)
 
 SOURCE_FOLDER_ID = '1pd3FKMd-3Vm7hESaerxAyGzoOJa7LxZX'  # CV_Storage
 TARGET_FOLDER_ID = '19-gSAcIxRTe6u5r6jv0HyUSGAkgilKgS'  # Markdown_Cvs
@@ -65,7 +66,7 @@ def document_exists_in_pinecone(doc_id):
 
 #----------------------------------------------------Genarate_Embeddings-------------------------------------------------------------------------
 
-def generate_embeddings(text):
+def generate_embedding(text):
     """Generate embeddings for the provided text."""
     try:
         return embed_model.get_text_embedding(text)
@@ -73,13 +74,23 @@ def generate_embeddings(text):
         print(f"Error generating embeddings: {e}")
         return None
 
+def generate_embeddings(texts):
+    """Generate embeddings for many texts in batched requests, in order (None for a text that failed)."""
+    try:
+        return embed_model.get_text_embedding_batch(texts)
+    except Exception as e:
+        # One bad text fails its whole request: embed one by one so only that text is lost
+        print(f"Error generating embeddings in batches, embedding one by one: {e}")
+        return [generate_embedding(text) for text in texts]
+
 #-----------------------------------------------------Convert_PDF_to_Markdown-----------------------------------------------------------------------
 
 def convert_pdf_to_markdown(pdf_content):
     """Convert PDF content to Markdown format."""
     try:
         reader = PdfReader(io.BytesIO(pdf_content))
-        text = "".join(page.extract_text() for page in reader.pages if page.extract_text())
+        texts = (page.extract_text() for page in reader.pages)  # extract each page once
+        text = "".join(page_text for page_text in texts if page_text)
         markdown_text = markdownify.markdownify(text)
         return markdown_text
     except Exception as e:
@@ -122,6 +133,8 @@ def process_pdfs_from_drive():
             print("No more PDF files found in the specified folder.")
             break
 
+        pending_docs = []  # (doc_id, markdown) of this page, embedded together below
+
         for file in files:
             file_id = file['id']
             file_name = file['name']
@@ -158,15 +171,27 @@ def process_pdfs_from_drive():
                     print(f"Document '{normalized_doc_id}' already exists in Pinecone. Skipping upsert.")
                     continue
 
-                embeddings = generate_embeddings(markdown_content)
-                if embeddings:
-                    node = Node(id_=normalized_doc_id, embedding=embeddings, metadata={"text": markdown_content})
-                    vector_store = PineconeVectorStore(pinecone_index=pinecone_index)
-                    vector_store.add(nodes=[node])
-                    print(f"Upserted document '{normalized_doc_id}' into Pinecone.")
+                pending_docs.append((normalized_doc_id, markdown_content))
             except Exception as e:
                 print(f"Error processing file {file_name}: {e}")
 
+        # -----------------------------------------------------Embed the page in batched requests and upsert it-----------------------------------------------
+
+        if pending_docs:
+            try:
+                embeddings = generate_embeddings([markdown_content for _, markdown_content in pending_docs])
+                nodes = [
+                    Node(id_=doc_id, embedding=embedding, metadata={"text": markdown_content})
+                    for (doc_id, markdown_content), embedding in zip(pending_docs, embeddings)
+                    if embedding
+                ]
+                if nodes:
+                    vector_store = PineconeVectorStore(pinecone_index=pinecone_index)
+                    vector_store.add(nodes=nodes)
+                    print(f"Upserted {len(nodes)} documents into Pinecone.")
+            except Exception as e:
+                print(f"Error upserting documents into Pinecone: {e}")
+
         # ---------------------------------------------------Update page token to fetch the next page-----------------------------------------------
 
         page_token = results.get('nextPageToken')